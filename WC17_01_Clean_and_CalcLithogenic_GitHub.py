@@ -5,12 +5,23 @@ This script processes XLSX files related to the manuscript by Viljoen et al., (P
 
 ### Description
 - Download the two xlsx files from Zenodo: https://doi.org/10.5281/zenodo.6615070
+- Creates "WC17_TM_Comp_update.parquet" and "WC17_DataComp_update.parquet" used by the other scripts, with units taken from the xlsx headers and dCd (nmol) and pMn (pmol) converted once here. Set `WC17_PUBLISH=1` to also write CSV copies.
+- Each measured column gets a quality flag column ('<col>_flag') that the lithogenic and derived columns inherit (see `WC17_Flags`).
+- Adds the station mixed layer depth ('MLD') computed from Temp and Sal and writes 'WC17_MLD_sweep' with the MLD for several criteria.
+- When the DataComp sheet has HPLC marker pigments, phytoplankton group Chl-a missing from the sheet is derived by CHEMTAX (see `WC17_Chemtax`) and the fitted ratios are written to 'WC17_Chemtax_ratios'.
+- Adds the trace metal stoichiometry ratios (pTM:pP, dTM:PO4, dTM:NO3 and dZn:Si, see `WC17_Stoich`) to the trace metal table.
+- Trace metal values missing from the DataComp sheet are filled from the nearest TM bottle of the same station (see `WC17_Matching`), and the depth and distance of the match are stored with every sample.
+- Adds TM* columns for the quota sets of `WC17_MetalStar` next to the TM* columns of the sheet.
+- Adds the phytoplankton composition columns (Cyanobacteria, % of Tchla of each group and Phaeo_Chla, see `WC17_Phyto`).
+- Attaches gridded fields from local NetCDF/Zarr files at the sample positions to both tables when grids are listed in `WC17_GridMatchup.GRID_SOURCES`.
+- Screens the numeric columns of both tables for outliers (more than 3.5 scaled MADs from the median of their frontal zone and depth bin, see `WC17_Outliers`) and writes the boolean matrices to 'WC17_TM_outliers' and 'WC17_DataComp_outliers'. The quality flags are not changed.
+- On later runs only rows added or changed in the xlsx files are reprocessed and merged into the stored tables (see `WC17_Incremental`); set `WC17_REBUILD=1` to reprocess everything.
 
 ### Author
 Johan Viljoen - j.j.viljoen@exeter.ac.uk
 
 ### Last Updated
-20 Jan 2025
+19 October 2026
 """
 
 #%%
@@ -19,6 +30,24 @@ Johan Viljoen - j.j.viljoen@exeter.ac.uk
 
 import pandas as pd
 
+from WC17_Catalog import read_sheet
+from WC17_Censored import parse_censored
+from WC17_Chemtax import add_groups, pigment_columns
+from WC17_Flags import init_flags
+from WC17_GridMatchup import add_grid_fields
+from WC17_Incremental import detect_changes, merge_changes, write_changes
+from WC17_IO import write_table
+from WC17_Lithogenic import add_lithogenic
+from WC17_Matching import fill_matched
+from WC17_Outliers import depth_bins, latitude_zones, mad_outliers, outlier_summary
+from WC17_MetalStar import add_metal_star, star_conversions
+from WC17_MLD import add_mld, mld_sweep
+from WC17_Phyto import add_composition
+from WC17_QC import FLAG_RANGES, QUESTIONABLE_RANGES, run_qc
+from WC17_Schema import apply_schema, memory_report
+from WC17_Stoich import add_stoichiometry
+from WC17_Units import convert_units
+
 #%%
 
 ### TRACE METAL DATA (250m) - CLEAN & CALCULATE LITHOGENIC ###
@@ -29,9 +58,10 @@ import pandas as pd
 file_name = "WC17_TraceMetal_Comp_250m_Viljoen_Zenodo.xlsx"
 sheet_name = "WC17_TM_Data_250m"
 
-# Load the data
+# Load the data through the column catalog of the sheet, which cleans the column names
+# (removes units, parentheses, and trailing spaces) and keeps the units in a column -> unit registry
 try:
-    tbl = pd.read_excel(file_name, sheet_name=sheet_name)
+    tbl = read_sheet(file_name, sheet_name)
     print("First few rows of the dataset:")
 except FileNotFoundError:
     print(f"Error: File '{file_name}' not found. Ensure the file is in the script's directory or provide the correct path.")
@@ -40,13 +70,23 @@ except ValueError as e:
     print(f"Error loading the file: {e}")
     raise
 
-# Display dataset structure
-print("Dataset Information:")
-tbl.info()
+tm_units = dict(tbl.attrs['units'])
+
+# Below detection limit entries ("<0.02", "<DL") become values with '<col>_cens' flag columns
+tbl = parse_censored(tbl)
+
+# Full raw sheet, matched to the DataComp samples below
+tm_sheet = tbl
+
+# Output table
+output_filename = 'WC17_TM_Comp_update'
 
-# Clean column names: Remove units, parentheses, and trailing spaces
-tbl.columns = tbl.columns.str.replace(r'\s*\([^)]*\)\s*', '', regex=True)  # Remove content within parentheses
-tbl.columns = tbl.columns.str.strip()  # Remove leading and trailing spaces
+# Only rows added or changed since the last run are processed (set WC17_REBUILD=1 to reprocess all)
+changes = detect_changes(tbl, output_filename)
+tbl = tbl[changes['changed']].reset_index(drop=True)
+
+# Quality flag column for each measured column ('<col>_flag', ODV scale), from the sheet flags and valid ranges (see WC17_Flags)
+tbl = init_flags(tbl, ranges=FLAG_RANGES, questionable=QUESTIONABLE_RANGES)
 
 # Display updated dataset structure and column names
 print("Cleaned Dataset Information:")
@@ -56,121 +96,48 @@ tbl.info()
 
 ### Calculate Lithogenic Fractions ###
 
-
-# Equation for Lithogenic pTM calculation using crustal ratios
-#pTM_lith_p = (pAl * ratio)/pTM * 100
-
-def calc_pTM_lith(pAl, ratio_metal, pTM, result_type='percent'):
-    """
-    Calculate lithogenic particulate trace metal (pTM) fractions using pAl and crustal ratios 
-    based on Rudnick and Gao (2013).
-
-    Parameters:
-    - pAl (float): Aluminum concentration in particulate matter.
-    - ratio_metal (str): Metal for which lithogenic fraction is calculated. Options: 'Fe', 'Zn', 'Cd', 'Mn', 'Cu', 'Co', 'Ni'.
-    - pTM (float): Total particulate trace metal concentration.
-    - result_type (str): 'percent' to calculate lithogenic percentage, 'lith' for lithogenic fraction. Defaults to 'percent'.
-
-    Returns:
-    - float: Calculated lithogenic percentage or fraction, depending on `result_type`.
-
-    Raises:
-    - ValueError: If an invalid `ratio_metal` or `result_type` is provided.
-    """
-    ratios = {
-        'Fe': 0.2323,
-        'Zn': 0.00163,
-        'Cd': 0.000001,
-        'Mn': 0.00948, #Goa = 0.00948, Taylor & McLenna 1985 = 0.0034
-        'Cu': 0.00034,
-        'Co': 0.00021,
-        'Ni': 0.00058
-    }
-
-    if ratio_metal not in ratios:
-        raise ValueError(f"Invalid ratio element. Choose from: {', '.join(ratios.keys())}")
-
-    selected_ratio = ratios[ratio_metal]
-
-    # Step 1: Calculate the percentage lithogenic contribution
-    percent_lith = (pAl * selected_ratio) / pTM * 100
-    
-    # Step 2: Cap the percentage at 100%
-    percent_lith = min(percent_lith, 100)
-    
-    if result_type == 'percent':
-        return percent_lith
-    elif result_type == 'lith':
-        # Step 3: Calculate lithogenic fraction, capped at total pTM
-        lith_fraction = min(pAl * selected_ratio, pTM)
-        return lith_fraction
-    else:
-        raise ValueError("Invalid result_type. Choose 'percent' or 'lith'.")
-
-    #return result
+# Lithogenic pTM from pAl and crustal ratios (Rudnick and Gao, 2013), see WC17_Lithogenic:
+# adds %pTM_lith and pTM_lith, copies total pTM to pTM_T and subtracts lithogenic from pTM
+tbl = add_lithogenic(tbl, units=tm_units)
+tbl.info()
 
 #%%
 
-# Calc Percent lithogenic vs total pTM
-tbl['%pFe_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Fe', row['pFe'], result_type='percent'), axis=1)
-tbl['%pMn_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Mn', row['pMn'], result_type='percent'), axis=1)
-tbl['%pCo_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Co', row['pCo'], result_type='percent'), axis=1)
-tbl['%pZn_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Zn', row['pZn'], result_type='percent'), axis=1)
-tbl['%pCd_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Cd', row['pCd'], result_type='percent'), axis=1)
-tbl['%pNi_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Ni', row['pNi'], result_type='percent'), axis=1)
-tbl['%pCu_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Cu', row['pCu'], result_type='percent'), axis=1)
-
-# Calc lithogenic pTM
-tbl['pFe_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Fe', row['pFe'], result_type='lith'), axis=1)
-tbl['pMn_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Mn', row['pMn'], result_type='lith'), axis=1)
-tbl['pCo_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Co', row['pCo'], result_type='lith'), axis=1)
-tbl['pZn_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Zn', row['pZn'], result_type='lith'), axis=1)
-tbl['pCd_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Cd', row['pCd'], result_type='lith'), axis=1)
-tbl['pNi_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Ni', row['pNi'], result_type='lith'), axis=1)
-tbl['pCu_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Cu', row['pCu'], result_type='lith'), axis=1)
+# Convert units once for all consumers (dCd pmol to nmol, pMn nmol to pmol); TM* columns of the sheet follow their dTM
+tbl = convert_units(tbl, tm_units, star_conversions(tbl, tm_units))
 
-tbl.info()
+# Merge the processed rows into the stored table (unchanged rows are kept as stored)
+tbl = merge_changes(tbl, output_filename, changes)
+tbl.attrs['units'] = tm_units
 
-#%%
+# Station MLD from Temp and Sal density profiles ('MLD'); the ML flag of the sheet is kept and only filled where missing (see WC17_MLD)
+tbl = add_mld(tbl)
+tm_units['MLD'] = 'm'
+mld_tm = mld_sweep(tbl)
 
-### Subtract Lithogenic from total pTM
+# pTM:pP and dTM:nutrient ratios ('pFe_P', 'dFe_NO3', ...) scaled from the unit registry (see WC17_Stoich)
+tbl = add_stoichiometry(tbl, tm_units)
 
-# First copy all pTM columns and rename to pTM_T for total pTM
-tbl['pFe_T'] = tbl['pFe']
-tbl['pMn_T'] = tbl['pMn']
-tbl['pCo_T'] = tbl['pCo']
-tbl['pZn_T'] = tbl['pZn']
-tbl['pCd_T'] = tbl['pCd']
-tbl['pNi_T'] = tbl['pNi']
-tbl['pCu_T'] = tbl['pCu']
-tbl.info()
+# TM* = dTM - quota x PO4 for every metal and quota set ('Fe*-<set>'); TM* columns of the sheet are only filled where missing (see WC17_MetalStar)
+tbl = add_metal_star(tbl, tm_units)
 
-# Subtract lithogenic from total pTM
-tbl['pFe'] = tbl['pFe_T'] - tbl['pFe_lith'] 
-tbl['pMn'] = tbl['pMn_T'] - tbl['pMn_lith'] 
-tbl['pCo'] = tbl['pCo_T'] - tbl['pCo_lith'] 
-tbl['pZn'] = tbl['pZn_T'] - tbl['pZn_lith']
-tbl['pCd'] = tbl['pCd_T'] - tbl['pCd_lith']
-tbl['pNi'] = tbl['pNi_T'] - tbl['pNi_lith']
-tbl['pCu'] = tbl['pCu_T'] - tbl['pCu_lith']
+# Gridded fields (climatologies, satellite products) at the sample positions, for the grids listed in WC17_GridMatchup.GRID_SOURCES
+tbl = add_grid_fields(tbl, units=tm_units)
 
-tbl.info()
+# QC checks over the whole table, stored as packed flags in 'QC_flags' (see WC17_QC)
+tbl = run_qc(tbl)
 
-# =============================================================================
-# #Recalculate pTM/P ratios
-# tbl['pFe_P'] = tbl['pFe']/tbl['P']*1000
-# tbl['pMn_P'] = tbl['pMn']/tbl['P']*1000
-# tbl['pCo_P'] = tbl['pCo']/tbl['P']
-# tbl['pZn_P'] = tbl['pZn']/tbl['P']*1000
-# tbl['pCd_P'] = tbl['pCd']/tbl['P']
-# tbl['pNi_P'] = tbl['pNi']/tbl['P']
-# tbl['pCu_P'] = tbl['pCu']/tbl['P']
-# =============================================================================
+# Apply declared schema (categorical labels, parsed dates, nullable integer IDs)
+tbl = apply_schema(tbl)
+memory_report(tbl)
 
-#%%
-#Save df
-output_filename = 'WC17_TM_Comp_update.csv'
-tbl.to_csv(output_filename, index=False)
+#Save df as typed Parquet (CSV copy only written when publishing); skipped when no row changed
+write_changes(tbl, output_filename, changes, publish_format='csv', units=tbl.attrs['units'])
+
+# Outliers of every numeric column per frontal zone and depth bin, so vertical gradients are not flagged (see WC17_Outliers)
+outliers = mad_outliers(tbl, by=[latitude_zones(tbl['Latitude']), depth_bins(tbl['Depth'])])
+print(outlier_summary(outliers))
+write_table(pd.concat([tbl[['Station', 'Depth']], outliers], axis=1), 'WC17_TM_outliers')
 
 #%%
 
@@ -183,72 +150,99 @@ file_name = "WC17_DataComp_150m_Viljoen_Zenodo.xlsx"
 
 # Load the specific tab
 sheet_name = "WC17_Data_150m"
+# Column names are cleaned (units, brackets, and trailing spaces removed) through the column catalog
 try:
-    tbl = pd.read_excel(file_name, sheet_name=sheet_name)
+    tbl = read_sheet(file_name, sheet_name)
 except FileNotFoundError:
     print(f"File '{file_name}' not found. Make sure it's in the same directory or provide the correct path.")
 except ValueError as e:
     print(f"Error: {e}")
-    
-tbl.info()
 
-# Clean column names: Remove units, brackets, and trailing spaces
-tbl.columns = tbl.columns.str.replace(r'\s*\([^)]*\)\s*', '', regex=True)  # Remove content within parentheses
-tbl.columns = tbl.columns.str.strip()  # Remove leading and trailing spaces
+dc_units = dict(tbl.attrs['units'])
+
+# Below detection limit entries ("<0.02", "<DL") become values with '<col>_cens' flag columns
+tbl = parse_censored(tbl)
 
 # Reset index if needed
 tbl = tbl.reset_index(drop=True)
 
+# TM values missing from the sheet (e.g. new casts) from the nearest TM bottle of the station within 10 m,
+# with the matched depth ('Depth_TM') and distance ('Match_distance') of every sample (see WC17_Matching)
+tbl = fill_matched(tbl, tm_sheet)
+dc_units.update({'Depth_TM': 'm', 'Match_distance': 'm'})
+
+# Output table
+output_filename = 'WC17_DataComp_update'
+
+# Only rows added or changed since the last run are processed (set WC17_REBUILD=1 to reprocess all)
+# Rows are matched first, so samples whose matched TM bottle was edited in the TM sheet are reprocessed too
+changes = detect_changes(tbl, output_filename)
+tbl = tbl[changes['changed']].reset_index(drop=True)
+
+# Quality flag column for each measured column ('<col>_flag', ODV scale), from the sheet flags and valid ranges (see WC17_Flags)
+tbl = init_flags(tbl, ranges=FLAG_RANGES, questionable=QUESTIONABLE_RANGES)
+
 # Display the updated column
 tbl.info()
 
 #%%
 
-# Calc Percent lithogenic vs total pTM
-tbl['%pFe_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Fe', row['pFe'], result_type='percent'), axis=1)
-tbl['%pMn_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Mn', row['pMn'], result_type='percent'), axis=1)
-tbl['%pCo_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Co', row['pCo'], result_type='percent'), axis=1)
-tbl['%pZn_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Zn', row['pZn'], result_type='percent'), axis=1)
-tbl['%pCd_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Cd', row['pCd'], result_type='percent'), axis=1)
-tbl['%pNi_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Ni', row['pNi'], result_type='percent'), axis=1)
-tbl['%pCu_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Cu', row['pCu'], result_type='percent'), axis=1)
-
-# Calc lithogenic pTM
-tbl['pFe_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Fe', row['pFe'], result_type='lith'), axis=1)
-tbl['pMn_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Mn', row['pMn'], result_type='lith'), axis=1)
-tbl['pCo_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Co', row['pCo'], result_type='lith'), axis=1)
-tbl['pZn_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Zn', row['pZn'], result_type='lith'), axis=1)
-tbl['pCd_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Cd', row['pCd'], result_type='lith'), axis=1)
-tbl['pNi_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Ni', row['pNi'], result_type='lith'), axis=1)
-tbl['pCu_lith'] = tbl.apply(lambda row: calc_pTM_lith(row['pAl'], 'Cu', row['pCu'], result_type='lith'), axis=1)
-
+# Calc lithogenic pTM and subtract from total pTM (total kept as pTM_T)
+tbl = add_lithogenic(tbl, units=dc_units)
 tbl.info()
 
 #%%
 
-### Subtract Lithogenic from total pTM
-
-# First copy all pTM columns and rename to pTM_T for total pTM
-tbl['pFe_T'] = tbl['pFe']
-tbl['pMn_T'] = tbl['pMn']
-tbl['pCo_T'] = tbl['pCo']
-tbl['pZn_T'] = tbl['pZn']
-tbl['pCd_T'] = tbl['pCd']
-tbl['pNi_T'] = tbl['pNi']
-tbl['pCu_T'] = tbl['pCu']
-
-# Subtract lithogenic from total pTM
-tbl['pFe'] = tbl['pFe_T'] - tbl['pFe_lith'] 
-tbl['pMn'] = tbl['pMn_T'] - tbl['pMn_lith'] 
-tbl['pCo'] = tbl['pCo_T'] - tbl['pCo_lith'] 
-tbl['pZn'] = tbl['pZn_T'] - tbl['pZn_lith']
-tbl['pCd'] = tbl['pCd_T'] - tbl['pCd_lith']
-tbl['pNi'] = tbl['pNi_T'] - tbl['pNi_lith']
-tbl['pCu'] = tbl['pCu_T'] - tbl['pCu_lith']
-tbl.info()
+# Convert units once for all consumers (dCd pmol to nmol, pMn nmol to pmol)
+tbl = convert_units(tbl, dc_units, star_conversions(tbl, dc_units))
+
+# Merge the processed rows into the stored table (unchanged rows are kept as stored)
+tbl = merge_changes(tbl, output_filename, changes)
+tbl.attrs['units'] = dc_units
+
+# Station MLD from Temp and Sal density profiles ('MLD'); the ML flag of the sheet is kept and only filled where missing (see WC17_MLD)
+tbl = add_mld(tbl)
+dc_units['MLD'] = 'm'
+mld_dc = mld_sweep(tbl)
+
+# Phytoplankton groups from marker pigments (CHEMTAX) where the sheet has pigment columns but no group values (see WC17_Chemtax)
+# Run in this process: worker processes need a `__main__` guard, which this cell-based script does not have
+# Skipped with a warning when no sample has Chl-a and every marker pigment (or all are flagged bad)
+if pigment_columns(tbl):
+    try:
+        tbl, chemtax_ratios = add_groups(tbl, units=dc_units, workers=1)
+        write_table(chemtax_ratios.reset_index(), 'WC17_Chemtax_ratios')
+    except ValueError as error:
+        print(f"Warning: CHEMTAX groups not added. {error}")
+
+# Cyanobacteria, % of Tchla of each group ('<group>_P') and Phaeo_Chla, stored once for all tables and figures (see WC17_Phyto)
+tbl = add_composition(tbl, units=dc_units)
+
+# Gridded fields at the sample positions (see WC17_GridMatchup)
+tbl = add_grid_fields(tbl, units=dc_units)
+
+# QC checks over the whole table, stored as packed flags in 'QC_flags' (see WC17_QC)
+tbl = run_qc(tbl)
+
+# Apply declared schema (categorical labels, parsed dates, nullable integer IDs)
+tbl = apply_schema(tbl)
+memory_report(tbl)
+
+#Save df as typed Parquet (CSV copy only written when publishing); skipped when no row changed
+write_changes(tbl, output_filename, changes, publish_format='csv', units=tbl.attrs['units'])
+
+# Outliers of every numeric column per frontal zone and depth bin, so vertical gradients are not flagged (see WC17_Outliers)
+outliers = mad_outliers(tbl, by=[latitude_zones(tbl['Latitude']), depth_bins(tbl['Depth'])])
+print(outlier_summary(outliers))
+write_table(pd.concat([tbl[['Station', 'Depth']], outliers], axis=1), 'WC17_DataComp_outliers')
 
 #%%
 
+### MIXED LAYER DEPTH CRITERIA ###
+
+# Station MLDs of both datasets for the density thresholds and gradient criterion in WC17_MLD
+tbl_mld = pd.concat([mld_tm.assign(Dataset='TraceMetal'), mld_dc.assign(Dataset='DataComp')], ignore_index=True)
+print(tbl_mld.pivot_table(index=['Dataset', 'Station'], columns=['Criterion', 'Value'], values='MLD', observed=True))
+
 #Save df
-output_filename = 'WC17_DataComp_update.csv'
-tbl.to_csv(output_filename, index=False)
+write_table(tbl_mld, 'WC17_MLD_sweep', units={'MLD': 'm'})
@@ -0,0 +1,51 @@
+"""
+WC17: Batch Ingest of Multi-Cruise Workbooks
+
+This script is related to the manuscript by Viljoen et al., (Preprint) - see ReadMe at https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- Applies the `WC17_01` clean-up (column names, `_T` copies of total pTM, lithogenic correction, unit conversion) to every cruise workbook in a directory or CSV manifest (columns 'file' and 'sheet').
+- Each workbook is processed in its own worker process and streamed in row chunks (see `WC17_Ingest`).
+- Writes one Parquet table partitioned by `Cruise` (e.g. "WC17_TM_Batch.parquet/Cruise=.../") and a per-file report ("WC17_TM_Batch_report.parquet") with rows, timing and any failure. A failed workbook does not stop the batch.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+from WC17_Ingest import run_batch
+
+#%%
+
+### SETTINGS ###
+
+# Directory of cruise workbooks, or CSV manifest with 'file' and 'sheet' columns
+source = "cruise_workbooks"
+
+# Sheet read from every workbook in the directory (None reads the first sheet)
+sheet_name = None
+
+# Partitioned output table
+output_name = "WC17_TM_Batch"
+
+# Worker processes (None uses all CPUs) and rows per chunk
+workers = None
+chunk_size = 5000
+
+#%%
+
+### RUN BATCH ###
+
+if __name__ == '__main__':
+    report = run_batch(source, output_name, sheet_name=sheet_name, workers=workers, chunk_size=chunk_size)
+
+    failed = report[report['status'] == 'failed']
+    if not failed.empty:
+        print("Failed workbooks:")
+        print(failed[['file', 'sheet', 'error']].to_string(index=False))
@@ -0,0 +1,305 @@
+"""
+WC17: Streaming Ingest of Raw CTD Casts Binned to 1 m
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- For 24 Hz CTD casts (Sea-Bird `.cnv` or `.csv` exports) with far too many scans to hold in memory.
+- `bin_cast` reads a cast in chunks of `CHUNK_SCANS` scans and adds each chunk into fixed depth-bin sums and counts with `np.add.reduceat`, so memory depends on the chunk size and the number of bins, not on the length of the cast. Only the downcast is binned (scans deeper than all earlier scans).
+- `ingest_ctd` bins every cast of a directory and stores the profiles as station x depth arrays keyed by `Station_ID` (taken from the file name), in one `.npz` file ('WC17_CTD_1m.npz'). Casts of the same station are averaged bin by bin.
+- `load_ctd` returns the arrays in the layout of `profile_arrays` (see `WC17_MLD`), so the bottle-profile functions (e.g. `npq_correct`, `apply_calibration`) take them unchanged. It returns None when no CTD profiles have been ingested.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from WC17_IO import table_path
+
+#%%
+
+### SETTINGS ###
+
+# Directory of raw CTD casts and the binned output
+CTD_SOURCE = "CTD"
+CTD_OUTPUT = "WC17_CTD_1m"
+CTD_EXTENSIONS = ('.cnv', '.csv')
+
+# Station_ID is the last number in the file name, e.g. 'WC17_CTD_08.cnv' -> 8
+STATION_PATTERN = re.compile(r'(\d+)(?!.*\d)')
+
+# Bin size (m), deepest bin (m) and scans read per chunk
+BIN_SIZE = 1.0
+MAX_DEPTH = 1000
+CHUNK_SCANS = 100_000
+
+# Output variable -> accepted column names in the raw files (Sea-Bird codes or CSV headers), first found is used
+CTD_VARIABLES = {
+    'Depth': ['depSM', 'depth', 'Depth'],
+    'Temp': ['t090C', 't090', 'Temp'],
+    'Sal': ['sal00', 'Sal'],
+    'Fl': ['flECO-AFL', 'flC', 'wetStar', 'Fl'],
+}
+CTD_UNITS = {'Depth': 'm', 'Temp': '°C', 'Fl': 'µg/L'}
+
+#%%
+
+### READ CASTS ###
+
+def read_cnv_header(path):
+    """
+    Column names, header length and bad-value flag of a Sea-Bird `.cnv` file.
+
+    Returns:
+    - list: Column codes in file order (e.g. 'depSM', 't090C').
+    - int: Number of header lines (up to and including '*END*').
+    - float: Value marking bad scans, or None.
+
+    Raises:
+    - ValueError: If the file has no '*END*' line.
+    """
+    names, bad_flag = [], None
+    with open(path, encoding='latin-1') as f:
+        for n, line in enumerate(f, start=1):
+            if line.startswith('# name '):
+                names.append(line.split('=', 1)[1].split(':', 1)[0].strip())
+            elif line.startswith('# bad_flag'):
+                bad_flag = float(line.split('=', 1)[1])
+            elif line.startswith('*END*'):
+                return names, n, bad_flag
+    raise ValueError(f"'{path}' has no '*END*' header line.")
+
+
+def _match_columns(names, variables):
+    # Raw column of each output variable
+    found = {}
+    for var, candidates in variables.items():
+        col = next((c for c in candidates if c in names), None)
+        if col is not None:
+            found[var] = col
+    return found
+
+
+def iter_scans(path, variables=None, chunk_scans=CHUNK_SCANS):
+    """
+    Read the scans of a cast in chunks.
+
+    Parameters:
+    - path (str): `.cnv` or `.csv` cast.
+    - variables (dict): Output variable -> accepted column names. Defaults to `CTD_VARIABLES`.
+    - chunk_scans (int): Scans per chunk. Defaults to `CHUNK_SCANS`.
+
+    Yields:
+    - DataFrame: Next chunk with one float column per variable found in the file (bad scans as NaN).
+
+    Raises:
+    - ValueError: If the cast has no depth column.
+    """
+    variables = CTD_VARIABLES if variables is None else variables
+    if path.lower().endswith('.cnv'):
+        names, n_header, bad_flag = read_cnv_header(path)
+        found = _match_columns(names, variables)
+        reader_args = {'sep': r'\s+', 'header': None, 'names': names, 'skiprows': n_header}
+    else:
+        names = pd.read_csv(path, nrows=0).columns.tolist()
+        found, bad_flag = _match_columns(names, variables), None
+        reader_args = {}
+    if 'Depth' not in found:
+        raise ValueError(f"'{path}' has none of the depth columns {variables['Depth']}.")
+
+    rename = {col: var for var, col in found.items()}
+    with pd.read_csv(path, usecols=list(rename), chunksize=chunk_scans, encoding='latin-1', **reader_args) as reader:
+        for chunk in reader:
+            chunk = chunk.rename(columns=rename)[list(found)].astype(float)
+            if bad_flag is not None:
+                chunk = chunk.mask(np.isclose(chunk, bad_flag))
+            yield chunk
+
+#%%
+
+### BINNING ###
+
+def bin_scans(depth, values, bin_size=BIN_SIZE, n_bins=None):
+    """
+    Sums and counts of scans per depth bin, in one `np.add.reduceat` pass.
+
+    Parameters:
+    - depth (array): Depth of each scan (m).
+    - values (array): Scan x variable values, NaN where missing.
+    - bin_size (float): Bin size (m). Defaults to 1.
+    - n_bins (int): Bins kept (from the surface); deeper scans are dropped. Defaults to all.
+
+    Returns:
+    - array: Indices of the bins with scans.
+    - array: Bin x variable sums of the values.
+    - array: Bin x variable counts of the values.
+    """
+    depth = np.asarray(depth, dtype=float)
+    values = np.asarray(values, dtype=float).reshape(len(depth), -1)
+    bins = np.floor(depth / bin_size)
+    keep = np.isfinite(bins) & (bins >= 0)
+    if n_bins is not None:
+        keep &= bins < n_bins
+    bins, values = bins[keep].astype(np.int64), values[keep]
+    if not len(bins):
+        return bins, np.zeros((0, values.shape[1])), np.zeros((0, values.shape[1]), dtype=np.int64)
+
+    order = np.argsort(bins, kind='stable')
+    bins, values = bins[order], values[order]
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    finite = np.isfinite(values)
+    sums = np.add.reduceat(np.where(finite, values, 0.0), starts, axis=0)
+    counts = np.add.reduceat(finite.astype(np.int64), starts, axis=0)
+    return bins[starts], sums, counts
+
+
+def bin_cast(path, variables=None, bin_size=BIN_SIZE, max_depth=MAX_DEPTH, chunk_scans=CHUNK_SCANS,
+             downcast=True):
+    """
+    Bin the scans of one cast in constant memory.
+
+    Parameters:
+    - path (str): `.cnv` or `.csv` cast.
+    - variables (dict): See `iter_scans`.
+    - bin_size (float): Bin size (m). Defaults to 1.
+    - max_depth (float): Deepest bin (m). Defaults to `MAX_DEPTH`.
+    - chunk_scans (int): Scans per chunk. Defaults to `CHUNK_SCANS`.
+    - downcast (bool): Only bin scans deeper than all earlier scans. Defaults to True.
+
+    Returns:
+    - list: Variables binned (without 'Depth').
+    - array: Bin x variable sums.
+    - array: Bin x variable counts.
+    """
+    n_bins = int(np.ceil(max_depth / bin_size))
+    sums, counts, names = None, None, None
+    deepest = -np.inf
+    for chunk in iter_scans(path, variables, chunk_scans):
+        depth = chunk['Depth'].to_numpy()
+        if downcast:
+            # Running maximum carried over from the previous chunks
+            running = np.fmax.accumulate(np.r_[deepest, depth])[1:]
+            deepest = running[-1] if len(running) else deepest
+            depth = np.where(depth >= running, depth, np.nan)
+        if names is None:
+            names = [col for col in chunk.columns if col != 'Depth']
+            sums = np.zeros((n_bins, len(names)))
+            counts = np.zeros((n_bins, len(names)), dtype=np.int64)
+        bins, chunk_sums, chunk_counts = bin_scans(depth, chunk[names].to_numpy(), bin_size, n_bins)
+        sums[bins] += chunk_sums
+        counts[bins] += chunk_counts
+    if names is None:
+        return [], np.zeros((n_bins, 0)), np.zeros((n_bins, 0), dtype=np.int64)
+    return names, sums, counts
+
+#%%
+
+### STATION x DEPTH STORE ###
+
+def cast_station_id(path):
+    """Station_ID of a cast from its file name (see `STATION_PATTERN`), or None."""
+    match = STATION_PATTERN.search(os.path.splitext(os.path.basename(path))[0])
+    return int(match.group(1)) if match else None
+
+
+def ingest_ctd(source=CTD_SOURCE, output_name=CTD_OUTPUT, variables=None, bin_size=BIN_SIZE,
+               max_depth=MAX_DEPTH, chunk_scans=CHUNK_SCANS):
+    """
+    Bin all casts of a directory and store them as station x depth arrays.
+
+    Parameters:
+    - source (str): Directory of `.cnv`/`.csv` casts. Defaults to `CTD_SOURCE`.
+    - output_name (str): Output name, saved as '<output_name>.npz'. Defaults to `CTD_OUTPUT`.
+    - variables, bin_size, max_depth, chunk_scans: See `bin_cast`.
+
+    Returns:
+    - str: Path written, or None if there are no casts.
+    """
+    if not os.path.isdir(source):
+        print(f"No CTD directory '{source}', no CTD profiles ingested")
+        return None
+    files = sorted(os.path.join(source, f) for f in os.listdir(source) if f.lower().endswith(CTD_EXTENSIONS))
+    files = [f for f in files if cast_station_id(f) is not None]
+    if not files:
+        print(f"No CTD casts in '{source}'")
+        return None
+
+    # Sums and counts per station, added cast by cast
+    names = [var for var in (CTD_VARIABLES if variables is None else variables) if var != 'Depth']
+    n_bins = int(np.ceil(max_depth / bin_size))
+    stations = sorted({cast_station_id(f) for f in files})
+    row = {station: i for i, station in enumerate(stations)}
+    sums = np.zeros((len(stations), n_bins, len(names)))
+    counts = np.zeros((len(stations), n_bins, len(names)), dtype=np.int64)
+
+    for path in files:
+        cast_names, cast_sums, cast_counts = bin_cast(path, variables, bin_size, max_depth, chunk_scans)
+        cols = [names.index(name) for name in cast_names]
+        i = row[cast_station_id(path)]
+        sums[i][:, cols] += cast_sums
+        counts[i][:, cols] += cast_counts
+        print(f"{os.path.basename(path)}: Station_ID {stations[i]}, {cast_counts.max(initial=0)} scans in the fullest bin")
+
+    # Trim to the deepest bin with data
+    n_used = np.flatnonzero(counts.any(axis=(0, 2)))
+    n_used = n_used[-1] + 1 if len(n_used) else 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, sums / counts, np.nan)[:, :n_used]
+    depth = (np.arange(n_used) + 0.5) * bin_size
+    units = {var: unit for var, unit in CTD_UNITS.items() if var in names or var == 'Depth'}
+    return write_ctd(np.array(stations), depth, {name: means[..., j] for j, name in enumerate(names)}, units,
+                     output_name)
+
+
+def write_ctd(stations, depth, values, units=None, output_name=CTD_OUTPUT):
+    """
+    Save station x depth profiles as '<output_name>.npz'.
+
+    Parameters:
+    - stations (array): Station_ID of each row.
+    - depth (array): Bin centre depths (m).
+    - values (dict): Variable -> station x depth array.
+    - units (dict): Variable -> unit.
+    - output_name (str): Output name. Defaults to `CTD_OUTPUT`.
+
+    Returns:
+    - str: Path written.
+    """
+    path = table_path(output_name, 'npz')
+    np.savez_compressed(path, Station_ID=np.asarray(stations), Depth=np.asarray(depth, dtype=float),
+                        units=np.array(json.dumps(units or {})), **values)
+    return path
+
+
+def load_ctd(output_name=CTD_OUTPUT):
+    """
+    Load the binned CTD profiles.
+
+    Returns:
+    - tuple: (stations, depth, values, units) in the layout of `profile_arrays`: `stations` an Index
+      named 'Station_ID', `depth` a station x depth array, `values` a dict of station x depth arrays
+      per variable and `units` a dict. None if no profiles have been ingested.
+    """
+    path = table_path(output_name, 'npz')
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        stations = pd.Index(data['Station_ID'], name='Station_ID')
+        depth = np.broadcast_to(data['Depth'], (len(stations), len(data['Depth']))).copy()
+        values = {key: data[key] for key in data.files if key not in ('Station_ID', 'Depth', 'units')}
+        units = json.loads(str(data['units']))
+    return stations, depth, values, units
@@ -0,0 +1,44 @@
+"""
+WC17: Ingest Raw CTD Casts as 1 m Binned Profiles
+
+This script is related to the manuscript by Viljoen et al., (Preprint) - see ReadMe at https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- Streams every raw CTD cast (Sea-Bird `.cnv` or `.csv`, Temp, Sal and fluorescence) in the `CTD` directory and bins its downcast to 1 m in constant memory (see `WC17_CTD`).
+- Writes the station x depth profiles keyed by `Station_ID` to "WC17_CTD_1m.npz", which `WC17_Chla_VerticalProfiles` overlays on the bottle profiles and `WC17_FlChla_Calibration` converts to calibrated Chl-a.
+- Does nothing when there is no `CTD` directory.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+from WC17_CTD import ingest_ctd
+
+#%%
+
+### SETTINGS ###
+
+# Directory of raw casts, named with their Station_ID (e.g. 'WC17_CTD_08.cnv')
+source = "CTD"
+
+# Output (station x depth arrays)
+output_name = "WC17_CTD_1m"
+
+# Bin size (m) and scans read per chunk
+bin_size = 1.0
+chunk_scans = 100_000
+
+#%%
+
+### RUN INGEST ###
+
+path = ingest_ctd(source, output_name, bin_size=bin_size, chunk_scans=chunk_scans)
+if path is not None:
+    print(f"Binned CTD profiles written to {path}")
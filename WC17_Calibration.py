@@ -0,0 +1,186 @@
+"""
+WC17: Calibration of Fluorescence Chl-a Against HPLC Tchla
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- `npq_correct` removes non-photochemical quenching from daytime fluorescence profiles (Xing et al., 2012): above the depth of the fluorescence maximum within the mixed layer, values are set to that maximum. All stations are corrected at once on station x depth arrays, so the same function serves bottle and binned CTD profiles.
+- `fit_calibration` fits Fl_Chla -> Tchla per station (or zone) and for all samples pooled ('All'), by ordinary least squares, reduced major axis (Type II) and robust Huber regression. The groups are solved together from weighted sums over (group x sample) arrays; the Huber fit iterates the weights of all groups at once.
+- `apply_calibration` converts fluorescence of any resolution with the fit of each station, falling back to the pooled fit.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import numpy as np
+import pandas as pd
+
+from WC17_MLD import profile_arrays
+
+#%%
+
+### SETTINGS ###
+
+# Regression methods
+METHODS = ['OLS', 'RMA', 'Huber']
+
+# Huber tuning constant (95% efficiency for normal errors) and iterations of the reweighting
+HUBER_K = 1.345
+HUBER_ITER = 30
+
+# Group of the fit over all samples
+POOLED = 'All'
+
+#%%
+
+### NPQ CORRECTION ###
+
+def npq_correct(depth, fl, mld, day):
+    """
+    Non-photochemical quenching correction of daytime fluorescence profiles (Xing et al., 2012).
+
+    Parameters:
+    - depth (array): Station x depth array sorted by depth, padded with NaN (see `profile_arrays`).
+    - fl (array): Fluorescence, same shape as `depth`.
+    - mld (array): Mixed layer depth (m) of each station.
+    - day (array): True for stations sampled in daylight; night profiles are not changed.
+
+    Returns:
+    - array: Corrected fluorescence.
+    """
+    fl = np.array(fl, dtype=float)
+    mld = np.asarray(mld, dtype=float)[:, None]
+    in_ml = (depth <= mld) & ~np.isnan(fl)
+    ml_fl = np.where(in_ml, fl, -np.inf)
+    j = ml_fl.argmax(axis=1)
+    rows = np.arange(len(fl))
+    fl_max, depth_max = fl[rows, j], depth[rows, j]
+
+    quenched = (np.asarray(day, dtype=bool) & in_ml.any(axis=1))[:, None] & (depth < depth_max[:, None]) & ~np.isnan(fl)
+    return np.where(quenched, fl_max[:, None], fl)
+
+#%%
+
+### CALIBRATION ###
+
+def _weighted_fit(x, y, w):
+    # Slope and intercept of weighted least squares for every group (row) at once
+    sw, sx, sy = w.sum(axis=1), (w * x).sum(axis=1), (w * y).sum(axis=1)
+    sxx, sxy = (w * x * x).sum(axis=1), (w * x * y).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (sw * sxy - sx * sy) / (sw * sxx - sx ** 2)
+        intercept = (sy - slope * sx) / sw
+    return slope, intercept
+
+
+def batched_regression(x, y, method='OLS'):
+    """
+    Regression of y on x for every group (row) of padded (group x sample) arrays.
+
+    Parameters:
+    - x, y (array): Group x sample arrays, NaN where there is no sample.
+    - method (str): 'OLS', 'RMA' (reduced major axis, Type II) or 'Huber' (robust). Defaults to 'OLS'.
+
+    Returns:
+    - tuple: (slope, intercept, r2, n) arrays with one value per group.
+
+    Raises:
+    - ValueError: If the method is unknown.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Invalid method. Choose from: {', '.join(METHODS)}")
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    x, y = np.where(valid, x, 0.0), np.where(valid, y, 0.0)
+    w = valid.astype(float)
+    slope, intercept = _weighted_fit(x, y, w)
+
+    if method == 'RMA':
+        n = w.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mx, my = (w * x).sum(axis=1) / n, (w * y).sum(axis=1) / n
+            sxx = (w * (x - mx[:, None]) ** 2).sum(axis=1)
+            syy = (w * (y - my[:, None]) ** 2).sum(axis=1)
+            sxy = (w * (x - mx[:, None]) * (y - my[:, None])).sum(axis=1)
+            slope = np.sign(sxy) * np.sqrt(syy / sxx)
+            intercept = my - slope * mx
+    elif method == 'Huber':
+        for _ in range(HUBER_ITER):
+            resid = np.where(valid, y - (slope[:, None] * x + intercept[:, None]), np.nan)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                scale = 1.4826 * np.nanmedian(np.abs(resid), axis=1, keepdims=True)
+                u = np.abs(resid) / (HUBER_K * scale)
+                w = np.where(valid, np.where(u > 1, 1 / u, 1.0), 0.0)
+            w = np.where(np.isfinite(w), w, valid.astype(float))
+            slope, intercept = _weighted_fit(x, y, w)
+
+    # Explained variance of the fit (unweighted)
+    n = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        my = y.sum(axis=1) / n
+        ss_res = (valid * (y - slope[:, None] * x - intercept[:, None]) ** 2).sum(axis=1)
+        ss_tot = (valid * (y - my[:, None]) ** 2).sum(axis=1)
+        r2 = 1 - ss_res / ss_tot
+    return slope, intercept, r2, n
+
+
+def fit_calibration(df, x_col='Fl_Chla', y_col='Tchla', group_col='Station', methods=None, pooled=True):
+    """
+    Fluorescence -> Tchla fits per group and for all samples pooled.
+
+    Parameters:
+    - df (DataFrame): One row per sample with the group, x and y columns.
+    - x_col (str): Fluorescence column. Defaults to 'Fl_Chla'.
+    - y_col (str): HPLC Chl-a column. Defaults to 'Tchla'.
+    - group_col (str): Station or zone column. Defaults to 'Station'.
+    - methods (list): Regression methods. Defaults to `METHODS`.
+    - pooled (bool): Add the fit of all samples as group 'All'. Defaults to True.
+
+    Returns:
+    - DataFrame: One row per group and method with 'Method', 'Slope', 'Intercept', 'R2' and 'N'.
+    """
+    methods = METHODS if methods is None else methods
+    data = df[[group_col, x_col, y_col]].astype({group_col: object})
+    if pooled:
+        data = pd.concat([data, data.assign(**{group_col: POOLED})], ignore_index=True)
+    # Padded group x sample arrays (the sample order within a group does not matter)
+    data = data.assign(_n=data.groupby(group_col).cumcount())
+    groups, _, values = profile_arrays(data, [x_col, y_col], group_col, depth_col='_n')
+
+    parts = []
+    for method in methods:
+        slope, intercept, r2, n = batched_regression(values[..., 0], values[..., 1], method)
+        parts.append(pd.DataFrame({group_col: groups, 'Method': method, 'Slope': slope,
+                                   'Intercept': intercept, 'R2': r2, 'N': n}))
+    return pd.concat(parts, ignore_index=True)
+
+
+def apply_calibration(fl, groups, fits, method='RMA', group_col='Station'):
+    """
+    Calibrated Chl-a from fluorescence with the fit of each group.
+
+    Parameters:
+    - fl (array): Fluorescence, one row per group (e.g. a station x depth array) or one value per sample.
+    - groups (array): Group of each row of `fl`.
+    - fits (DataFrame): Result of `fit_calibration`.
+    - method (str): Regression method used. Defaults to 'RMA'.
+    - group_col (str): Group column of `fits`. Defaults to 'Station'.
+
+    Returns:
+    - array: Calibrated Chl-a, same shape as `fl`. Groups without a fit use the pooled fit.
+    """
+    fits = fits[fits['Method'] == method].set_index(group_col)
+    coef = fits[['Slope', 'Intercept']].reindex(pd.Index(groups, dtype=object))
+    if POOLED in fits.index:
+        coef = coef.fillna(fits.loc[POOLED, ['Slope', 'Intercept']])
+    slope, intercept = coef['Slope'].to_numpy(), coef['Intercept'].to_numpy()
+    fl = np.asarray(fl, dtype=float)
+    shape = (-1,) + (1,) * (fl.ndim - 1)
+    return slope.reshape(shape) * fl + intercept.reshape(shape)
@@ -0,0 +1,140 @@
+"""
+WC17: Column Catalog and Column-Projected Workbook Loading
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- `build_catalog` reads only the header row of a Zenodo xlsx sheet and records, for each cleaned column name (units and parentheses removed), the original header, its position and its unit.
+- The catalog is saved next to the workbook (`<workbook>.<sheet>.catalog.json`) and rebuilt only when the workbook changes.
+- `read_sheet` loads only the requested columns. It reads them from a Parquet cache of the sheet when available, otherwise it passes the original headers to the sheet reader (`usecols`).
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import json
+import os
+
+import pandas as pd
+
+from WC17_IO import read_table, write_table
+from WC17_Units import parse_units
+
+#%%
+
+### CATALOG FUNCTIONS ###
+
+def _sheet_stem(file_name, sheet_name):
+    stem, _ = os.path.splitext(file_name)
+    return f'{stem}.{sheet_name}'
+
+
+def catalog_path(file_name, sheet_name):
+    """
+    File name of the column catalog for a workbook sheet.
+    """
+    return f'{_sheet_stem(file_name, sheet_name)}.catalog.json'
+
+
+def cache_path(file_name, sheet_name):
+    """
+    File name of the Parquet cache for a workbook sheet.
+    """
+    return f'{_sheet_stem(file_name, sheet_name)}.parquet'
+
+
+def _is_current(path, file_name):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(file_name)
+
+
+def build_catalog(file_name, sheet_name, rebuild=False):
+    """
+    Build (or load) the column catalog of a workbook sheet from its header row.
+
+    Parameters:
+    - file_name (str): xlsx workbook.
+    - sheet_name (str): Sheet to catalog.
+    - rebuild (bool): Rebuild even if a current catalog exists. Defaults to False.
+
+    Returns:
+    - DataFrame: One row per column, indexed by cleaned name, with the original 'header', 'position' and 'unit'.
+
+    Raises:
+    - FileNotFoundError: If the workbook does not exist.
+    """
+    if not os.path.exists(file_name):
+        raise FileNotFoundError(f"File '{file_name}' not found. Ensure the file is in the script's directory or provide the correct path.")
+
+    path = catalog_path(file_name, sheet_name)
+    if not rebuild and _is_current(path, file_name):
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)['columns']
+    else:
+        headers = pd.read_excel(file_name, sheet_name=sheet_name, nrows=0).columns
+        names, units = parse_units(headers)
+        entries = [{'name': name, 'header': str(header), 'position': i, 'unit': units.get(name)}
+                   for i, (name, header) in enumerate(zip(names, headers))]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'workbook': os.path.basename(file_name), 'sheet': sheet_name,
+                       'columns': entries}, f, ensure_ascii=False, indent=1)
+
+    return pd.DataFrame(entries).set_index('name')
+
+
+def catalog_units(catalog):
+    """
+    Column -> unit registry from a catalog.
+    """
+    return catalog['unit'].dropna().to_dict()
+
+
+def read_sheet(file_name, sheet_name, columns=None, cache=True):
+    """
+    Read a workbook sheet with cleaned column names, loading only the requested columns.
+
+    Parameters:
+    - file_name (str): xlsx workbook.
+    - sheet_name (str): Sheet to read.
+    - columns (list): Cleaned column names to load. Defaults to all columns.
+    - cache (bool): Keep a Parquet copy of the sheet and read the columns from it. Defaults to True.
+
+    Returns:
+    - DataFrame: Requested columns, with the unit registry in `df.attrs['units']`.
+
+    Raises:
+    - KeyError: If a requested column is not in the catalog.
+    """
+    catalog = build_catalog(file_name, sheet_name)
+    units = catalog_units(catalog)
+
+    if columns is not None:
+        missing = [col for col in columns if col not in catalog.index]
+        if missing:
+            raise KeyError(f"Columns not in '{sheet_name}': {', '.join(missing)}")
+
+    if cache:
+        path = cache_path(file_name, sheet_name)
+        if not _is_current(path, file_name):
+            # Read the full sheet once into the columnar cache
+            df = pd.read_excel(file_name, sheet_name=sheet_name)
+            df.columns = catalog.index
+            write_table(df, path, publish=False, units=units)
+        df = read_table(path, columns=columns)
+    else:
+        headers = None if columns is None else catalog.loc[columns, 'header'].tolist()
+        df = pd.read_excel(file_name, sheet_name=sheet_name, usecols=headers)
+        lookup = dict(zip(catalog['header'], catalog.index))
+        df.columns = [lookup[str(col)] for col in df.columns]
+        if columns is not None:
+            df = df[columns]
+
+    df.attrs['units'] = {col: unit for col, unit in units.items() if col in df.columns}
+    return df
@@ -0,0 +1,182 @@
+"""
+WC17: Below Detection Limit Values and Censored Statistics
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- `parse_censored` turns text entries such as "<0.02", "<DL" or "BDL" into a numeric value plus a censor flag column ('<col>_cens'), for all numeric-like columns in one pass, instead of losing them to `pd.to_numeric(errors='coerce')`.
+- `ros_fill` imputes the censored values per station by regression on order statistics (ROS), for all stations and columns at once, so the median/MAD tables are not biased by dropping them.
+- ROS follows Helsel (2012) for a single detection limit per station and column: log values of the detected samples are regressed on normal quantiles of their plotting positions and the censored samples get the fitted values at theirs, capped at the detection limit. With fewer than two detected values, censored values are set to half the detection limit.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import re
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from WC17_Schema import DATETIME_COLUMNS, LABEL_COLUMNS
+
+#%%
+
+### SETTINGS ###
+
+# Number with an optional "<" in front and/or a detection limit token, e.g. "<0.02", "<DL", "0.02 BDL", "n.d."
+CENSOR_PATTERN = (r'^\s*(?P<lt><|&lt;|≤)?\s*(?P<num>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)?\s*'
+                  r'(?P<tok>DL|LOD|MDL|BDL|ND|n\.d\.|b\.d\.l\.)?\s*$')
+
+# Suffix of the censor flag columns
+CENSOR_SUFFIX = '_cens'
+
+# Text columns never parsed as numbers
+TEXT_COLUMNS = LABEL_COLUMNS + DATETIME_COLUMNS + ['Sampling_time_UTC']
+
+#%%
+
+### CENSORED DATA FUNCTIONS ###
+
+def parse_censored(df, columns=None):
+    """
+    Parse below detection limit entries into value and censor flag columns.
+
+    A text column is converted when it holds at least one number or censored entry. The value
+    is the reported detection limit ("<0.02" -> 0.02) or NaN when none is given ("<DL"). Other
+    entries (e.g. "-" or "n/a") become NaN and are counted in a warning; blank entries are missing.
+    Columns without any number stay text. Flag columns are added at the end of the table, only
+    for columns with censored entries.
+
+    Parameters:
+    - df (DataFrame): Table with cleaned column names.
+    - columns (list): Columns to parse. Defaults to all text columns except labels, dates and times.
+
+    Returns:
+    - DataFrame: Table with numeric values and '<col>_cens' flag columns.
+    """
+    if columns is None:
+        columns = [col for col in df.columns
+                   if col not in TEXT_COLUMNS
+                   and (df[col].dtype == object or pd.api.types.is_string_dtype(df[col]))]
+    if not columns:
+        return df
+
+    # All entries of all columns in one pass
+    block = df[columns].to_numpy(dtype=object)
+    entries = pd.Series(block.ravel(), dtype=object)
+    text = entries.astype(str)
+    present = (entries.notna() & (text.str.strip() != '')).to_numpy()
+    parts = text.str.extract(CENSOR_PATTERN, flags=re.IGNORECASE)
+    censored = (parts['lt'].notna() | parts['tok'].notna()).to_numpy() & present
+    values = pd.to_numeric(parts['num'], errors='coerce').to_numpy()
+    parsed = present & (censored | ~np.isnan(values))
+
+    shape = block.shape
+    values, censored = values.reshape(shape), censored.reshape(shape)
+    parsed, present = parsed.reshape(shape), present.reshape(shape)
+    numeric = parsed.any(axis=0)
+    unparsed = (present & ~parsed).sum(axis=0)
+
+    for j, col in enumerate(columns):
+        if not numeric[j]:
+            continue
+        if unparsed[j]:
+            print(f"Warning: {unparsed[j]} entries of '{col}' are not numbers or censored values and were set to NaN")
+        df[col] = values[:, j]
+        if censored[:, j].any():
+            df[f'{col}{CENSOR_SUFFIX}'] = censored[:, j]
+    return df
+
+
+def add_censor_flags(df, columns):
+    """
+    Censor flag columns for all `columns`, all False where `parse_censored` found no censored entry.
+
+    Used for tables written in chunks, so every chunk has the same flag columns in the same order.
+
+    Returns:
+    - DataFrame: Table with a '<col>_cens' column for each of `columns`, at the end in `columns` order.
+    """
+    flags = [f'{col}{CENSOR_SUFFIX}' for col in columns]
+    missing = {flag: False for flag in flags if flag not in df.columns}
+    if missing:
+        df = df.assign(**missing)
+    return df[[col for col in df.columns if col not in flags] + flags]
+
+
+def censored_columns(df):
+    """Value columns of `df` that have a censor flag column."""
+    return [col[:-len(CENSOR_SUFFIX)] for col in df.columns
+            if col.endswith(CENSOR_SUFFIX) and col[:-len(CENSOR_SUFFIX)] in df.columns]
+
+
+def ros_fill(df, station_col='Station', drop_flags=True):
+    """
+    Impute censored values per station and column by regression on order statistics.
+
+    Parameters:
+    - df (DataFrame): Table with '<col>_cens' flag columns from `parse_censored`.
+    - station_col (str): Station column. Defaults to 'Station'.
+    - drop_flags (bool): Remove the flag columns from the result. Defaults to True.
+
+    Returns:
+    - DataFrame: Table with censored values replaced by their ROS estimates.
+    """
+    value_cols = censored_columns(df)
+    flag_cols = [f'{col}{CENSOR_SUFFIX}' for col in value_cols]
+    if not value_cols:
+        return df
+
+    # Long form: one row per (sample, column); group = station x column
+    n, k = len(df), len(value_cols)
+    station_code, _ = pd.factorize(df[station_col])
+    values = df[value_cols].to_numpy(dtype=float, copy=True).ravel()
+    cens = df[flag_cols].fillna(False).to_numpy(dtype=bool).ravel()
+    long = pd.DataFrame({'group': np.repeat(station_code, k) * k + np.tile(np.arange(k), n),
+                         'value': values, 'cens': cens})
+    long = long[long['cens'] | long['value'].notna()]
+
+    groups = long.groupby('group')
+    n_obs = groups['value'].transform('size')
+    n_cens = groups['cens'].transform('sum')
+    pc = n_cens / n_obs
+
+    # Plotting positions: censored samples below the detected ones
+    det = long[~long['cens']]
+    rank_det = det.groupby('group')['value'].rank(method='first')
+    rank_cens = long[long['cens']].groupby('group')['value'].rank(method='first', na_option='bottom')
+    n_det = n_obs - n_cens
+    pp = pd.concat([pc[det.index] + (1 - pc[det.index]) * rank_det / (n_det[det.index] + 1),
+                    pc[rank_cens.index] * rank_cens / (n_cens[rank_cens.index] + 1)])
+    long['z'] = norm.ppf(pp.reindex(long.index))
+
+    # Least squares of log(value) on z for the detected samples of each group
+    fit = long[~long['cens'] & (long['value'] > 0)].assign(y=lambda x: np.log(x['value']))
+    sums = (fit.assign(zy=fit['z'] * fit['y'], zz=fit['z'] ** 2)
+            .groupby('group')[['z', 'y', 'zy', 'zz']].sum()
+            .join(fit.groupby('group').size().rename('m')))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (sums['m'] * sums['zy'] - sums['z'] * sums['y']) / (sums['m'] * sums['zz'] - sums['z'] ** 2)
+    intercept = (sums['y'] - slope * sums['z']) / sums['m']
+    slope[sums['m'] < 2] = np.nan
+
+    cens_rows = long[long['cens']]
+    imputed = np.exp(intercept.reindex(cens_rows['group']).to_numpy()
+                     + slope.reindex(cens_rows['group']).to_numpy() * cens_rows['z'].to_numpy())
+    limit = cens_rows['value'].to_numpy()
+    imputed = np.where(np.isnan(imputed), limit / 2, np.fmin(imputed, limit))
+
+    values[cens_rows.index.to_numpy()] = imputed
+    df[value_cols] = values.reshape(n, k)
+    if drop_flags:
+        df = df.drop(columns=flag_cols)
+    return df
@@ -0,0 +1,266 @@
+"""
+WC17: CHEMTAX-Style Phytoplankton Groups from HPLC Marker Pigments
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- Derives the Chl-a of each phytoplankton group (`GROUPS`, the group columns of the compilation) from marker pigments, following CHEMTAX (Mackey et al., 1996): pigment:Chl-a ratios of each group and group Chl-a fractions of each sample are fitted so that the ratios times the fractions reproduce the measured pigments.
+- `batched_nnls` solves the non-negative least squares problem of all samples (and of several ratio matrices) at once by accelerated projected gradient, instead of one `scipy.optimize.nnls` call per sample.
+- `chemtax_ensemble` runs the randomized starting ratio matrices of Higgins et al. (2011): each non-zero seed ratio is scaled by a random factor, every matrix is optimised, and the result is the mean of the best fitting matrices. Matrices are split into fixed blocks that run in worker processes; callers without a `__main__` guard (e.g. `WC17_01`) pass `workers=1`, because worker processes are started by re-importing the calling script on macOS and Windows.
+- `add_groups` writes the group Chl-a into the columns used by the bar plots and the Kendall analysis. `WC17_01` calls it when a sheet has marker pigment columns.
+- `SEED_RATIOS` are generic starting ratios (Mackey et al., 1996; Higgins et al., 2011); adjust them for the region and the pigments measured.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from WC17_Flags import BAD, UNKNOWN, flag_column, flag_columns, worst_flag
+
+#%%
+
+### SETTINGS ###
+
+# Group columns of the compilation, in stored order
+GROUPS = ['Diatoms', 'Coccolithophores', 'Phaeocystis', 'Dinoflagellates', 'Cryptophytes',
+          'Pelagophytes', 'Prasinophytes', 'Chlorophytes', 'Synechococcus', 'Prochlorococcus']
+
+# Marker pigment columns and the Chl-a column (ratio 1 for all groups)
+PIGMENTS = ['Chl_c3', 'Perid', 'But_fuco', 'Fuco', 'Neox', 'Pras', 'Viola', 'Hex_fuco', 'Allo', 'Zea', 'Chl_b', 'DV_Chla']
+CHLA = 'Tchla'
+
+# Starting pigment:Chl-a ratios, one row per group
+SEED_RATIOS = pd.DataFrame(0.0, index=GROUPS, columns=PIGMENTS + [CHLA])
+SEED_RATIOS[CHLA] = 1.0
+for group, ratios in {
+        'Diatoms': {'Fuco': 0.75},
+        'Coccolithophores': {'Chl_c3': 0.18, 'But_fuco': 0.02, 'Fuco': 0.05, 'Hex_fuco': 1.0},
+        'Phaeocystis': {'Chl_c3': 0.2, 'But_fuco': 0.05, 'Fuco': 0.35, 'Hex_fuco': 0.45},
+        'Dinoflagellates': {'Perid': 0.8},
+        'Cryptophytes': {'Allo': 0.4},
+        'Pelagophytes': {'Chl_c3': 0.15, 'But_fuco': 0.8, 'Fuco': 0.5},
+        'Prasinophytes': {'Neox': 0.06, 'Pras': 0.25, 'Viola': 0.05, 'Zea': 0.01, 'Chl_b': 0.7},
+        'Chlorophytes': {'Neox': 0.04, 'Viola': 0.05, 'Zea': 0.05, 'Chl_b': 0.3},
+        'Synechococcus': {'Zea': 0.6},
+        'Prochlorococcus': {'Zea': 0.5, 'Chl_b': 0.1, 'DV_Chla': 1.0}}.items():
+    SEED_RATIOS.loc[group, list(ratios)] = list(ratios.values())
+
+# Ensemble: number of matrices, random spread of the seed ratios (factor 1 + spread * (U - 0.5)),
+# fraction of best matrices averaged and matrices per worker task
+N_MATRICES = 300
+RATIO_SPREAD = 0.7
+BEST_FRACTION = 0.1
+ENSEMBLE_BLOCK = 25
+
+# Weight of Chl-a relative to the marker pigments in the fit
+CHLA_WEIGHT = 10
+
+#%%
+
+### NON-NEGATIVE LEAST SQUARES ###
+
+def batched_nnls(A, B, n_iter=500, tol=1e-9, X0=None):
+    """
+    Solve min ||X A - B|| with X >= 0 for all rows of B at once.
+
+    Accelerated projected gradient (FISTA) with the step from the largest eigenvalue of A A^T.
+
+    Parameters:
+    - A (array): (groups x pigments) matrix, or (matrices x groups x pigments) for several at once.
+    - B (array): (samples x pigments) matrix.
+    - n_iter (int): Maximum number of iterations. Defaults to 500.
+    - tol (float): Stop when the largest change of X is below `tol`. Defaults to 1e-9.
+    - X0 (array): Starting solution, e.g. from the previous ratio matrix. Defaults to zeros.
+
+    Returns:
+    - array: X of shape (samples x groups), or (matrices x samples x groups).
+    """
+    G = A @ np.swapaxes(A, -1, -2)
+    AB = B @ np.swapaxes(A, -1, -2)
+    step = 1 / np.linalg.eigvalsh(G)[..., -1]
+    step = step[..., None, None]
+
+    X = np.zeros(AB.shape) if X0 is None else np.array(X0, dtype=float)
+    Y = X.copy()
+    t = 1.0
+    for _ in range(n_iter):
+        X_new = np.maximum(Y - step * (Y @ G - AB), 0)
+        t_new = (1 + np.sqrt(1 + 4 * t ** 2)) / 2
+        Y = X_new + (t - 1) / t_new * (X_new - X)
+        done = np.abs(X_new - X).max() < tol
+        X, t = X_new, t_new
+        if done:
+            break
+    return X
+
+#%%
+
+### CHEMTAX ###
+
+def chemtax_fit(S, F, weights, n_outer=30, n_iter=50):
+    """
+    Optimise ratio matrices and group fractions for all samples.
+
+    Parameters:
+    - S (array): (samples x pigments) pigment:Chl-a ratios of each sample, Chl-a last.
+    - F (array): (matrices x groups x pigments) starting ratio matrices, Chl-a last (ratio 1).
+    - weights (array): Weight of each pigment in the fit.
+    - n_outer (int): Alternating fraction/ratio updates. Defaults to 30.
+    - n_iter (int): NNLS iterations per update, each starting from the previous fractions. Defaults to 50.
+
+    Returns:
+    - tuple: (rmse, F, C) with the weighted RMS residual per matrix, the optimised ratio
+      matrices and the (matrices x samples x groups) Chl-a fractions.
+    """
+    mask = F > 0
+    Sw = S * weights
+    C = batched_nnls(F * weights, Sw, 10 * n_iter)
+    for _ in range(n_outer):
+        # Ratio update: multiplicative step on the non-zero ratios, Chl-a ratio kept at 1
+        Fw = F * weights
+        num = np.swapaxes(C, -1, -2) @ Sw
+        den = np.swapaxes(C, -1, -2) @ C @ Fw
+        F = np.where(mask, Fw * num / np.maximum(den, 1e-12), 0) / weights
+        F[..., -1] = 1.0
+        C = batched_nnls(F * weights, Sw, n_iter, X0=C)
+    rmse = np.sqrt(((C @ (F * weights) - Sw) ** 2).mean(axis=(-2, -1)))
+    return rmse, F, C
+
+
+def _ensemble_block(S, seed_ratios, weights, spread, seed, n, n_outer, n_iter):
+    # Random starting matrices of one block and their fits
+    rng = np.random.default_rng(seed)
+    F = seed_ratios * (1 + spread * (rng.random((n,) + seed_ratios.shape) - 0.5))
+    F[..., -1] = 1.0
+    return chemtax_fit(S, F, weights, n_outer, n_iter)
+
+
+def chemtax_ensemble(pigments, chla, seed_ratios, n=N_MATRICES, spread=RATIO_SPREAD, best=BEST_FRACTION,
+                     weights=None, seed=0, workers=None, block=ENSEMBLE_BLOCK, n_outer=30, n_iter=50):
+    """
+    Group Chl-a from marker pigments with a randomized ensemble of starting ratio matrices.
+
+    Matrices are split into blocks of `block` that run in worker processes when there is more
+    than one; results do not depend on the number of workers.
+
+    Parameters:
+    - pigments (array): (samples x pigments) marker pigment concentrations.
+    - chla (array): Chl-a of each sample, in the same units.
+    - seed_ratios (array): (groups x pigments+1) starting pigment:Chl-a ratios, Chl-a last.
+    - n (int): Number of starting matrices. Defaults to `N_MATRICES`.
+    - spread (float): Random spread of the seed ratios. Defaults to `RATIO_SPREAD`.
+    - best (float): Fraction of best fitting matrices averaged. Defaults to `BEST_FRACTION`.
+    - weights (array): Weight of each pigment. Defaults to 1 / mean ratio, with Chl-a weighted by `CHLA_WEIGHT`.
+    - seed (int): Random seed. Defaults to 0.
+    - workers (int): Worker processes. Defaults to the number of CPUs; 1 runs in this process.
+    - block (int): Matrices per worker task. Defaults to `ENSEMBLE_BLOCK`.
+    - n_outer, n_iter (int): See `chemtax_fit`.
+
+    Returns:
+    - tuple: (groups, ratios, rmse) with the (samples x groups) Chl-a of each group, the mean
+      ratio matrix of the best matrices and the RMS residual of every matrix.
+    """
+    S = np.column_stack([pigments, chla]) / chla[:, None]
+    if weights is None:
+        weights = 1 / np.maximum(S.mean(axis=0), 1e-6)
+        weights[-1] *= CHLA_WEIGHT
+
+    sizes = [min(block, n - i) for i in range(0, n, block)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = ([S] * len(sizes), [seed_ratios] * len(sizes), [weights] * len(sizes), [spread] * len(sizes),
+            seeds, sizes, [n_outer] * len(sizes), [n_iter] * len(sizes))
+    if workers == 1 or len(sizes) == 1:
+        results = list(map(_ensemble_block, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_ensemble_block, *args))
+    rmse = np.concatenate([r[0] for r in results])
+    F = np.concatenate([r[1] for r in results])
+    C = np.concatenate([r[2] for r in results])
+
+    keep = np.argsort(rmse)[:max(1, int(round(best * n)))]
+    return C[keep].mean(axis=0) * chla[:, None], F[keep].mean(axis=0), rmse
+
+
+def pigment_columns(df):
+    """Marker pigment columns of `PIGMENTS` in `df`."""
+    return [col for col in PIGMENTS if col in df.columns]
+
+
+def add_groups(df, seed_ratios=None, overwrite=False, units=None, **kwargs):
+    """
+    Write CHEMTAX group Chl-a into the group columns.
+
+    All samples with Chl-a above zero and every marker pigment present (and none flagged bad) are fitted together.
+    Group columns missing from the table are added at the end.
+
+    Parameters:
+    - df (DataFrame): Table with marker pigment columns and Chl-a (`CHLA`).
+    - seed_ratios (DataFrame): Starting ratios, one row per group. Defaults to `SEED_RATIOS`,
+      limited to the pigments in the table.
+    - overwrite (bool): Replace group values given in the sheet. Defaults to False, which only
+      fills samples without any group value.
+    - units (dict): Column -> unit registry, updated in place (groups take the Chl-a unit).
+    - kwargs: Passed to `chemtax_ensemble` (e.g. n, workers, seed).
+
+    Returns:
+    - DataFrame: Table with the group columns (and their flags, the worst flag of the pigments).
+    - DataFrame: Fitted pigment:Chl-a ratio matrix, one row per group.
+
+    Raises:
+    - ValueError: If no sample can be fitted.
+    """
+    pigments = pigment_columns(df)
+    if seed_ratios is None:
+        seed_ratios = SEED_RATIOS
+    seed_ratios = seed_ratios[pigments + [CHLA]]
+    # Groups without a marker among the measured pigments cannot be told apart
+    seed_ratios = seed_ratios[(seed_ratios[pigments] > 0).any(axis=1)]
+    groups = list(seed_ratios.index)
+
+    chla = df[CHLA].to_numpy(dtype=float)
+    values = df[pigments].to_numpy(dtype=float)
+    flagged = bool(flag_columns(df, pigments + [CHLA]))
+    worst = worst_flag(df, pigments + [CHLA]) if flagged else None
+    fit = (chla > 0) & ~np.isnan(values).any(axis=1)
+    if flagged:
+        fit &= worst < BAD
+    if not fit.any():
+        raise ValueError("No sample has Chl-a and all marker pigments.")
+    result, ratios, rmse = chemtax_ensemble(values[fit], chla[fit], seed_ratios.to_numpy(), **kwargs)
+    print(f"CHEMTAX: {fit.sum()} samples, best RMS residual {rmse.min():.4f} of {len(rmse)} matrices")
+
+    for col in groups:
+        if col not in df.columns:
+            df[col] = np.nan
+    rows = fit if overwrite else fit & df[groups].isna().all(axis=1).to_numpy()
+    block = df[groups].to_numpy(dtype=float, copy=True)
+    block[rows] = result[rows[fit]]
+    df[groups] = block
+
+    # Fitted groups take the worst flag of the pigments
+    if flagged:
+        for col in groups:
+            if flag_column(col) in df.columns:
+                flags = df[flag_column(col)].fillna(UNKNOWN).to_numpy(dtype=np.uint8, copy=True)
+            else:
+                flags = np.full(len(df), UNKNOWN, dtype=np.uint8)
+            flags[rows] = worst[rows]
+            df[flag_column(col)] = flags
+
+    if units is not None and CHLA in units:
+        for col in groups:
+            units[col] = units[CHLA]
+    return df, pd.DataFrame(ratios, index=pd.Index(groups, name='Group'), columns=pigments + [CHLA])
@@ -7,24 +7,29 @@ This script is related to the manuscript by Viljoen et al. (Preprint).
 For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
 
 ### Description
-- Before running this script, execute `WC17_01` to process the original data files which creates "WC17_DataComp_update.csv" used here.
+- Only Station, Station_ID, Depth and Tchla are needed, so they are read straight from the Zenodo xlsx through its column catalog (`WC17_Catalog`); running `WC17_01` first is not required.
+- Where `WC17_CTD_Ingest` has binned CTD casts ("WC17_CTD_1m.npz"), the continuous 1 m fluorescence profiles are drawn as thin lines behind the bottle data, calibrated to Tchla if `WC17_FlChla_Calibration` has been run.
+- Tchla values more than 3.5 scaled MADs from the median of all stations in their depth bin (0-50, 50-100, 100-150 m, see `WC17_Outliers`) are circled, so the normal decline of Tchla with depth is not taken for outliers.
 - Required data: Two XLSX files available from Zenodo: https://doi.org/10.5281/zenodo.6615070.
 
 ### Author
 Johan Viljoen - j.j.viljoen@exeter.ac.uk
 
 ### Last Updated
-20 Jan 2025
+19 October 2026
 """
 
 #%%
 
 ### IMPORT PACKAGES ###
 
-import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib import rcParams
 
+from WC17_CTD import load_ctd
+from WC17_Dataset import Dataset
+from WC17_Outliers import MAD_K, depth_bins, mad_outliers
+
 # Set the default font to Arial
 rcParams['font.family'] = 'sans-serif'
 rcParams['font.sans-serif'] = ['Arial']
@@ -32,24 +37,18 @@ rcParams['font.sans-serif'] = ['Arial']
 
 #%%
 
-#File name
-file = "WC17_DataComp_update.csv"
-
-# Read CSV
-tbl = pd.read_csv(file)
-tbl.info()
-
-tbl.dropna(subset = ['Cruise'], inplace=True)
+# Specify the data file and sheet name
+file_name = "WC17_DataComp_150m_Viljoen_Zenodo.xlsx"
+sheet_name = "WC17_Data_150m"
 
 # Select Columns
-
 keep_list = ['Station','Station_ID', 'Depth','Tchla']
 
-tbl_chla = tbl[keep_list]
-
-df = tbl_chla.copy()
+# Rows with a Cruise entry, loading only the columns used here
+df = Dataset.from_workbook(file_name, sheet_name).dropna('Cruise').columns(keep_list).to_frame()
+df.info()
 
-df['Station_lbl'] = df['Station']
+df['Station_lbl'] = df['Station'].astype(object)
 # Replace station codes with labels
 station_mapping = {'IO08': 'St. 41.0°S', 'IO07': 'St. 43.0°S', 'IO06': 'St. 45.5°S',
                    'IO05': 'St. 48.0°S', 'IO04': 'St. 50.6°S', 'IO03': 'St. 53.5°S',
@@ -62,6 +61,9 @@ plot_list = ['Station_ID','Station_lbl', 'Depth','Tchla']
 
 df = df[plot_list]
 
+# Tchla outliers among the samples of all stations in the same depth bin (see WC17_Outliers)
+outliers = mad_outliers(df, ['Tchla'], by=depth_bins(df['Depth']))['Tchla']
+
 # Plot Vertical line graph #
 
 phyto_tbl_8 = (df[df['Station_ID'] == 8].drop('Station_ID', axis=1))
@@ -98,6 +100,22 @@ phyto_tbl_2.plot(ax=axs,x='Tchla', y='Depth', label='St. 56.0°S',
                  kind='line', color='blue', marker = 'o', linewidth=1.1)
 phyto_tbl_1.plot(ax=axs,x='Tchla', y='Depth', label='St. 58.5°S',
                  kind='line', color='darkviolet', marker = 'o', linewidth=1.1)
+# Circle screened outliers (only added to the legend when there are any)
+if outliers.any():
+    axs.scatter(df.loc[outliers, 'Tchla'], df.loc[outliers, 'Depth'], s=160, facecolors='none',
+                edgecolors='black', linewidths=1.5, zorder=4, label=f'Outlier (>{MAD_K:g} MAD)')
+# Continuous CTD profiles (1 m bins, see WC17_CTD) in the station colours, left out of the legend
+station_colors = {8: 'red', 7: 'silver', 6: 'dimgray', 5: 'limegreen',
+                  4: 'c', 3: 'dodgerblue', 2: 'blue', 1: 'darkviolet'}
+ctd = load_ctd()
+if ctd is not None:
+    ctd_stations, ctd_depth, ctd_values, _ = ctd
+    ctd_var = 'Fl_Chla_cal' if 'Fl_Chla_cal' in ctd_values else 'Fl'
+    for station_id, color in station_colors.items():
+        if station_id in ctd_stations and ctd_var in ctd_values:
+            i = ctd_stations.get_loc(station_id)
+            axs.plot(ctd_values[ctd_var][i], ctd_depth[i], color=color, linewidth=0.6, alpha=0.6,
+                     label='_nolegend_', zorder=1)
 # Set Depth Range
 axs.set_ylim(160,0)
 # Move x-axis to the top
@@ -6,39 +6,51 @@ For more details, refer to the project ReadMe: https://github.com/jjviljoen/Wint
 
 ### Description
 - This script generates tables with Medians and Median Absolute deviation (MAD) based on processed data.
-- Before running this script, execute `WC17_01` to process the original data files which creates "WC17_DataComp_update.csv" used here.
+- Values with a bad quality flag are left out of all tables. The composition columns (Phaeo_Chla, Cyanobacteria, % of Tchla) are stored by `WC17_01` with the worst flag of their inputs (see `WC17_Phyto` and `WC17_Flags`).
+- Tchla, Fl_Chla and their ratio are also summarised by day/night and local solar hour ('WC17_DataComp_Diel_median', 'WC17_DataComp_SolarHour_median').
+- Before running this script, execute `WC17_01` to process the original data files which creates "WC17_DataComp_update.parquet" used here.
 - Required data: Two XLSX files available from Zenodo: https://doi.org/10.5281/zenodo.6615070.
 
 ### Author
 Johan Viljoen - j.j.viljoen@exeter.ac.uk
 
 ### Last Updated
-17 July 2025
+19 October 2026
 """
 
 #%%
 
 ### IMPORT PACKAGES ###
 
-import pandas as pd
 from scipy.stats import describe, median_abs_deviation
 
+from WC17_Censored import ros_fill
+from WC17_Dataset import Dataset
+from WC17_Diel import add_solar_time
+from WC17_Flags import BAD, flag_column, mask_flagged
+from WC17_Incremental import update_station_table
+from WC17_IO import write_table
+from WC17_Phyto import percent_columns, safe_divide
+from WC17_QC import qc_pass
+from WC17_Schema import memory_report
+
 #%%
 
 #File name
-file = "WC17_DataComp_update.csv"
+file = "WC17_DataComp_update"
 
-# Read CSV
-tbl = pd.read_csv(file)
-tbl.info()
+# Lazy view of the compiled dataset
+dc = Dataset(file)
 
-#%%
+# Mixed layer rows (ML is "IN") without Depth, loaded once
+tbl_ml2 = dc.ml().drop('Depth', 'Station Label').to_frame()
 
-# Filter rows where ML is "IN"
-tbl_ml = tbl[tbl['ML'] == 'IN']
+# Values flagged bad are excluded from all tables; the flags are kept for the derived columns (see WC17_Flags)
+tbl_ml2 = mask_flagged(tbl_ml2, exclude=BAD, drop_flags=False)
 
-# Remove Depth and ML columns
-tbl_ml = tbl_ml.drop(columns=['ML'])
+# Below detection limit values (flagged by WC17_01) are imputed per station by regression on order statistics
+tbl_ml2 = ros_fill(tbl_ml2)
+memory_report(tbl_ml2)
 
 #%%
 
@@ -90,125 +102,106 @@ def median_tbl_n(data, d):
     val = f'{dec_place(m, d)} ± {dec_place(mad, d)} ({n})'
     return val
 
-def av_table(df,summary_type='mean', d=2):
+def av_table(df,summary_type='mean', d=2, by='Station'):
     # Read CSV file
     data = df
+    # Grouped by `by`: 'Station', or time bins such as 'Diel' or 'Solar_bin' (see WC17_Diel), alone or next to 'Station'
     # Calculate mean and standard deviation per column
     #d = 6  # Number of decimal places
     
     if summary_type =='mean':
-        data_av = data.groupby('Station').agg(lambda x: mean_only(x, d))
+        data_av = data.groupby(by, observed=True).agg(lambda x: mean_only(x, d))
     elif summary_type =='mean_sd':
-        data_av = data.groupby('Station').agg(lambda x: mean_sd(x, d))
+        data_av = data.groupby(by, observed=True).agg(lambda x: mean_sd(x, d))
     elif summary_type =='median':
-        data_av = data.groupby('Station').agg(lambda x: median_tbl(x, d))
+        data_av = data.groupby(by, observed=True).agg(lambda x: median_tbl(x, d))
     elif summary_type =='median_n':
-        data_av = data.groupby('Station').agg(lambda x: median_tbl_n(x, d))
+        data_av = data.groupby(by, observed=True).agg(lambda x: median_tbl_n(x, d))
     else:
         raise ValueError("Invalid summary_type. Choose 'mean' or 'median'.")
     # Reverse the order of rows based on the 'Station' column
-    data_av = data_av.sort_values(by='Station', ascending=True).reset_index(drop=False)
+    data_av = data_av.sort_values(by=by, ascending=True).reset_index(drop=False)
 
     return data_av
 
 #%%
 
-# Convert dCd from pmol to nmol
-tbl_ml['dCd'] = tbl_ml['dCd']/1000
-
-# Convert pMn from nmol to pmol
-tbl_ml['pMn'] = tbl_ml['pMn']*1000
-
-# Remove Depth columns
-tbl_ml2 = tbl_ml.drop(columns=['Depth'])
+# dCd (nmol) and pMn (pmol) units are already converted by `WC17_01`
+units = dc.units
 
 # Replace station codes with labels
-tbl_ml2['Station_lbl'] = tbl_ml2['Station']
 station_mapping = {'IO08': 'St. 41.0°S', 'IO07': 'St. 43.0°S', 'IO06': 'St. 45.5°S',
                    'IO05': 'St. 48.0°S', 'IO04': 'St. 50.6°S', 'IO03': 'St. 53.5°S',
                    'IO02': 'St. 56.0°S', 'IO01': 'St. 58.5°S'}
-tbl_ml2['Station'] = tbl_ml2['Station_lbl'].replace(station_mapping)
-tbl_ml2.drop(columns=['Station_lbl','Station Label'], inplace=True)
+tbl_ml2['Station'] = tbl_ml2['Station'].astype(object).replace(station_mapping)
 
 tbl_ml2.info()
 #%%
 
 # MainText Table1
 list_1 = ['Station','Temp', 'Tchla', 'POC', 'Nitrate', 'Phosphate', 'Silica']
-tbl_ml2_stats =  av_table(tbl_ml2[list_1],summary_type='median')
-#Save df
-output_filename = 'WC17_DataComp_Table1_median.xlsx'
-tbl_ml2_stats.to_excel(output_filename, index=False)
-
-tbl_ml2['PhaeoTotal'] = tbl_ml2['Phorb_a'] + tbl_ml2['Phytin_a']
-tbl_ml2['Phaeo_Chla'] = tbl_ml2['PhaeoTotal']/tbl_ml2['Tchla']
+#Save df (only stations changed since the last run are recomputed)
+output_filename = 'WC17_DataComp_Table1_median'
+tbl_ml2_stats = update_station_table(tbl_ml2[list_1], lambda df: av_table(df, summary_type='median'),
+                                     output_filename, file, mapping=station_mapping, units=units)
 
-# Tchla & Fchla for Table S3
+# Tchla & Fchla for Table S3 (Phaeo_Chla stored by WC17_01, see WC17_Phyto)
 list_1 = ['Station','Tchla', 'Fl_Chla', 'Phaeo_Chla']
-tbl_ml2_stats =  av_table(tbl_ml2[list_1],summary_type='median')
 #Save df
-output_filename = 'WC17_DataComp_TchlaFchla_median.xlsx'
-tbl_ml2_stats.to_excel(output_filename, index=False)
+output_filename = 'WC17_DataComp_TchlaFchla_median'
+tbl_ml2_stats = update_station_table(tbl_ml2[list_1], lambda df: av_table(df, summary_type='median'),
+                                     output_filename, file, mapping=station_mapping, units=units)
 
 #%%
 
-# Calculate Percentage Phytoplankton for Mixed layer
+# Tchla & Fchla by day/night and local solar time: non-photochemical quenching lowers Fl_Chla in daylight.
+# Solar hour and day/night from the sampling datetime (UTC) and position (see WC17_Diel)
+tbl_ml2 = add_solar_time(tbl_ml2)
+tbl_ml2['Fl_Chla_Tchla'] = safe_divide(tbl_ml2['Fl_Chla'], tbl_ml2['Tchla'])
 
-# Select stations and Phytoplankton columns
-tbl_ml2_phyto = tbl_ml2.loc[:, ['Station', 'Tchla'] + list(tbl_ml2.loc[:, 'Diatoms':'Prochlorococcus'].columns)]
+list_1 = ['Tchla', 'Fl_Chla', 'Fl_Chla_Tchla']
+#Save df
+output_filename = 'WC17_DataComp_Diel_median'
+tbl_diel = av_table(tbl_ml2[['Diel'] + list_1], summary_type='median_n', by='Diel')
+write_table(tbl_diel, output_filename, units=units)
+print(tbl_diel)
 
-# Sum Cyano columns
-tbl_ml2_phyto['Cyanobacteria'] = tbl_ml2_phyto['Synechococcus'] + tbl_ml2_phyto['Prochlorococcus']
+output_filename = 'WC17_DataComp_SolarHour_median'
+tbl_solar = av_table(tbl_ml2[['Solar_bin'] + list_1], summary_type='median_n', by='Solar_bin')
+write_table(tbl_solar, output_filename, units=units)
 
-# Drop Syn and Prochloro
-tbl_ml2_phyto.drop(columns=['Synechococcus', 'Prochlorococcus'], inplace=True)
+#%%
+
+# Percentage Phytoplankton for Mixed layer
 
-# Calculate percentage of each group in Tchla and create new columns
-for col in tbl_ml2_phyto.columns:
-    if col not in ['Station', 'Tchla']:
-        tbl_ml2_phyto[f"{col}_P"] = tbl_ml2_phyto[col] / tbl_ml2_phyto['Tchla'] * 100
-        
-# Select stations and Phytoplankton columns
-tbl_ml2_phyto_P = tbl_ml2_phyto.loc[:, ['Station'] + list(tbl_ml2_phyto.loc[:, 'Diatoms_P':'Cyanobacteria_P'].columns)]
+# Select stations and % of Tchla columns (stored by WC17_01 with Cyanobacteria replacing Syn and Prochloro, see WC17_Phyto)
+# (samples with Tchla of 0 are left out, see the 'tchla_zero' QC rule)
+P_cols = percent_columns()
+tbl_ml2_phyto_P = tbl_ml2.loc[qc_pass(tbl_ml2, ['tchla_zero']), ['Station'] + P_cols]
 tbl_ml2_phyto_P.info()
 
 
-tbl_ml2_phyto_P_stats =  av_table(tbl_ml2_phyto_P,summary_type='median', d=1)
 #Save df
-output_filename = 'WC17_DataComp_PhytoPercent_median.xlsx'
-tbl_ml2_phyto_P_stats.to_excel(output_filename, index=False)
+output_filename = 'WC17_DataComp_PhytoPercent_median'
+tbl_ml2_phyto_P_stats = update_station_table(tbl_ml2_phyto_P, lambda df: av_table(df, summary_type='median', d=1),
+                                             output_filename, file, mapping=station_mapping)
 
 #%%
 
-# Calculate Percentage Phytoplankton for upper 150m
+# Percentage Phytoplankton for upper 150m
+
+# Select stations and % of Tchla columns with their flags (only these columns are loaded, samples with Tchla of 0 left out)
+P_flags = [flag_column(col) for col in P_cols if flag_column(col) in dc.all_columns]
+tbl_phyto_P = dc.qc(['tchla_zero']).columns(['Station', 'Depth'] + P_cols + P_flags).to_frame()
 
-# Select stations and Phytoplankton columns
-tbl_phyto = tbl.loc[:, ['Station', 'Depth','Tchla'] + list(tbl_ml2.loc[:, 'Diatoms':'Prochlorococcus'].columns)]
+# Values flagged bad are excluded, the flags of the % columns are kept in the table
+tbl_phyto_P = mask_flagged(tbl_phyto_P, exclude=BAD, drop_flags=False)
 
 # Replace station codes with labels
-tbl_phyto['Station_lbl'] = tbl_phyto['Station']
-station_mapping = {'IO08': 'St. 41.0°S', 'IO07': 'St. 43.0°S', 'IO06': 'St. 45.5°S',
-                   'IO05': 'St. 48.0°S', 'IO04': 'St. 50.6°S', 'IO03': 'St. 53.5°S',
-                   'IO02': 'St. 56.0°S', 'IO01': 'St. 58.5°S'}
-tbl_phyto['Station'] = tbl_phyto['Station_lbl'].replace(station_mapping)
-tbl_phyto.drop(columns=['Station_lbl'], inplace=True)
-
-# Sum Cyano columns
-tbl_phyto['Cyanobacteria'] = tbl_phyto['Synechococcus'] + tbl_phyto['Prochlorococcus']
-
-# Drop Syn and Prochloro
-tbl_phyto.drop(columns=['Synechococcus', 'Prochlorococcus'], inplace=True)
-
-# Calculate percentage of each group in Tchla and create new columns
-for col in tbl_phyto.columns:
-    if col not in ['Station', 'Tchla']:
-        tbl_phyto[f"{col}_P"] = tbl_phyto[col] / tbl_phyto['Tchla'] * 100
-        
-# Select stations and Phytoplankton columns
-tbl_phyto_P = tbl_phyto.loc[:, ['Station', 'Depth'] + list(tbl_phyto.loc[:, 'Diatoms_P':'Cyanobacteria_P'].columns)]
+tbl_phyto_P['Station'] = tbl_phyto_P['Station'].astype(object).replace(station_mapping)
 tbl_phyto_P.info()
 
 #Save df
-output_filename = 'WC17_DataComp_PhytoPercent_150m.xlsx'
-tbl_phyto_P.to_excel(output_filename, index=False)
+output_filename = 'WC17_DataComp_PhytoPercent_150m'
+write_table(tbl_phyto_P, output_filename)
 
@@ -0,0 +1,215 @@
+"""
+WC17: Lazy Dataset Views for the Compiled Datasets
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- `Dataset` describes a subset of a compiled dataset (column projection plus row filters) without loading anything.
+- Calls such as `Dataset(file).ml().qc().drop('Depth')` only build up the description.
+- `to_frame()` loads just the projected and filter columns from the Parquet file (or selects them from an in-memory table), applies the row mask once and caches the result.
+- `flagged()` sets values with a bad quality flag to NaN while loading (see `WC17_Flags`).
+- `Dataset.from_workbook(file, sheet)` reads straight from a Zenodo xlsx sheet through its column catalog (see `WC17_Catalog`).
+- Views are loaded with copy-on-write (the default from pandas 3.0, set only while loading on older pandas), so the projection and row filters do not copy the loaded columns.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+from contextlib import nullcontext
+
+import pandas as pd
+
+from WC17_Catalog import build_catalog, catalog_units, read_sheet
+from WC17_Flags import BAD, flag_column, is_flag_column, mask_flagged
+from WC17_IO import read_schema, read_table, read_units
+from WC17_QC import QC_COLUMN, rule_bits
+from WC17_Schema import apply_schema
+
+# Copy-on-write is always on from pandas 3.0
+COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3
+
+
+def _copy_on_write():
+    # Copy-on-write while a view is loaded, without changing the global pandas options
+    return nullcontext() if COPY_ON_WRITE else pd.option_context('mode.copy_on_write', True)
+
+#%%
+
+### DATASET ###
+
+# Supported row filter operators
+FILTER_OPS = {
+    '==': lambda s, v: s == v,
+    '!=': lambda s, v: s != v,
+    '<': lambda s, v: s < v,
+    '<=': lambda s, v: s <= v,
+    '>': lambda s, v: s > v,
+    '>=': lambda s, v: s >= v,
+    'in': lambda s, v: s.isin(v),
+    'notna': lambda s, v: s.notna(),
+    'bits_clear': lambda s, v: (s.astype('uint32') & v) == 0,
+}
+
+
+class Dataset:
+    """
+    Lazily evaluated view of a compiled dataset.
+
+    Parameters:
+    - source (str, tuple or DataFrame): Table name of a Parquet file written by `WC17_01`,
+      a (workbook, sheet) pair (see `from_workbook`), or an in-memory table.
+    - float32 (bool): Hold concentration columns as float32 when loading from file. Defaults to False.
+
+    Example:
+    - `Dataset('WC17_TM_Comp_update').ml().columns(['Station', 'dFe']).to_frame()`
+    """
+
+    def __init__(self, source, float32=False, _columns=None, _filters=(), _exclude=None):
+        self.source = source
+        self.float32 = float32
+        self._columns = _columns
+        self._filters = tuple(_filters)
+        self._exclude = _exclude
+        self._frame = None
+
+    @classmethod
+    def from_workbook(cls, file_name, sheet_name, float32=False):
+        """View of a Zenodo xlsx sheet, read through its column catalog."""
+        return cls((file_name, sheet_name), float32=float32)
+
+    def _derive(self, columns=None, filters=(), exclude=None):
+        if columns is None:
+            columns = self._columns
+        if exclude is None:
+            exclude = self._exclude
+        return Dataset(self.source, self.float32, _columns=columns,
+                       _filters=self._filters + tuple(filters), _exclude=exclude)
+
+    @property
+    def all_columns(self):
+        """Column names of the underlying table, in stored order."""
+        if isinstance(self.source, pd.DataFrame):
+            return list(self.source.columns)
+        if isinstance(self.source, tuple):
+            return list(build_catalog(*self.source).index)
+        return read_schema(self.source).names
+
+    @property
+    def names(self):
+        """Column names this view will return."""
+        names = self.all_columns if self._columns is None else list(self._columns)
+        if self._exclude is not None:
+            names = [col for col in names if not is_flag_column(col)]
+        return names
+
+    @property
+    def units(self):
+        """Column -> unit registry of the underlying table."""
+        if isinstance(self.source, pd.DataFrame):
+            return dict(self.source.attrs.get('units', {}))
+        if isinstance(self.source, tuple):
+            return catalog_units(build_catalog(*self.source))
+        return read_units(self.source)
+
+    def column_range(self, start, stop):
+        """Column names from `start` to `stop` (inclusive) in stored order, like `df.loc[:, start:stop]`."""
+        names = self.all_columns
+        return names[names.index(start):names.index(stop) + 1]
+
+    # Projections
+
+    def columns(self, columns):
+        """View with only `columns`, in the given order."""
+        return self._derive(columns=list(columns))
+
+    def drop(self, *columns):
+        """View without `columns`."""
+        return self._derive(columns=[col for col in self.names if col not in columns])
+
+    # Row filters
+
+    def where(self, column, op, value=None):
+        """View with rows where `column op value` holds, e.g. `where('Depth', '<=', 150)`."""
+        if op not in FILTER_OPS:
+            raise ValueError(f"Invalid op. Choose from: {', '.join(FILTER_OPS)}")
+        return self._derive(filters=[(column, op, value)])
+
+    def dropna(self, column):
+        """View with rows where `column` is not missing."""
+        return self.where(column, 'notna')
+
+    def qc(self, rules=None):
+        """View of the rows passing the QC `rules` (default all), from the stored QC flags (see `WC17_QC`)."""
+        return self.where(QC_COLUMN, 'bits_clear', rule_bits(rules))
+
+    def ml(self):
+        """View of the mixed layer samples (`ML == 'IN'`), without the ML column."""
+        view = self.where('ML', '==', 'IN')
+        if 'ML' in view.names:
+            view = view.drop('ML')
+        return view
+
+    # Quality flags
+
+    def flagged(self, exclude=BAD):
+        """View with values flagged `exclude` or worse set to NaN, without the flag columns (see `WC17_Flags`)."""
+        return self._derive(exclude=exclude)
+
+    # Materialise
+
+    def to_frame(self):
+        """
+        Load the view. Only the projected and filter columns are read, the row mask
+        is evaluated once over those columns, and the result is cached.
+        """
+        if self._frame is not None:
+            return self._frame
+
+        with _copy_on_write():
+            out_cols = self.names
+            flag_cols = []
+            if self._exclude is not None:
+                available = set(self.all_columns)
+                flag_cols = [flag_column(col) for col in out_cols if flag_column(col) in available]
+            filter_cols = [col for col, _, _ in self._filters if col not in out_cols + flag_cols]
+            needed = out_cols + flag_cols + list(dict.fromkeys(filter_cols))
+
+            if isinstance(self.source, pd.DataFrame):
+                df = self.source[needed]
+            elif isinstance(self.source, tuple):
+                df = apply_schema(read_sheet(*self.source, columns=needed), float32=self.float32)
+            else:
+                df = apply_schema(read_table(self.source, columns=needed), float32=self.float32)
+
+            if self._filters:
+                mask = pd.Series(True, index=df.index)
+                for col, op, value in self._filters:
+                    mask &= FILTER_OPS[op](df[col], value).fillna(False).astype(bool)
+                df = df.loc[mask.to_numpy(), out_cols + flag_cols]
+            elif filter_cols:
+                df = df[out_cols + flag_cols]
+            if flag_cols:
+                df = mask_flagged(df, exclude=self._exclude)
+
+            df = df.reset_index(drop=True)
+            # Without global copy-on-write, edits of the result must not reach an in-memory source
+            if isinstance(self.source, pd.DataFrame) and not COPY_ON_WRITE:
+                df = df.copy()
+        units = self.units
+        df.attrs['units'] = {col: units[col] for col in out_cols if col in units}
+        self._frame = df
+        return self._frame
+
+    def __repr__(self):
+        filters = ', '.join(f'{col} {op} {value!r}' if op != 'notna' else f'{col} notna'
+                            for col, op, value in self._filters)
+        source = 'DataFrame' if isinstance(self.source, pd.DataFrame) else self.source
+        return f"Dataset({source!r}, columns={len(self.names)}, filters=[{filters}])"
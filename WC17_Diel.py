@@ -0,0 +1,124 @@
+"""
+WC17: Local Solar Time and Day/Night of Each Sample
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- `add_solar_time` adds the local apparent solar hour ('Solar_hour'), the sun elevation ('Sun_elevation', degrees), day or night ('Diel') and a solar hour bin ('Solar_bin') of every sample from the sampling datetime (UTC) and position, all in one vectorized pass (NOAA solar position equations). Latitudes stored as positive °S are read as south (`degrees_north` in `WC17_Schema`).
+- Fluorescence-based Chl-a (`Fl_Chla`) is lowered by non-photochemical quenching in daylight, so summary tables can be grouped by 'Diel' or 'Solar_bin' next to 'Station' (see `av_table` in the summary scripts).
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import numpy as np
+import pandas as pd
+
+from WC17_Schema import SAMPLING_DATETIME, degrees_north
+
+#%%
+
+### SETTINGS ###
+
+# Sun elevation (degrees) above which a sample counts as taken in daylight (sunrise/sunset with refraction)
+DAY_ELEVATION = -0.833
+
+# Width (hours) of the solar hour bins
+BIN_HOURS = 3
+
+#%%
+
+### SOLAR POSITION ###
+
+def _solar_terms(time):
+    # Equation of time (minutes) and solar declination (radians), NOAA approximation
+    time = pd.DatetimeIndex(time)
+    day = time.dayofyear.to_numpy(dtype=float)
+    hour = (time.hour + time.minute / 60 + time.second / 3600).to_numpy(dtype=float)
+    gamma = 2 * np.pi / 365 * (day - 1 + (hour - 12) / 24)
+    eqtime = 229.18 * (0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+                       - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma))
+    decl = (0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma) - 0.006758 * np.cos(2 * gamma)
+            + 0.000907 * np.sin(2 * gamma) - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma))
+    return hour, eqtime, decl
+
+
+def solar_hour(time, lon):
+    """
+    Local apparent solar hour (0-24, 12 at solar noon).
+
+    Parameters:
+    - time (array): Datetimes in UTC.
+    - lon (array): Longitude (degrees east).
+
+    Returns:
+    - array: Solar hour, NaN where the time or longitude is missing.
+    """
+    hour, eqtime, _ = _solar_terms(time)
+    return np.mod(hour + np.asarray(lon, dtype=float) / 15 + eqtime / 60, 24)
+
+
+def sun_elevation(time, lat, lon):
+    """
+    Sun elevation above the horizon (degrees).
+
+    Parameters:
+    - time (array): Datetimes in UTC.
+    - lat (array): Latitude (degrees north).
+    - lon (array): Longitude (degrees east).
+
+    Returns:
+    - array: Elevation, NaN where an input is missing.
+    """
+    _, _, decl = _solar_terms(time)
+    hour_angle = np.radians(15 * (solar_hour(time, lon) - 12))
+    lat = np.radians(np.asarray(lat, dtype=float))
+    cos_zenith = np.sin(lat) * np.sin(decl) + np.cos(lat) * np.cos(decl) * np.cos(hour_angle)
+    return 90 - np.degrees(np.arccos(np.clip(cos_zenith, -1, 1)))
+
+
+def solar_bins(hours, width=BIN_HOURS):
+    """
+    Solar hour bins as ordered labels, e.g. '06-09' for 3-hour bins.
+
+    Returns:
+    - Categorical: Bin of each hour (missing where the hour is NaN).
+    """
+    edges = np.arange(0, 24 + width, width)
+    labels = [f'{a:02d}-{b:02d}' for a, b in zip(edges[:-1], edges[1:])]
+    return pd.cut(np.asarray(hours, dtype=float), edges, right=False, labels=labels)
+
+
+def add_solar_time(df, datetime_col=SAMPLING_DATETIME, lat_col='Latitude', lon_col='Longitude', width=BIN_HOURS):
+    """
+    Add the solar hour, sun elevation, day/night and solar hour bin of every sample.
+
+    Parameters:
+    - df (DataFrame): Table with the sampling datetime (UTC) and position columns.
+    - datetime_col (str): Sampling datetime column. Defaults to 'Sampling_datetime_UTC' (see `combine_datetime`).
+    - lat_col, lon_col (str): Position columns. Default to 'Latitude' and 'Longitude'. Latitudes given as
+      positive °S are read as south (see `degrees_north`).
+    - width (int): Width of the solar hour bins (hours). Defaults to 3.
+
+    Returns:
+    - DataFrame: Table with 'Solar_hour', 'Sun_elevation', 'Diel' ("day" or "night") and 'Solar_bin' columns.
+    """
+    time = pd.to_datetime(df[datetime_col], errors='coerce')
+    hour = solar_hour(time, df[lon_col])
+    elevation = sun_elevation(time, degrees_north(df[lat_col]), df[lon_col])
+
+    diel = np.where(elevation > DAY_ELEVATION, 'day', 'night').astype(object)
+    diel[np.isnan(elevation)] = None
+    df['Solar_hour'] = hour
+    df['Sun_elevation'] = elevation
+    df['Diel'] = pd.Categorical(diel, categories=['day', 'night'])
+    df['Solar_bin'] = solar_bins(hour, width)
+    return df
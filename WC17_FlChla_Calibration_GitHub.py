@@ -0,0 +1,111 @@
+"""
+WC17: Calibrate Fluorescence Chl-a Against HPLC Tchla
+
+This script is related to the manuscript by Viljoen et al. (Preprint).
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- Daytime Fl_Chla profiles are corrected for non-photochemical quenching within the mixed layer (day/night from `WC17_Diel`, MLD from `WC17_01`).
+- Corrected Fl_Chla is regressed on Tchla per station and for all stations pooled, by OLS, reduced major axis (Type II) and robust Huber regression (see `WC17_Calibration`). The fits are saved as 'WC17_DataComp_FlChla_calibration'.
+- The calibrated bottle profiles ('Fl_Chla_NPQ', 'Fl_Chla_cal') are saved as 'WC17_DataComp_FlChla_calibrated'.
+- Where binned CTD profiles exist (`WC17_CTD_Ingest`), their fluorescence is NPQ corrected and converted with the same fits, and stored back as 'Fl_Chla_cal' in "WC17_CTD_1m.npz".
+- Before running this script, execute `WC17_01` to process the original data files which creates "WC17_DataComp_update.parquet" used here.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import numpy as np
+import pandas as pd
+
+from WC17_Calibration import apply_calibration, fit_calibration, npq_correct
+from WC17_CTD import load_ctd, write_ctd
+from WC17_Dataset import Dataset
+from WC17_Diel import add_solar_time
+from WC17_Flags import BAD
+from WC17_IO import write_table
+from WC17_MLD import profile_arrays
+from WC17_Schema import SAMPLING_DATETIME
+
+#%%
+
+#File name
+file = "WC17_DataComp_update"
+
+# Regression used for the calibrated profiles
+method = 'RMA'
+
+# Full profiles without values flagged bad (see WC17_Flags)
+keep_list = ['Station', 'Station_ID', 'Depth', 'Latitude', 'Longitude', SAMPLING_DATETIME, 'MLD', 'Fl_Chla', 'Tchla']
+dc = Dataset(file).columns(keep_list).flagged(exclude=BAD)
+tbl = dc.to_frame()
+units = dc.units
+
+# Day or night of each cast from the sampling datetime and position
+tbl = add_solar_time(tbl)
+casts = tbl.groupby('Station', observed=True).agg(Station_ID=('Station_ID', 'first'), MLD=('MLD', 'first'),
+                                                  Diel=('Diel', 'first'))
+
+#%%
+
+### NPQ CORRECTION ###
+
+# Station x depth arrays of the bottle profiles
+stations, depth, values = profile_arrays(tbl, ['Fl_Chla', 'Tchla'])
+casts = casts.reindex(stations)
+fl_npq = npq_correct(depth, values[..., 0], casts['MLD'].to_numpy(dtype=float),
+                     (casts['Diel'] == 'day').to_numpy(dtype=bool))
+
+# Changed samples only (NaN padding of the station x depth arrays compares equal)
+corrected = ~np.isclose(fl_npq, values[..., 0], equal_nan=True)
+print(f"NPQ corrected {corrected.sum()} daytime samples at {corrected.any(axis=1).sum()} stations")
+
+#%%
+
+### CALIBRATION ###
+
+# Back to one row per sample
+sample = ~np.isnan(depth)
+tbl_cal = pd.DataFrame({'Station': np.repeat(stations, sample.sum(axis=1)),
+                        'Depth': depth[sample],
+                        'Fl_Chla': values[..., 0][sample],
+                        'Fl_Chla_NPQ': fl_npq[sample],
+                        'Tchla': values[..., 1][sample]})
+
+fits = fit_calibration(tbl_cal, x_col='Fl_Chla_NPQ', y_col='Tchla')
+#Save df
+output_filename = 'WC17_DataComp_FlChla_calibration'
+write_table(fits, output_filename)
+print(fits[fits['Station'] == 'All'])
+
+# Calibrated profiles, converted station x depth (the CTD profiles are converted the same way)
+fl_cal = apply_calibration(fl_npq, stations, fits, method=method)
+tbl_cal['Fl_Chla_cal'] = fl_cal[sample]
+
+units.update({'Fl_Chla_NPQ': units.get('Fl_Chla'), 'Fl_Chla_cal': units.get('Tchla')})
+#Save df
+output_filename = 'WC17_DataComp_FlChla_calibrated'
+write_table(tbl_cal, output_filename, units=units)
+
+#%%
+
+### CTD PROFILES ###
+
+# Binned CTD fluorescence (station x depth, keyed by Station_ID), converted like the bottle profiles
+ctd = load_ctd()
+if ctd is not None and 'Fl' in ctd[2]:
+    ctd_stations, ctd_depth, ctd_values, ctd_units = ctd
+    ctd_casts = casts.reset_index().dropna(subset=['Station_ID']).set_index('Station_ID').reindex(ctd_stations)
+    ctd_npq = npq_correct(ctd_depth, ctd_values['Fl'], ctd_casts['MLD'].to_numpy(dtype=float),
+                          (ctd_casts['Diel'] == 'day').to_numpy(dtype=bool))
+    ctd_values['Fl_Chla_cal'] = apply_calibration(ctd_npq, ctd_casts['Station'].to_numpy(), fits, method=method)
+    ctd_units['Fl_Chla_cal'] = units.get('Tchla')
+    write_ctd(ctd_stations, ctd_depth[0], ctd_values, ctd_units)
+    print(f"Calibrated CTD fluorescence of {len(ctd_stations)} stations")
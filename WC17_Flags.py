@@ -0,0 +1,222 @@
+"""
+WC17: Per-Value Quality Flags and Their Propagation
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- Each measured column gets a flag column ('<col>_flag') on the ODV quality flag scale: 0 good, 1 unknown, 4 questionable, 8 bad.
+- `init_flags` takes the flags from the sheet ('<col>_flag' on the ODV scale or '<col>_WOCE' on the WOCE bottle scale) and flags values outside the valid ranges as bad, or as questionable for the ranges of concentrations that may be slightly negative near the detection limit.
+- Derived columns take the worst flag of their inputs (`combine_flags`), e.g. pFe_lith from pFe and pAl, Cyanobacteria from Synechococcus and Prochlorococcus, and the % of Tchla columns from each group and Tchla. ODV flags grow with severity, so the worst flag is the element-wise maximum over the flag block.
+- Summary tables exclude flagged values with `mask_flagged` (or `Dataset(...).flagged()`), one block operation over the loaded columns, and `station_flags` gives the worst flag of the values used for each station.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import numpy as np
+import pandas as pd
+
+from WC17_Censored import CENSOR_SUFFIX
+
+#%%
+
+### SETTINGS ###
+
+# ODV quality flags, in order of severity
+GOOD = 0
+UNKNOWN = 1
+QUESTIONABLE = 4
+BAD = 8
+
+# Suffix of the flag columns
+FLAG_SUFFIX = '_flag'
+
+# Suffix of WOCE bottle flag columns in a sheet
+WOCE_SUFFIX = '_WOCE'
+
+# WOCE bottle flags -> ODV flags (2 good, 3 questionable, 4 bad, 5 not reported, 6 replicate mean, 9 not sampled)
+WOCE_TO_ODV = {1: UNKNOWN, 2: GOOD, 3: QUESTIONABLE, 4: BAD, 5: UNKNOWN, 6: GOOD, 7: QUESTIONABLE,
+               8: QUESTIONABLE, 9: UNKNOWN}
+
+# Measured columns never flagged (labels, positions and times, depth matches of WC17_Matching)
+UNFLAGGED_COLUMNS = ['Latitude', 'Longitude', 'Depth', 'Station_ID', 'Depth_TM', 'Match_distance']
+
+#%%
+
+### FLAG FUNCTIONS ###
+
+def flag_column(col):
+    """Name of the flag column of `col`."""
+    return f'{col}{FLAG_SUFFIX}'
+
+
+def is_flag_column(col):
+    """True if `col` is a flag column."""
+    return str(col).endswith(FLAG_SUFFIX)
+
+
+def flagged_columns(df):
+    """Value columns of `df` that have a flag column."""
+    return [col[:-len(FLAG_SUFFIX)] for col in df.columns
+            if is_flag_column(col) and col[:-len(FLAG_SUFFIX)] in df.columns]
+
+
+def flag_columns(df, columns):
+    """Flag columns of `columns` present in `df`."""
+    return [flag_column(col) for col in columns if flag_column(col) in df.columns]
+
+
+def _flag_block(df, columns):
+    # Flags of `columns` as a uint8 matrix; missing flag columns (and flags missing after a merge) are unknown
+    block = np.full((len(df), len(columns)), UNKNOWN, dtype=np.uint8)
+    present = [j for j, col in enumerate(columns) if flag_column(col) in df.columns]
+    if present:
+        flags = df[[flag_column(columns[j]) for j in present]].to_numpy(dtype=float, na_value=np.nan)
+        block[:, present] = np.nan_to_num(flags, nan=UNKNOWN).astype(np.uint8)
+    return block
+
+
+def worst_flag(df, columns):
+    """Worst flag of `columns` in each row (uint8 array); missing flag columns count as unknown."""
+    return _flag_block(df, list(columns)).max(axis=1, initial=GOOD)
+
+
+def init_flags(df, columns=None, ranges=None, questionable=None):
+    """
+    Add a flag column for each measured column.
+
+    Flags given in the sheet are used (ODV '<col>_flag' or WOCE '<col>_WOCE', which is converted
+    and removed). Otherwise values are good and missing values unknown. Values outside `ranges`
+    are flagged bad in either case, and values outside `questionable` at least questionable.
+    Flag columns are added at the end of the table.
+
+    Parameters:
+    - df (DataFrame): Raw sheet with cleaned column names and numeric values (see `parse_censored`).
+    - columns (list): Measured columns. Defaults to all float columns except positions and flag columns.
+    - ranges (dict): Column -> (low, high) valid range, e.g. `WC17_QC.FLAG_RANGES`.
+    - questionable (dict): Column -> (low, high) range of unquestioned values, e.g. `WC17_QC.QUESTIONABLE_RANGES`.
+
+    Returns:
+    - DataFrame: Table with uint8 '<col>_flag' columns.
+    """
+    if columns is None:
+        columns = [col for col in df.select_dtypes(include='floating').columns
+                   if col not in UNFLAGGED_COLUMNS and not is_flag_column(col) and not col.endswith(WOCE_SUFFIX)]
+    if not columns:
+        return df
+
+    values = df[columns].to_numpy(dtype=float)
+    flags = np.where(np.isnan(values), UNKNOWN, GOOD).astype(np.uint8)
+
+    # Flags from the sheet
+    woce = [f'{col}{WOCE_SUFFIX}' for col in columns]
+    for j, col in enumerate(columns):
+        if flag_column(col) in df.columns:
+            flags[:, j] = df[flag_column(col)].fillna(UNKNOWN).to_numpy(dtype=np.uint8)
+        elif woce[j] in df.columns:
+            flags[:, j] = df[woce[j]].map(WOCE_TO_ODV).fillna(UNKNOWN).to_numpy(dtype=np.uint8)
+
+    # Values outside their questionable and valid ranges
+    for limit_ranges, flag in ((questionable, QUESTIONABLE), (ranges, BAD)):
+        if not limit_ranges:
+            continue
+        limits = np.array([limit_ranges.get(col, (-np.inf, np.inf)) for col in columns], dtype=float)
+        with np.errstate(invalid='ignore'):
+            outside = (values < limits[:, 0]) | (values > limits[:, 1])
+        flags[outside] = np.maximum(flags[outside], flag)
+
+    df = df.drop(columns=[col for col in woce if col in df.columns])
+    df[[flag_column(col) for col in columns]] = flags
+    return df
+
+
+def combine_flags(df, outputs, *inputs):
+    """
+    Flag derived columns with the worst flag of their inputs.
+
+    Each input is a column name, broadcast over all outputs, or a list of columns aligned
+    with `outputs`, e.g. `combine_flags(df, ['pFe_lith', 'pMn_lith'], ['pFe', 'pMn'], 'pAl')`.
+    Nothing is added when none of the inputs has a flag column.
+
+    Parameters:
+    - df (DataFrame): Table with the derived columns.
+    - outputs (str or list): Derived column(s).
+    - inputs (str or list): Input column(s) of each derived column.
+
+    Returns:
+    - DataFrame: Table with the '<output>_flag' columns set.
+    """
+    outputs = [outputs] if isinstance(outputs, str) else list(outputs)
+    inputs = [[cols] * len(outputs) if isinstance(cols, str) else list(cols) for cols in inputs]
+    if not any(flag_columns(df, cols) for cols in inputs):
+        return df
+
+    worst = np.zeros((len(df), len(outputs)), dtype=np.uint8)
+    for cols in inputs:
+        worst = np.maximum(worst, _flag_block(df, cols))
+    df[[flag_column(col) for col in outputs]] = worst
+    return df
+
+
+def mask_flagged(df, exclude=BAD, drop_flags=True):
+    """
+    Exclude flagged values by setting them to NaN.
+
+    The below detection limit flags ('<col>_cens') of excluded values are cleared, so `ros_fill`
+    does not impute them again.
+
+    Parameters:
+    - df (DataFrame): Table with flag columns.
+    - exclude (int): Lowest flag excluded. Defaults to `BAD`; use `QUESTIONABLE` to also exclude questionable values.
+    - drop_flags (bool): Remove the flag columns from the result. Defaults to True.
+
+    Returns:
+    - DataFrame: Table with the excluded values set to NaN.
+    """
+    value_cols = flagged_columns(df)
+    if value_cols:
+        values = df[value_cols].to_numpy(dtype=float, copy=True)
+        excluded = _flag_block(df, value_cols) >= exclude
+        values[excluded] = np.nan
+        df[value_cols] = values
+        for j, col in enumerate(value_cols):
+            cens = f'{col}{CENSOR_SUFFIX}'
+            if cens in df.columns and excluded[:, j].any():
+                df[cens] = df[cens].fillna(False).to_numpy(dtype=bool) & ~excluded[:, j]
+    if drop_flags:
+        df = df.drop(columns=[col for col in df.columns if is_flag_column(col)])
+    return df
+
+
+def station_flags(df, station_col='Station', exclude=BAD):
+    """
+    Worst flag per station and column of the values used in the station summaries.
+
+    Missing values and values excluded by `mask_flagged` do not count.
+
+    Parameters:
+    - df (DataFrame): Table with a station column and flag columns.
+    - station_col (str): Station column. Defaults to 'Station'.
+    - exclude (int): Lowest flag excluded from the summaries. Defaults to `BAD`.
+
+    Returns:
+    - DataFrame: One row per station with a '<col>_flag' column for each flagged column
+      (nullable integer, missing where the station has no value).
+    """
+    value_cols = flagged_columns(df)
+    flags = _flag_block(df, value_cols).astype(float)
+    used = df[value_cols].notna().to_numpy() & (flags < exclude)
+    flags[~used] = np.nan
+
+    table = (pd.DataFrame(flags, columns=[flag_column(col) for col in value_cols])
+             .groupby(df[station_col].to_numpy(), sort=True).max()
+             .astype('Int64'))
+    return table.rename_axis(station_col).reset_index()
@@ -0,0 +1,246 @@
+"""
+WC17: Match-Up of Sample Positions with Gridded Fields (Climatologies, Satellite Products)
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- `add_grid_fields` attaches values of local NetCDF or Zarr fields (e.g. SST, climatological nitrate, satellite Chl) at the sample `Latitude`/`Longitude` to a compiled table, e.g. 'SST_clim', with the distance to the nearest cell with data ('<source>_distance', km).
+- Grid cell centres are indexed once in a KD-tree on the unit sphere (regular and curvilinear grids), which is cached next to the grid file and rebuilt only when the file changes.
+- Only the unique sample positions are queried, and only the matched cells are read from the file (point-wise indexing of the lazily opened variables), so large grids are never loaded whole. The nearest of the `k` closest cells with a value is used, which skips land and cloud gaps.
+- `GRID_SOURCES` lists the grids attached by `WC17_01`; it is empty by default.
+- Requires `xarray` (with `netCDF4` or `zarr` for the file format) to read the grids; it is only imported when a grid is opened.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import os
+import pickle
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+#%%
+
+### SETTINGS ###
+
+# Grids attached by `WC17_01`: name, file (NetCDF or Zarr), output column -> variable, optional
+# selection of other dimensions (nearest), coordinate names, search radius (km) and cells searched, e.g.
+# {'name': 'WOA18', 'path': 'woa18_nitrate_monthly.nc', 'fields': {'Nitrate_clim': 'n_an'},
+#  'select': {'time': 7, 'depth': 0}, 'lat': 'lat', 'lon': 'lon', 'max_distance': 100, 'k': 4}
+GRID_SOURCES = []
+
+# Earth radius (km)
+EARTH_RADIUS = 6371.0
+
+# Defaults of a grid source
+MAX_DISTANCE = 50
+N_NEIGHBOURS = 4
+
+#%%
+
+### GRID INDEX ###
+
+def _unit_vectors(lat, lon):
+    # Positions on the unit sphere, so Euclidean distances follow great-circle distances
+    lat, lon = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def _chord_to_km(chord):
+    # Great-circle distance (km) of a chord on the unit sphere
+    return 2 * EARTH_RADIUS * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def grid_tree(lat, lon):
+    """
+    KD-tree over grid cell centres.
+
+    Parameters:
+    - lat (array): 1-D latitudes of a regular grid, or the 2-D latitudes of a curvilinear grid.
+    - lon (array): Longitudes, same layout as `lat`.
+
+    Returns:
+    - dict: 'tree' (cKDTree over the flattened cells) and 'shape' of the (lat, lon) grid.
+    """
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    if lat.ndim == 1:
+        lat, lon = np.meshgrid(lat, lon, indexing='ij')
+    return {'tree': cKDTree(_unit_vectors(lat.ravel(), lon.ravel())), 'shape': lat.shape}
+
+
+def cached_tree(path, lat, lon, lat_name='lat', lon_name='lon'):
+    """
+    Grid index of a file, loaded from its cache or built and cached ('<path>.kdtree.pkl').
+
+    The cache is rebuilt when the grid file is newer or the coordinates differ.
+
+    Returns:
+    - dict: See `grid_tree`.
+    """
+    cache = f"{str(path).rstrip('/')}.kdtree.pkl"
+    key = (lat_name, lon_name, np.shape(lat), np.shape(lon))
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+        with open(cache, 'rb') as f:
+            index = pickle.load(f)
+        if index.get('key') == key:
+            return index
+    index = {**grid_tree(lat, lon), 'key': key}
+    with open(cache, 'wb') as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return index
+
+
+def nearest_cells(index, lat, lon, k=N_NEIGHBOURS, max_distance=MAX_DISTANCE):
+    """
+    The `k` nearest grid cells of each position within `max_distance`.
+
+    Returns:
+    - array: Position x k distances (km), inf where no cell is within range.
+    - array: Position x k flat cell indices, the number of cells where no cell is within range.
+    """
+    chord = 2 * np.sin(max_distance / (2 * EARTH_RADIUS))
+    dist, cells = index['tree'].query(_unit_vectors(lat, lon), k=k, distance_upper_bound=chord)
+    dist, cells = dist.reshape(len(dist), -1), cells.reshape(len(cells), -1)
+    return np.where(np.isfinite(dist), _chord_to_km(np.where(np.isfinite(dist), dist, 0)), np.inf), cells
+
+
+def first_valid(values, dist):
+    """
+    Value of the nearest cell with data for each position.
+
+    Parameters:
+    - values (array): Position x k values of the `nearest_cells`, NaN for missing cells.
+    - dist (array): Position x k distances (km).
+
+    Returns:
+    - array: Value per position (NaN where no cell has data).
+    - array: Distance (km) of the cell used.
+    """
+    valid = ~np.isnan(values) & np.isfinite(dist)
+    j = valid.argmax(axis=1)
+    rows = np.arange(len(values))
+    found = valid[rows, j]
+    return np.where(found, values[rows, j], np.nan), np.where(found, dist[rows, j], np.nan)
+
+#%%
+
+### FIELD EXTRACTION ###
+
+def open_grid(path):
+    """
+    Open a NetCDF file or Zarr store lazily (values are read when indexed).
+
+    Raises:
+    - ImportError: If xarray is not installed.
+    """
+    try:
+        import xarray as xr
+    except ImportError as e:
+        raise ImportError("Reading gridded fields requires xarray (with netCDF4 or zarr).") from e
+    if os.path.isdir(path) or str(path).endswith('.zarr'):
+        return xr.open_zarr(path)
+    return xr.open_dataset(path)
+
+
+def grid_values(ds, variables, index, lat, lon, lat_name='lat', lon_name='lon', select=None,
+                k=N_NEIGHBOURS, max_distance=MAX_DISTANCE):
+    """
+    Values of grid variables at positions, reading only the matched cells.
+
+    Parameters:
+    - ds (Dataset): Lazily opened grid (see `open_grid`).
+    - variables (list): Variables to read.
+    - index (dict): Grid index of `ds` (see `cached_tree`).
+    - lat, lon (array): Positions.
+    - lat_name, lon_name (str): Coordinate names of the grid.
+    - select (dict): Other dimensions -> value, selected by nearest value (e.g. month or depth).
+    - k (int): Cells searched per position. Defaults to 4.
+    - max_distance (float): Search radius (km). Defaults to 50.
+
+    Returns:
+    - array: Position x variable values.
+    - array: Position x variable distances (km) of the cells used.
+
+    Raises:
+    - ValueError: If a variable has dimensions other than the grid after the selection.
+    """
+    import xarray as xr
+
+    dist, cells = nearest_cells(index, lat, lon, k, max_distance)
+    in_range = cells < np.prod(index['shape'])
+    flat = np.where(in_range, cells, 0).ravel()
+
+    # Point-wise indexers over the (lat, lon) grid dimensions
+    dims = (ds[lat_name].dims[0], ds[lon_name].dims[0]) if ds[lat_name].ndim == 1 else ds[lat_name].dims
+    i, j = np.unravel_index(flat, index['shape'])
+    indexers = {dims[0]: xr.DataArray(i, dims='point'), dims[1]: xr.DataArray(j, dims='point')}
+
+    values = np.full((len(dist), len(variables)), np.nan)
+    used = np.full((len(dist), len(variables)), np.nan)
+    for v, name in enumerate(variables):
+        field = ds[name]
+        if select:
+            field = field.sel({dim: value for dim, value in select.items() if dim in field.dims}, method='nearest')
+        other = [dim for dim in field.dims if dim not in dims]
+        if other:
+            raise ValueError(f"'{name}' has dimensions {other} besides the grid; choose them with 'select'.")
+        points = field.isel(indexers).to_numpy().astype(float).reshape(dist.shape)
+        points[~in_range] = np.nan
+        values[:, v], used[:, v] = first_valid(points, dist)
+    return values, used
+
+
+def add_grid_fields(df, sources=None, units=None, lat_col='Latitude', lon_col='Longitude'):
+    """
+    Attach gridded fields at the sample positions.
+
+    Parameters:
+    - df (DataFrame): Compiled table with latitude and longitude columns.
+    - sources (list): Grid sources (see `GRID_SOURCES`). Defaults to `GRID_SOURCES`.
+    - units (dict): Column -> unit registry, updated in place from the 'units' attribute of the variables.
+    - lat_col, lon_col (str): Position columns. Defaults to 'Latitude' and 'Longitude'.
+
+    Returns:
+    - DataFrame: Table with one column per field and a '<source>_distance' column per source
+      (km to the nearest cell with data).
+    """
+    sources = GRID_SOURCES if sources is None else sources
+    if not sources:
+        return df
+
+    # Each position is queried once
+    positions = df[[lat_col, lon_col]].to_numpy(dtype=float)
+    known = ~np.isnan(positions).any(axis=1)
+    unique, inverse = np.unique(positions[known], axis=0, return_inverse=True)
+
+    for source in sources:
+        lat_name, lon_name = source.get('lat', 'lat'), source.get('lon', 'lon')
+        fields = source['fields']
+        with open_grid(source['path']) as ds:
+            index = cached_tree(source['path'], ds[lat_name].to_numpy(), ds[lon_name].to_numpy(), lat_name, lon_name)
+            values, used = grid_values(ds, list(fields.values()), index, unique[:, 0], unique[:, 1],
+                                       lat_name, lon_name, source.get('select'),
+                                       source.get('k', N_NEIGHBOURS), source.get('max_distance', MAX_DISTANCE))
+            field_units = {col: ds[name].attrs.get('units') for col, name in fields.items()}
+
+        block = np.full((len(df), len(fields) + 1), np.nan)
+        block[known, :-1] = values[inverse.ravel()]
+        block[known, -1] = np.nanmin(np.where(np.isnan(used), np.inf, used), axis=1)[inverse.ravel()]
+        block[np.isinf(block)] = np.nan
+        distance_col = f"{source['name']}_distance"
+        df[list(fields) + [distance_col]] = block
+
+        if units is not None:
+            units.update({col: unit for col, unit in field_units.items() if unit})
+            units[distance_col] = 'km'
+        print(f"{source['name']}: {np.isfinite(values).any(axis=1).sum()} of {len(unique)} positions matched")
+    return df
@@ -0,0 +1,199 @@
+"""
+WC17: Shared Table Input/Output Functions
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- All intermediate and final tables are written as typed Parquet files, so categorical `Station`/`ML`/`Cruise` labels and float columns keep their dtypes between scripts.
+- Downstream scripts read these with `read_table(name, columns=[...])` so only the requested columns are loaded.
+- Excel/CSV export is an optional final publishing step. Set the environment variable `WC17_PUBLISH=1` (or pass `publish=True`) to also write the `.xlsx`/`.csv` copies.
+- The column unit registry (see `WC17_Units`) is stored in the Parquet metadata and returned in `df.attrs['units']`; published copies carry the units in their headers.
+- `load_dataset` reads a compiled dataset and applies the declared schema in `WC17_Schema`.
+- Requires `pyarrow` in addition to `pandas`.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from WC17_Schema import LABEL_COLUMNS, apply_schema, memory_report
+from WC17_Units import with_units
+
+#%%
+
+### SETTINGS ###
+
+# Parquet metadata key holding the column unit registry
+UNITS_KEY = b'wc17_units'
+
+# Write Excel/CSV copies of every table when WC17_PUBLISH=1
+PUBLISH = os.environ.get('WC17_PUBLISH', '0') == '1'
+
+#%%
+
+### TABLE FUNCTIONS ###
+
+def table_path(name, ext='parquet'):
+    """
+    Return the file name for a table, e.g. 'WC17_TM_Comp_update' -> 'WC17_TM_Comp_update.parquet'.
+    Any existing extension on `name` is replaced.
+    """
+    stem, _ = os.path.splitext(name)
+    return f'{stem}.{ext}'
+
+
+def to_categorical(df, columns=None):
+    """
+    Convert label columns present in `df` to the pandas 'category' dtype.
+    """
+    if columns is None:
+        columns = LABEL_COLUMNS
+    for col in columns:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def _arrow_safe(df):
+    """
+    Store object columns that mix numbers and text (e.g. formatted tables with
+    significance stars) as text, since Parquet columns need a single type.
+    """
+    mixed = [col for col in df.columns
+             if df[col].dtype == object
+             and pd.api.types.infer_dtype(df[col], skipna=True) in ('mixed', 'mixed-integer')]
+    if not mixed:
+        return df
+    df = df.copy()
+    for col in mixed:
+        df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    return df
+
+
+def write_table(df, name, publish=None, publish_format='xlsx', index=False, units=None):
+    """
+    Write a table as a typed Parquet file and optionally publish an Excel/CSV copy.
+
+    Parameters:
+    - df (DataFrame): Table to save.
+    - name (str): Output name, with or without extension.
+    - publish (bool): Also write the Excel/CSV copy. Defaults to the `WC17_PUBLISH` setting.
+    - publish_format (str): 'xlsx' or 'csv' for the published copy.
+    - index (bool): Keep the DataFrame index in the outputs. Defaults to False.
+    - units (dict): Column -> unit registry to store with the table and add to the published headers.
+
+    Returns:
+    - str: Path of the Parquet file written.
+    """
+    df = to_categorical(df.copy())
+    # Parquet needs string column names
+    df.columns = [str(col) for col in df.columns]
+    units = {col: unit for col, unit in (units or {}).items() if col in df.columns}
+
+    path = table_path(name)
+    table = pa.Table.from_pandas(_arrow_safe(df), preserve_index=index)
+    if units:
+        metadata = dict(table.schema.metadata or {})
+        metadata[UNITS_KEY] = json.dumps(units).encode()
+        table = table.replace_schema_metadata(metadata)
+    pq.write_table(table, path)
+
+    if publish is None:
+        publish = PUBLISH
+    if publish:
+        publish_table(df, name, fmt=publish_format, index=index, units=units)
+
+    return path
+
+
+def read_schema(name):
+    """
+    Arrow schema of a Parquet table, or of a partitioned table directory (see `WC17_Ingest`).
+    """
+    path = table_path(name)
+    if os.path.isdir(path):
+        return pq.ParquetDataset(path).schema
+    return pq.read_schema(path)
+
+
+def read_units(name):
+    """
+    Column -> unit registry stored with a Parquet table (empty if none was stored).
+    """
+    metadata = read_schema(name).metadata or {}
+    if UNITS_KEY not in metadata:
+        return {}
+    return json.loads(metadata[UNITS_KEY])
+
+
+def read_table(name, columns=None):
+    """
+    Read a Parquet table written by `write_table`.
+
+    Parameters:
+    - name (str): Table name, with or without extension. Partitioned table directories are read as one table.
+    - columns (list): Only load these columns. Defaults to all columns.
+
+    Returns:
+    - DataFrame: Table with the stored dtypes and the unit registry in `df.attrs['units']`.
+
+    Raises:
+    - FileNotFoundError: If the Parquet file does not exist (run `WC17_01` first).
+    """
+    path = table_path(name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Table '{path}' not found. Run `WC17_01` first to create it.")
+    df = pd.read_parquet(path, columns=columns)
+    units = read_units(path)
+    df.attrs['units'] = {col: unit for col, unit in units.items() if col in df.columns}
+    return df
+
+
+def load_dataset(name, columns=None, float32=False, report=False):
+    """
+    Load a compiled dataset (e.g. 'WC17_TM_Comp_update') with the declared schema applied.
+
+    Parameters:
+    - name (str): Table name, with or without extension.
+    - columns (list): Only load these columns. Defaults to all columns.
+    - float32 (bool): Hold concentration columns as float32. Defaults to False.
+    - report (bool): Print the per-column memory report. Defaults to False.
+
+    Returns:
+    - DataFrame: Compact typed table.
+    """
+    df = apply_schema(read_table(name, columns=columns), float32=float32)
+    if report:
+        memory_report(df)
+    return df
+
+
+def publish_table(df, name, fmt='xlsx', index=False, units=None):
+    """
+    Write the Excel or CSV copy of a table for publication, with units in the headers.
+    """
+    if units:
+        df = df.set_axis(with_units(df.columns, units), axis=1)
+    if fmt == 'xlsx':
+        path = table_path(name, 'xlsx')
+        df.to_excel(path, index=index)
+    elif fmt == 'csv':
+        path = table_path(name, 'csv')
+        df.to_csv(path, index=index)
+    else:
+        raise ValueError("Invalid fmt. Choose 'xlsx' or 'csv'.")
+    return path
@@ -0,0 +1,299 @@
+"""
+WC17: Incremental Ingest and Station Change Tracking
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- Each (Cruise, Station, Depth) record of a workbook sheet is hashed, so `WC17_01` only reprocesses new or changed rows and merges them into the stored table.
+- The row hashes are kept in '<table>_rowhash.parquet' and the time each station last changed in '<table>_stations.parquet'.
+- Downstream scripts use the station log to recompute station summary rows only for stations changed since a table was written (`update_station_table`) and to skip figures that are up to date (`outputs_current`).
+- The row hashes are stored with a pipeline version, a hash of the code and constants of the processing modules (`PIPELINE_MODULES`) and of the running script. Changing e.g. the crustal ratios, the MLD threshold, the QC rules or the derived columns reprocesses every row on the next run, and downstream tables and figures older than that code are rebuilt.
+- Set the environment variable `WC17_REBUILD=1` to reprocess everything regardless.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import hashlib
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from WC17_IO import read_table, table_path, write_table
+
+#%%
+
+### SETTINGS ###
+
+# Columns identifying a sample
+KEY_COLUMNS = ['Cruise', 'Station', 'Depth']
+
+# Reprocess everything when WC17_REBUILD=1
+REBUILD = os.environ.get('WC17_REBUILD', '0') == '1'
+
+# Modules whose code and constants shape the stored tables (derived columns, flags, QC rules, units)
+PIPELINE_MODULES = ['WC17_Catalog', 'WC17_Censored', 'WC17_Chemtax', 'WC17_Flags', 'WC17_GridMatchup',
+                    'WC17_Incremental', 'WC17_Lithogenic', 'WC17_Matching', 'WC17_MetalStar', 'WC17_MLD',
+                    'WC17_Outliers', 'WC17_Phyto', 'WC17_QC', 'WC17_Schema', 'WC17_Stoich', 'WC17_Units']
+
+# Column of the row hash table holding the pipeline version
+VERSION_COLUMN = 'pipeline'
+
+#%%
+
+### PIPELINE VERSION ###
+
+def pipeline_files():
+    """Source files of `PIPELINE_MODULES` and of the running script (if run from a file)."""
+    files = []
+    for module in PIPELINE_MODULES:
+        spec = importlib.util.find_spec(module)
+        if spec is not None and spec.origin and os.path.exists(spec.origin):
+            files.append(spec.origin)
+    main = getattr(sys.modules.get('__main__'), '__file__', None)
+    if main and os.path.exists(main):
+        files.append(os.path.abspath(main))
+    return files
+
+
+def pipeline_version():
+    """Hash of the code and constants that produce the stored tables (see `pipeline_files`)."""
+    digest = hashlib.sha256()
+    for path in pipeline_files():
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+#%%
+
+### ROW CHANGE DETECTION ###
+
+def _hash_path(name):
+    return f'{os.path.splitext(name)[0]}_rowhash'
+
+
+def _log_path(name):
+    return f'{os.path.splitext(name)[0]}_stations'
+
+
+def row_hashes(df, key=None):
+    """
+    Hash each record of a raw sheet.
+
+    Parameters:
+    - df (DataFrame): Raw sheet with cleaned column names.
+    - key (list): Columns identifying a record. Defaults to `KEY_COLUMNS`.
+
+    Returns:
+    - DataFrame: Key columns plus 'key' (hash of the key, numbered for repeated keys) and
+      'row' (hash of all values and column names) for each row, in sheet order.
+    """
+    if key is None:
+        key = KEY_COLUMNS
+    keys = df[key].reset_index(drop=True)
+    # Repeated keys (e.g. duplicate samples) are told apart by their occurrence
+    occurrence = keys.groupby(key, dropna=False, observed=True).cumcount()
+    key_hash = pd.util.hash_pandas_object(keys.assign(_n=occurrence), index=False).to_numpy()
+
+    # Column names are part of the row hash, so a changed layout reprocesses every row
+    names = pd.util.hash_array(np.array(['\x1f'.join(map(str, df.columns))], dtype=object))[0]
+    row_hash = pd.util.hash_pandas_object(df, index=False).to_numpy() ^ names
+
+    return keys.assign(key=key_hash, row=row_hash)
+
+
+def detect_changes(df, name, key=None, rebuild=None):
+    """
+    Compare a raw sheet with the rows used for the stored table `name`.
+
+    Parameters:
+    - df (DataFrame): Raw sheet with cleaned column names.
+    - name (str): Stored output table, e.g. 'WC17_TM_Comp_update'.
+    - key (list): Columns identifying a record. Defaults to `KEY_COLUMNS`.
+    - rebuild (bool): Treat every row as changed. Defaults to the `WC17_REBUILD` setting.
+      Every row is also reprocessed when the stored table was made by another `pipeline_version`.
+
+    Returns:
+    - dict: 'hashes' (from `row_hashes`), 'changed' (boolean mask of rows to process),
+      'removed' (key columns of stored rows no longer in the sheet) and 'rebuild' (bool).
+    """
+    if key is None:
+        key = KEY_COLUMNS
+    if rebuild is None:
+        rebuild = REBUILD
+
+    hashes = row_hashes(df, key)
+    hash_file = table_path(_hash_path(name))
+    if rebuild or not os.path.exists(table_path(name)) or not os.path.exists(hash_file):
+        return {'hashes': hashes, 'changed': np.ones(len(df), dtype=bool),
+                'removed': hashes[key].iloc[:0], 'rebuild': True}
+
+    stored = read_table(hash_file)
+    version = pipeline_version()
+    if VERSION_COLUMN not in stored.columns or not (stored[VERSION_COLUMN] == version).all():
+        print(f"Processing code changed since last run of {name}, reprocessing all rows")
+        return {'hashes': hashes, 'changed': np.ones(len(df), dtype=bool),
+                'removed': hashes[key].iloc[:0], 'rebuild': True}
+
+    stored_rows = pd.MultiIndex.from_arrays([stored['key'], stored['row']])
+    changed = ~pd.MultiIndex.from_arrays([hashes['key'], hashes['row']]).isin(stored_rows)
+    removed = stored.loc[~stored['key'].isin(hashes['key']), key]
+
+    print(f"Rows changed since last run of {name}: {changed.sum()} of {len(df)} ({len(removed)} removed)")
+    return {'hashes': hashes, 'changed': changed, 'removed': removed, 'rebuild': False}
+
+
+def merge_changes(df, name, changes):
+    """
+    Merge reprocessed rows into the stored table.
+
+    Parameters:
+    - df (DataFrame): Processed rows, one for each changed row in `changes`.
+    - name (str): Stored output table.
+    - changes (dict): Result of `detect_changes`.
+
+    Returns:
+    - DataFrame: Full table in sheet order, unchanged rows taken from the stored table.
+    """
+    if changes['rebuild']:
+        return df.reset_index(drop=True)
+
+    changed = changes['changed']
+    stored = read_table(name)
+    stored_keys = read_table(_hash_path(name), columns=['key'])['key']
+    position = pd.Series(np.arange(len(stored_keys)), index=stored_keys.to_numpy())
+    kept = position.loc[changes['hashes']['key'].to_numpy()[~changed]].to_numpy()
+
+    parts = [stored.iloc[kept].set_axis(np.flatnonzero(~changed)),
+             df.set_axis(np.flatnonzero(changed))]
+    merged = pd.concat([part for part in parts if len(part)]).sort_index()
+    # Categorical labels of the two parts are recombined by the schema
+    for col in merged.columns:
+        if col in stored.columns and isinstance(stored[col].dtype, pd.CategoricalDtype):
+            merged[col] = merged[col].astype(object)
+    return merged.reset_index(drop=True)
+
+
+def has_changes(changes):
+    """True if any row was added, changed or removed."""
+    return changes['rebuild'] or changes['changed'].any() or len(changes['removed']) > 0
+
+
+def write_changes(df, name, changes, publish_format='xlsx', units=None):
+    """
+    Save a merged table with its row hashes and station log. Nothing is written when no row changed.
+
+    Parameters:
+    - df (DataFrame): Merged table from `merge_changes`.
+    - name (str): Output table name.
+    - changes (dict): Result of `detect_changes`.
+    - publish_format (str): 'xlsx' or 'csv' for the published copy.
+    - units (dict): Column -> unit registry stored with the table.
+
+    Returns:
+    - bool: True if the table was written.
+    """
+    if not has_changes(changes):
+        print(f"No rows changed since last run, {table_path(name)} is up to date.")
+        return False
+
+    write_table(df, name, publish_format=publish_format, units=units)
+    hashes = changes['hashes']
+    write_table(hashes.assign(**{VERSION_COLUMN: pipeline_version()}), _hash_path(name), publish=False)
+
+    # Stations with changed or removed rows
+    station_key = [col for col in KEY_COLUMNS[:2] if col in hashes.columns]
+    updated = pd.concat([hashes.loc[changes['changed'], station_key], changes['removed'][station_key]])
+    updated = updated.drop_duplicates().assign(updated=time.time())
+    log_file = table_path(_log_path(name))
+    if not changes['rebuild'] and os.path.exists(log_file):
+        log = read_table(log_file)
+        for col in station_key:
+            log[col] = log[col].astype(object)
+            updated[col] = updated[col].astype(object)
+        updated = (pd.concat([log, updated])
+                   .drop_duplicates(station_key, keep='last')
+                   .reset_index(drop=True))
+    write_table(updated, _log_path(name), publish=False)
+    return True
+
+#%%
+
+### DOWNSTREAM OUTPUTS ###
+
+def stale_stations(source, outputs):
+    """
+    Stations of `source` that changed after any of `outputs` was written.
+
+    Parameters:
+    - source (str): Table written by `WC17_01`, e.g. 'WC17_TM_Comp_update'.
+    - outputs (list): Output files (tables or figures) made from `source`.
+
+    Returns:
+    - set: Station codes changed since the oldest output, or None if every station needs
+      updating (an output is missing or older than the processing code or the running script,
+      there is no station log, or `WC17_REBUILD=1`).
+    """
+    log_file = table_path(_log_path(source))
+    paths = [table_path(path) if not os.path.splitext(path)[1] else path for path in outputs]
+    if REBUILD or not os.path.exists(log_file) or not all(os.path.exists(path) for path in paths):
+        return None
+
+    written = min(os.path.getmtime(path) for path in paths)
+    if written < max((os.path.getmtime(path) for path in pipeline_files()), default=0):
+        return None
+    log = read_table(log_file)
+    return set(log.loc[log['updated'] > written, 'Station'].astype(object))
+
+
+def outputs_current(source, outputs):
+    """True if no station of `source` changed since `outputs` were written."""
+    return stale_stations(source, outputs) == set()
+
+
+def update_station_table(df, compute, output_name, source, mapping=None, station_col='Station', units=None):
+    """
+    Recompute a station summary table only for stations changed since it was saved.
+
+    Parameters:
+    - df (DataFrame): Data with a station column.
+    - compute (function): Builds the summary table from (a subset of) `df`, one or more rows per station.
+    - output_name (str): Stored summary table.
+    - source (str): Table `df` was read from, e.g. 'WC17_TM_Comp_update'.
+    - mapping (dict): Station code -> label used in `df`, e.g. {'IO08': 'St. 41.0°S'}.
+    - station_col (str): Station column. Defaults to 'Station'.
+    - units (dict): Column -> unit registry stored with the table.
+
+    Returns:
+    - DataFrame: Summary table for all stations.
+    """
+    stations = stale_stations(source, [output_name])
+    if stations is None:
+        table = compute(df)
+    elif not stations:
+        print(f"No station changed, {table_path(output_name)} is up to date.")
+        return read_table(output_name)
+    else:
+        labels = {(mapping or {}).get(station, station) for station in stations}
+        stored = read_table(output_name)
+        stored[station_col] = stored[station_col].astype(object)
+        fresh = compute(df[df[station_col].isin(labels)])
+        table = (pd.concat([stored[~stored[station_col].isin(labels)], fresh])
+                 .sort_values(station_col, kind='stable')
+                 .reset_index(drop=True))
+
+    write_table(table, output_name, units=units)
+    return table
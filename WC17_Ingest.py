@@ -0,0 +1,354 @@
+"""
+WC17: Chunked Streaming and Batch Ingest of Cruise Workbooks
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- For multi-cruise workbooks too large to load at once with `pd.read_excel`.
+- `iter_sheet_chunks` walks the sheet row by row with a read-only openpyxl worksheet and yields tables of `chunk_size` rows with cleaned column names.
+- `stream_ingest` applies the same clean-up as `WC17_01` to each chunk (lithogenic correction, unit conversion, phytoplankton composition, declared schema) and appends it to one Parquet file, so peak memory depends on the chunk size and not on the size of the workbook.
+- `run_batch` ingests a directory (or CSV manifest) of cruise workbooks in a process pool into one table partitioned by `Cruise`, reporting per-file timing and failures without stopping the batch.
+- The output is read with `read_table`/`load_dataset`/`Dataset` like the tables written by `WC17_01`.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from WC17_Censored import add_censor_flags, parse_censored
+from WC17_Flags import UNFLAGGED_COLUMNS, init_flags
+from WC17_IO import PUBLISH, UNITS_KEY, _arrow_safe, table_path, write_table
+from WC17_Lithogenic import add_lithogenic
+from WC17_MetalStar import star_conversions
+from WC17_Phyto import add_composition
+from WC17_QC import FLAG_RANGES, QUESTIONABLE_RANGES
+from WC17_Schema import INTEGER_COLUMNS, apply_schema
+from WC17_Units import convert_units, parse_units, with_units
+
+#%%
+
+### SETTINGS ###
+
+# Rows per chunk
+CHUNK_SIZE = 5000
+
+#%%
+
+### INGEST FUNCTIONS ###
+
+def iter_sheet_chunks(file_name, sheet_name, chunk_size=CHUNK_SIZE):
+    """
+    Read a workbook sheet in row chunks without loading the whole sheet.
+
+    Parameters:
+    - file_name (str): xlsx workbook.
+    - sheet_name (str): Sheet to read, None for the first sheet. The first row holds the headers.
+    - chunk_size (int): Rows per chunk. Defaults to `CHUNK_SIZE`.
+
+    Yields:
+    - DataFrame: Next chunk of rows with cleaned column names (empty rows are skipped),
+      with the header unit registry in `df.attrs['units']`.
+    """
+    wb = openpyxl.load_workbook(file_name, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0] if sheet_name is None else wb[sheet_name]
+        rows = ws.iter_rows(values_only=True)
+        headers = [col for col in next(rows) if col is not None]
+        columns, units = parse_units(headers)
+
+        chunk = []
+        for row in rows:
+            row = row[:len(columns)]
+            if all(value is None for value in row):
+                continue
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield _to_frame(chunk, columns, units)
+                chunk = []
+        if chunk:
+            yield _to_frame(chunk, columns, units)
+    finally:
+        wb.close()
+
+
+def _to_frame(rows, columns, units):
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    # Hold numbers as float so a column has the same type in every chunk
+    numeric = [col for col in df.select_dtypes(include='number').columns if col not in INTEGER_COLUMNS]
+    df[numeric] = df[numeric].astype(float)
+    df.attrs['units'] = dict(units)
+    return df
+
+
+def prepare_chunk(df, lithogenic=True):
+    """
+    Apply the `WC17_01` clean-up to one chunk: censored entries, quality flags, lithogenic correction,
+    unit conversion, phytoplankton composition and schema.
+
+    Parameters:
+    - df (DataFrame): Chunk from `iter_sheet_chunks`.
+    - lithogenic (bool): Add the lithogenic pTM columns. Defaults to True.
+
+    Returns:
+    - DataFrame: Processed chunk with the updated unit registry in `df.attrs['units']`.
+      Label columns are left as text; they become categoricals when the table is loaded.
+    """
+    # Each chunk starts from the header units, so conversions are not applied twice
+    units = dict(df.attrs['units'])
+    # Below detection limit entries ("<0.02", "<DL") as values with '<col>_cens' flags; every measured
+    # column gets a flag column, so all chunks have the same columns whichever of them hold censored entries
+    df = parse_censored(df)
+    df = add_censor_flags(df, [col for col in df.select_dtypes(include='floating').columns
+                               if col not in UNFLAGGED_COLUMNS])
+    df = init_flags(df, ranges=FLAG_RANGES, questionable=QUESTIONABLE_RANGES)
+    if lithogenic:
+        df = add_lithogenic(df, units=units)
+    df = convert_units(df, units, star_conversions(df, units))
+    df = add_composition(df, units=units)
+    df = apply_schema(df, labels=False)
+    df.attrs['units'] = units
+    return df
+
+
+def _chunk_schema(table, units):
+    # Columns empty in the first chunk are stored as float
+    fields = [pa.field(field.name, pa.float64()) if pa.types.is_null(field.type) else field
+              for field in table.schema]
+    metadata = dict(table.schema.metadata or {})
+    metadata[UNITS_KEY] = json.dumps(units).encode()
+    return pa.schema(fields, metadata=metadata)
+
+
+def _iter_tables(file_name, sheet_name, chunk_size, lithogenic, csv_path=None):
+    # Processed chunks as Arrow tables with the column types of the first chunk
+    schema = None
+    n_rows = 0
+    for i, chunk in enumerate(iter_sheet_chunks(file_name, sheet_name, chunk_size)):
+        chunk = prepare_chunk(chunk, lithogenic=lithogenic)
+        units = chunk.attrs['units']
+        if schema is None:
+            schema = _chunk_schema(pa.Table.from_pandas(_arrow_safe(chunk), preserve_index=False), units)
+        try:
+            table = pa.Table.from_pandas(_arrow_safe(chunk), schema=schema, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise ValueError(f"Chunk {i} of '{file_name}' does not match the first chunk: {e}") from e
+
+        if csv_path is not None:
+            chunk.set_axis(with_units(chunk.columns, units), axis=1).to_csv(
+                csv_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+
+        n_rows += len(chunk)
+        print(f"{os.path.basename(file_name)} chunk {i}: {len(chunk)} rows ({n_rows} total)")
+        yield table
+
+
+def _remove_partial(path, csv_path, basename=None):
+    # Files of a failed ingest: the unfinished single file and CSV copy ('.partial'), or the partition files of `basename`
+    for partial in [f'{path}.partial', csv_path]:
+        if partial is not None and os.path.exists(partial):
+            os.remove(partial)
+    if basename is None or not os.path.isdir(path):
+        return
+    pattern = re.compile(rf'{re.escape(basename)}-\d+\.parquet')
+    for root, _, files in os.walk(path):
+        for f in files:
+            if pattern.fullmatch(f):
+                os.remove(os.path.join(root, f))
+
+
+def stream_ingest(file_name, sheet_name, output_name, chunk_size=CHUNK_SIZE, lithogenic=True,
+                  publish=None, partition_by=None, basename=None):
+    """
+    Ingest a workbook sheet chunk by chunk into a Parquet table.
+
+    The single-file output and its CSV copy are written to '.partial' files and moved into place once
+    complete. If a chunk fails, the partial files (or the partition files of `basename`) are removed
+    before the error is raised, so a failed workbook leaves no rows behind.
+
+    Parameters:
+    - file_name (str): xlsx workbook.
+    - sheet_name (str): Sheet to read. None reads the first sheet.
+    - output_name (str): Output table name, with or without extension.
+    - chunk_size (int): Rows per chunk. Defaults to `CHUNK_SIZE`.
+    - lithogenic (bool): Add the lithogenic pTM columns. Defaults to True.
+    - publish (bool): Also append each chunk to a CSV copy. Defaults to the `WC17_PUBLISH` setting.
+      Not available for partitioned output.
+    - partition_by (str): Write a directory partitioned by this column (e.g. 'Cruise') instead of a single file.
+      Other workbooks can be added to the same directory.
+    - basename (str): File name prefix inside the partitions. Defaults to the workbook name.
+
+    Returns:
+    - str: Path of the Parquet file or partitioned directory written.
+    - int: Number of rows written.
+
+    Raises:
+    - ValueError: If the sheet has no data rows or a chunk does not match the column types of the first chunk.
+    """
+    if publish is None:
+        publish = PUBLISH and partition_by is None
+
+    path = table_path(output_name)
+    csv_path = f"{table_path(output_name, 'csv')}.partial" if publish else None
+    if partition_by is not None and basename is None:
+        basename = os.path.splitext(os.path.basename(file_name))[0]
+
+    try:
+        tables = _iter_tables(file_name, sheet_name, chunk_size, lithogenic, csv_path)
+        first = next(tables, None)
+        if first is None:
+            raise ValueError(f"Sheet '{sheet_name}' in '{file_name}' has no data rows.")
+        n_rows = first.num_rows
+
+        if partition_by is None:
+            # Written next to the output and moved into place once complete
+            with pq.ParquetWriter(f'{path}.partial', first.schema) as writer:
+                writer.write_table(first)
+                for table in tables:
+                    writer.write_table(table)
+                    n_rows += table.num_rows
+            os.replace(f'{path}.partial', path)
+            if csv_path is not None:
+                os.replace(csv_path, csv_path[:-len('.partial')])
+        else:
+            def batches():
+                nonlocal n_rows
+                yield from first.to_batches()
+                for table in tables:
+                    n_rows += table.num_rows
+                    yield from table.to_batches()
+
+            # The pandas metadata would still list the partition column, which is stored in the directory names
+            metadata = {k: v for k, v in first.schema.metadata.items() if k != b'pandas'}
+            schema = first.schema.with_metadata(metadata)
+            ds.write_dataset(pa.RecordBatchReader.from_batches(schema, batches()), path, format='parquet',
+                             partitioning=[partition_by], partitioning_flavor='hive',
+                             basename_template=f'{basename}-{{i}}.parquet',
+                             existing_data_behavior='overwrite_or_ignore')
+    except Exception:
+        _remove_partial(path, csv_path, basename if partition_by is not None else None)
+        raise
+
+    return path, n_rows
+
+#%%
+
+### BATCH INGEST ###
+
+def batch_jobs(source, sheet_name=None):
+    """
+    List the (workbook, sheet) pairs of a batch.
+
+    Parameters:
+    - source (str): Directory of xlsx workbooks, or a CSV manifest with 'file' and 'sheet' columns
+      (paths relative to the manifest, an empty sheet reads the first sheet).
+    - sheet_name (str): Sheet read from every workbook of a directory. None reads the first sheet.
+
+    Returns:
+    - list: (workbook, sheet) pairs.
+
+    Raises:
+    - FileNotFoundError: If `source` does not exist.
+    """
+    if os.path.isdir(source):
+        files = sorted(f for f in os.listdir(source) if f.endswith('.xlsx') and not f.startswith('~$'))
+        return [(os.path.join(source, f), sheet_name) for f in files]
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Batch source '{source}' not found. Provide a directory of xlsx files or a CSV manifest.")
+
+    manifest = pd.read_csv(source, dtype=str)
+    root = os.path.dirname(source)
+    sheets = manifest['sheet'] if 'sheet' in manifest.columns else pd.Series(None, index=manifest.index)
+    return [(os.path.join(root, f), None if pd.isna(sheet) or not sheet.strip() else sheet.strip())
+            for f, sheet in zip(manifest['file'], sheets)]
+
+
+def ingest_workbook(file_name, sheet_name, output_name, chunk_size=CHUNK_SIZE, lithogenic=True,
+                    partition_by='Cruise'):
+    """
+    Worker for `run_batch`: ingest one workbook sheet into the partitioned output.
+    Errors are recorded instead of raised, so one bad workbook does not stop the batch.
+
+    Returns:
+    - dict: 'file', 'sheet', 'rows', 'seconds', 'status' ('ok' or 'failed') and 'error'.
+    """
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    basename = stem if sheet_name is None else f'{stem}.{sheet_name}'
+    record = {'file': file_name, 'sheet': sheet_name, 'rows': 0, 'seconds': 0.0, 'status': 'ok', 'error': ''}
+
+    start = time.perf_counter()
+    try:
+        _, record['rows'] = stream_ingest(file_name, sheet_name, output_name, chunk_size=chunk_size,
+                                          lithogenic=lithogenic, publish=False,
+                                          partition_by=partition_by, basename=basename)
+    except Exception as e:
+        record['status'] = 'failed'
+        record['error'] = f'{type(e).__name__}: {e}'
+    record['seconds'] = time.perf_counter() - start
+    return record
+
+
+def run_batch(source, output_name, sheet_name=None, workers=None, chunk_size=CHUNK_SIZE,
+              lithogenic=True, partition_by='Cruise'):
+    """
+    Ingest many cruise workbooks in parallel into one table partitioned by `partition_by`.
+
+    Each workbook is processed in its own worker process with `stream_ingest`. Any existing
+    output directory is replaced. The per-file report is saved as '<output_name>_report'.
+
+    Parameters:
+    - source (str): Directory of xlsx workbooks or CSV manifest (see `batch_jobs`).
+    - output_name (str): Output table name (a partitioned directory).
+    - sheet_name (str): Sheet read from every workbook of a directory. None reads the first sheet.
+    - workers (int): Worker processes. Defaults to the number of CPUs.
+    - chunk_size (int): Rows per chunk. Defaults to `CHUNK_SIZE`.
+    - lithogenic (bool): Add the lithogenic pTM columns. Defaults to True.
+    - partition_by (str): Partition column. Defaults to 'Cruise'.
+
+    Returns:
+    - DataFrame: One row per workbook with rows written, timing, status and error.
+    """
+    jobs = batch_jobs(source, sheet_name)
+    path = table_path(output_name)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+
+    records = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(ingest_workbook, file_name, sheet, output_name, chunk_size,
+                               lithogenic, partition_by): i
+                   for i, (file_name, sheet) in enumerate(jobs)}
+        for future in as_completed(futures):
+            record = future.result()
+            records[futures[future]] = record
+            if record['status'] == 'ok':
+                print(f"Done {record['file']}: {record['rows']} rows in {record['seconds']:.1f} s")
+            else:
+                print(f"FAILED {record['file']} after {record['seconds']:.1f} s - {record['error']}")
+
+    report = pd.DataFrame(records, columns=['file', 'sheet', 'rows', 'seconds', 'status', 'error'])
+    n_failed = (report['status'] == 'failed').sum()
+    print(f"Batch ingest: {len(report) - n_failed} of {len(report)} workbooks, {report['rows'].sum()} rows, "
+          f"{report['seconds'].sum():.1f} s worker time")
+
+    write_table(report, f'{os.path.splitext(output_name)[0]}_report', publish_format='csv')
+    return report
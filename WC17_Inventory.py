@@ -0,0 +1,182 @@
+"""
+WC17: Depth-Integrated Inventories per Station
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- `integrate_profiles` integrates all stations x variables between any depth limits in one batched NumPy operation over the station x depth arrays of `WC17_MLD.profile_arrays`.
+- Trapezoid integration interpolates linearly between samples; step integration gives each sample the layer between the midpoints to its neighbours. Values above the shallowest sample are taken as constant up to the top limit, and the bottom limit is cut at the deepest sample of each variable.
+- `inventory_table` returns a station x variable inventory table for several layers at once, e.g. 0-150 m, the mixed layer ('MLD') and the euphotic zone ('euphotic'), in integrated units (e.g. µg/L -> mg/m2).
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import numpy as np
+import pandas as pd
+
+from WC17_MLD import profile_arrays
+from WC17_Units import integrated_unit
+
+#%%
+
+### SETTINGS ###
+
+# Layers of `inventory_table`: name -> (top, bottom). Limits are depths (m), 'MLD' or 'euphotic'
+LAYERS = {
+    '0-150 m': (0, 150),
+    'ML': (0, 'MLD'),
+    'Euphotic': (0, 'euphotic'),
+}
+
+# Supported integration methods
+METHODS = ['trapezoid', 'step']
+
+#%%
+
+### INTEGRATION ###
+
+def _gather(a, i):
+    # a[..., i] along the last axis with `i` broadcast over leading axes
+    a = np.broadcast_to(a, i.shape + a.shape[-1:])
+    return np.take_along_axis(a, i[..., None], -1)[..., 0]
+
+
+def integrate_profiles(depth, values, top, bottom, method='trapezoid'):
+    """
+    Integrate station profiles of several variables between depth limits.
+
+    Parameters:
+    - depth (array): Station x depth array sorted by depth, padded with NaN (see `profile_arrays`).
+    - values (array): Station x depth x variable array.
+    - top (float or array): Upper limit (m), per station or (layer x station).
+    - bottom (float or array): Lower limit (m), same shape as `top`.
+    - method (str): 'trapezoid' or 'step'. Defaults to 'trapezoid'.
+
+    Returns:
+    - array: Inventories (value x m), (station x variable) or (layer x station x variable).
+      NaN where a variable has no value in a profile or a limit is missing.
+
+    Raises:
+    - ValueError: If the method is unknown.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Invalid method. Choose from: {', '.join(METHODS)}")
+
+    # One row per (station, variable); missing values are moved to the end of each row
+    y = values.transpose(0, 2, 1)
+    x = np.where(np.isnan(y), np.nan, depth[:, None, :])
+    order = np.argsort(np.where(np.isnan(x), np.inf, x), axis=-1)
+    x = np.take_along_axis(x, order, -1)
+    y = np.take_along_axis(y, order, -1)
+    n = np.isfinite(x).sum(axis=-1)
+
+    # Integral from the shallowest sample to each sample
+    h = np.diff(x, axis=-1)
+    cum = np.concatenate([np.zeros(x.shape[:-1] + (1,)),
+                          np.nancumsum(h * (y[..., :-1] + y[..., 1:]) / 2, axis=-1)], axis=-1)
+    x_last = _gather(x, np.maximum(n - 1, 0))
+
+    def integral_to(z):
+        # Integral from the shallowest sample to depth z (negative above it), z of shape (..., station)
+        z = np.fmin(np.asarray(z, dtype=float)[..., None], x_last)
+        i = np.clip((x <= z[..., None]).sum(axis=-1) - 1, 0, np.maximum(n - 2, 0))
+        x0, y0, y1, c0 = _gather(x, i), _gather(y, i), _gather(y, i + (n > 1)), _gather(cum, i)
+        dx = _gather(np.concatenate([h, np.ones(h.shape[:-1] + (1,))], axis=-1), i)
+        t = z - x0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if method == 'trapezoid':
+                inside = c0 + y0 * t + 0.5 * (y1 - y0) * t ** 2 / dx
+            else:
+                inside = c0 + y0 * np.fmin(t, dx / 2) + y1 * np.fmax(t - dx / 2, 0)
+        return np.where((t < 0) | (n == 1), y0 * t, inside)
+
+    top = np.asarray(top, dtype=float)
+    bottom = np.asarray(bottom, dtype=float)
+    top, bottom = np.broadcast_arrays(top, bottom)
+    total = integral_to(bottom) - integral_to(top)
+    valid = (n > 0) & np.isfinite(top)[..., None] & ~np.isnan(bottom)[..., None]
+    return np.where(valid, total, np.nan)
+
+
+def euphotic_depth(df, chla_col='Tchla', station_col='Station'):
+    """
+    Euphotic depth (1% light, m) per station from surface Tchla, Zeu = 34.0 Chl^-0.39 (Morel et al., 2007).
+
+    Uses a 'Zeu' column instead when the table has one.
+
+    Returns:
+    - Series: Euphotic depth indexed by station.
+    """
+    if 'Zeu' in df.columns:
+        return df.groupby(station_col, observed=True)['Zeu'].first()
+    surface = (df.dropna(subset=[chla_col, 'Depth'])
+               .sort_values('Depth', kind='stable')
+               .groupby(station_col, observed=True)[chla_col].first())
+    with np.errstate(divide='ignore'):
+        return 34.0 * surface.where(surface > 0) ** -0.39
+
+
+def _limit(limit, df, stations, station_col):
+    # Depth limit per station: a number, 'MLD' (column of the table) or 'euphotic'
+    if isinstance(limit, str):
+        if limit == 'MLD':
+            per_station = df.groupby(station_col, observed=True)['MLD'].first()
+        elif limit == 'euphotic':
+            per_station = euphotic_depth(df, station_col=station_col)
+        else:
+            raise ValueError("Invalid depth limit. Use a depth (m), 'MLD' or 'euphotic'.")
+        return per_station.reindex(stations).to_numpy(dtype=float)
+    return np.full(len(stations), float(limit))
+
+
+def inventory_table(df, columns, layers=None, method='trapezoid', station_col='Station', units=None):
+    """
+    Station x variable inventories for several layers in one batched integration.
+
+    Parameters:
+    - df (DataFrame): One row per sample with station, 'Depth' and value columns (and 'MLD' for the ML layer).
+    - columns (list): Columns to integrate.
+    - layers (dict): Layer name -> (top, bottom) limits. Defaults to `LAYERS`.
+    - method (str): 'trapezoid' or 'step'. Defaults to 'trapezoid'.
+    - station_col (str): Station column. Defaults to 'Station'.
+    - units (dict): Column -> unit registry of `df`. Inventories are converted to integrated units
+      (e.g. µg/L -> mg/m2); columns without an integrable unit are left in value x m.
+
+    Returns:
+    - DataFrame: One row per layer and station with 'Layer', station, 'Top' and 'Bottom' (m) and one
+      column per variable, with the integrated units in `attrs['units']`.
+    """
+    if layers is None:
+        layers = LAYERS
+    columns = list(columns)
+    stations, depth, values = profile_arrays(df, columns, station_col)
+
+    top = np.array([_limit(t, df, stations, station_col) for t, _ in layers.values()])
+    bottom = np.array([_limit(b, df, stations, station_col) for _, b in layers.values()])
+    inv = integrate_profiles(depth, values, top, bottom, method)
+
+    # Integrated units
+    factors = np.ones(len(columns))
+    out_units = {'Top': 'm', 'Bottom': 'm'}
+    for j, col in enumerate(columns):
+        try:
+            factors[j], out_units[col] = integrated_unit((units or {}).get(col))
+        except ValueError:
+            continue
+
+    table = pd.DataFrame(inv.reshape(-1, len(columns)) * factors, columns=columns)
+    table.insert(0, 'Layer', np.repeat(list(layers), len(stations)))
+    table.insert(1, station_col, np.tile(stations, len(layers)))
+    table.insert(2, 'Top', top.ravel())
+    table.insert(3, 'Bottom', np.fmin(bottom, np.nanmax(depth, axis=1)).ravel())
+    table.attrs['units'] = out_units
+    return table
@@ -0,0 +1,81 @@
+"""
+WC17: Depth-Integrated Inventories of Pigments, Phytoplankton Groups and Trace Metals
+
+This script is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- This script generates tables with the column inventory of every station and variable over 0-150 m (0-250 m for trace metals), the mixed layer and the euphotic zone (see `WC17_Inventory`).
+- Before running this script, execute `WC17_01` to process the original data files which creates "WC17_DataComp_update.parquet" and "WC17_TM_Comp_update.parquet" used here.
+- Required data: Two XLSX files available from Zenodo: https://doi.org/10.5281/zenodo.6615070.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+from WC17_Dataset import Dataset
+from WC17_Inventory import LAYERS, inventory_table
+from WC17_IO import write_table
+from WC17_Lithogenic import METALS
+
+#%%
+
+### SETTINGS ###
+
+# Integration method: 'trapezoid' or 'step'
+method = 'trapezoid'
+
+# Replace station codes with labels
+station_mapping = {'IO08': 'St. 41.0°S', 'IO07': 'St. 43.0°S', 'IO06': 'St. 45.5°S',
+                   'IO05': 'St. 48.0°S', 'IO04': 'St. 50.6°S', 'IO03': 'St. 53.5°S',
+                   'IO02': 'St. 56.0°S', 'IO01': 'St. 58.5°S'}
+
+#%%
+
+### PIGMENT & PHYTOPLANKTON INVENTORIES (150m) ###
+
+#File name
+file = "WC17_DataComp_update"
+
+# Lazy view of the compiled dataset, values with a bad quality flag set to NaN
+dc = Dataset(file).flagged()
+
+# Tchla and phytoplankton groups of all stations, integrated over 0-150 m, the ML and the euphotic zone
+inv_columns = ['Tchla'] + dc.column_range('Diatoms', 'Prochlorococcus')
+tbl = dc.columns(['Station', 'Depth', 'MLD'] + inv_columns).to_frame()
+tbl_inv = inventory_table(tbl, inv_columns, method=method, units=dc.units)
+tbl_inv['Station'] = tbl_inv['Station'].astype(object).replace(station_mapping)
+print(tbl_inv.round(1).to_string())
+
+#Save df
+output_filename = 'WC17_DataComp_Inventory'
+write_table(tbl_inv, output_filename, units=tbl_inv.attrs['units'])
+
+#%%
+
+### TRACE METAL INVENTORIES (250m) ###
+
+#File name
+file = "WC17_TM_Comp_update"
+
+# Lazy view of the compiled dataset, values with a bad quality flag set to NaN
+tm = Dataset(file).flagged()
+
+# Dissolved and particulate (excess) trace metals over 0-250 m and the ML (no Tchla for the euphotic depth)
+inv_columns = [f'd{m}' for m in METALS] + [f'p{m}' for m in METALS]
+tbl = tm.columns(['Station', 'Depth', 'MLD'] + inv_columns).to_frame()
+tbl_inv = inventory_table(tbl, inv_columns, layers={'0-250 m': (0, 250), 'ML': LAYERS['ML']},
+                          method=method, units=tm.units)
+tbl_inv['Station'] = tbl_inv['Station'].astype(object).replace(station_mapping)
+print(tbl_inv.round(1).to_string())
+
+#Save df
+output_filename = 'WC17_TM_Inventory'
+write_table(tbl_inv, output_filename, units=tbl_inv.attrs['units'])
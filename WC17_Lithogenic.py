@@ -0,0 +1,315 @@
+"""
+WC17: Lithogenic Particulate Trace Metal Correction
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- Calculates the lithogenic fraction of particulate trace metals (pTM) from pAl and crustal ratios (Rudnick and Gao, 2013).
+- `add_lithogenic` adds the `%pTM_lith`, `pTM_lith` and total `pTM_T` columns and subtracts the lithogenic fraction from pTM, for all metals at once on whole columns.
+- `sensitivity_table` repeats the correction for several crustal reference sets (`RATIO_SETS`) in one broadcasted (ratio sets x samples x metals) calculation, for station median tables per reference set.
+- `lithogenic_uncertainty` propagates the analytical uncertainty of pAl and pTM and the uncertainty of the crustal ratios by Monte-Carlo: N perturbed realizations are corrected as one (N x samples x metals) array, in sample batches of bounded size that can run in worker processes.
+- Used by `WC17_01` and by the chunked ingest in `WC17_Ingest`.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from WC17_Flags import combine_flags
+from WC17_Units import DEFAULT_UNITS, conversion_factor
+
+#%%
+
+### SETTINGS ###
+
+# Crustal TM:Al ratios (Rudnick and Gao, 2013)
+CRUSTAL_RATIOS = {
+    'Fe': 0.2323,
+    'Zn': 0.00163,
+    'Cd': 0.000001,
+    'Mn': 0.00948, #Goa = 0.00948, Taylor & McLenna 1985 = 0.0034
+    'Cu': 0.00034,
+    'Co': 0.00021,
+    'Ni': 0.00058
+}
+
+# Metals corrected, in output column order
+METALS = ['Fe', 'Mn', 'Co', 'Zn', 'Cd', 'Ni', 'Cu']
+
+# Crustal reference sets (rows) for the sensitivity analysis. Only the Mn ratio of
+# Taylor and McLennan (1985) is used; the other metals keep the Rudnick and Gao values.
+RATIO_SETS = pd.DataFrame.from_dict({
+    'Rudnick & Gao 2013': CRUSTAL_RATIOS,
+    'Taylor & McLennan 1985': {**CRUSTAL_RATIOS, 'Mn': 0.0034},
+}, orient='index')[METALS]
+
+# Relative (1 sigma) uncertainties used by the Monte-Carlo propagation; set these to the
+# analytical precision of pAl and pTM and the spread of the crustal ratios being considered
+MC_REL_SD = {'pAl': 0.05, 'pTM': 0.05, 'ratio': 0.10}
+
+# Largest (N x samples x metals) array held per Monte-Carlo batch
+MC_MAX_ELEMENTS = 5_000_000
+
+#%%
+
+### LITHOGENIC FUNCTIONS ###
+
+# Equation for Lithogenic pTM calculation using crustal ratios
+#pTM_lith_p = (pAl * ratio)/pTM * 100
+
+def calc_pTM_lith(pAl, ratio_metal, pTM, result_type='percent'):
+    """
+    Calculate lithogenic particulate trace metal (pTM) fractions using pAl and crustal ratios
+    based on Rudnick and Gao (2013). Works on single values or whole columns.
+
+    Parameters:
+    - pAl (float or array): Aluminum concentration in particulate matter.
+    - ratio_metal (str): Metal for which lithogenic fraction is calculated. Options: 'Fe', 'Zn', 'Cd', 'Mn', 'Cu', 'Co', 'Ni'.
+    - pTM (float or array): Total particulate trace metal concentration.
+    - result_type (str): 'percent' to calculate lithogenic percentage, 'lith' for lithogenic fraction. Defaults to 'percent'.
+
+    Returns:
+    - float or array: Calculated lithogenic percentage or fraction, depending on `result_type`.
+
+    Raises:
+    - ValueError: If an invalid `ratio_metal` or `result_type` is provided.
+    """
+    if ratio_metal not in CRUSTAL_RATIOS:
+        raise ValueError(f"Invalid ratio element. Choose from: {', '.join(CRUSTAL_RATIOS.keys())}")
+
+    selected_ratio = CRUSTAL_RATIOS[ratio_metal]
+    pAl = np.asarray(pAl, dtype=float)
+    pTM = np.asarray(pTM, dtype=float)
+
+    if result_type == 'percent':
+        # Percentage lithogenic contribution, capped at 100%
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percent_lith = (pAl * selected_ratio) / pTM * 100
+        return np.where(percent_lith > 100, 100.0, percent_lith)
+    elif result_type == 'lith':
+        # Lithogenic fraction, capped at total pTM (kept when pTM is missing)
+        lith_fraction = pAl * selected_ratio
+        return np.where(pTM < lith_fraction, pTM, lith_fraction)
+    else:
+        raise ValueError("Invalid result_type. Choose 'percent' or 'lith'.")
+
+
+def lithogenic_sweep(pAl, pTM, ratios):
+    """
+    Lithogenic correction for every combination of crustal ratio set, sample and metal.
+
+    Parameters:
+    - pAl (array): pAl per sample (samples).
+    - pTM (array): Total pTM (samples x metals).
+    - ratios (array): Crustal TM:Al ratios (ratio sets x metals).
+
+    Returns:
+    - array: Lithogenic percentage, capped at 100% (ratio sets x samples x metals).
+    - array: Lithogenic pTM, capped at total pTM.
+    - array: Excess (non-lithogenic) pTM.
+    """
+    pAl = np.asarray(pAl, dtype=float)[None, :, None]
+    pTM = np.asarray(pTM, dtype=float)[None, :, :]
+    return _capped_lithogenic(pAl, pTM, np.asarray(ratios, dtype=float)[:, None, :])
+
+
+def _capped_lithogenic(pAl, pTM, ratios):
+    # Capped correction on broadcastable arrays
+    lith = pAl * ratios
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent = lith / pTM * 100
+    percent = np.where(percent > 100, 100.0, percent)
+    # As calc_pTM_lith: lithogenic pTM is kept when pTM is missing
+    lith = np.where(pTM < lith, pTM, lith)
+    return percent, lith, pTM - lith
+
+
+def add_lithogenic(df, metals=None, units=None):
+    """
+    Add lithogenic pTM columns and subtract the lithogenic fraction from pTM.
+
+    Adds `%pTM_lith` and `pTM_lith` for each metal, copies total pTM to `pTM_T`
+    and replaces `pTM` with `pTM_T - pTM_lith`. When the table has flag columns (see `WC17_Flags`),
+    the new columns are flagged from the pTM and pAl flags.
+
+    Parameters:
+    - df (DataFrame): Table with pAl and pTM columns (cleaned column names).
+    - metals (list): Metals to correct. Defaults to `METALS`.
+    - units (dict): Column -> unit registry, updated in place with the units of the new columns.
+
+    Returns:
+    - DataFrame: Table with the lithogenic columns added.
+    """
+    if metals is None:
+        metals = METALS
+
+    pTM = df[[f'p{m}' for m in metals]].to_numpy(dtype=float)
+    ratios = [[CRUSTAL_RATIOS[m] for m in metals]]
+    percent, lith, _ = lithogenic_sweep(df['pAl'].to_numpy(dtype=float), pTM, ratios)
+
+    df[[f'%p{m}_lith' for m in metals]] = percent[0]
+    df[[f'p{m}_lith' for m in metals]] = lith[0]
+    df[[f'p{m}_T' for m in metals]] = pTM
+    df[[f'p{m}' for m in metals]] = pTM - lith[0]
+
+    # Flags: total pTM keeps the pTM flag, lithogenic and excess pTM take the worst of pTM and pAl
+    combine_flags(df, [f'p{m}_T' for m in metals], [f'p{m}' for m in metals])
+    combine_flags(df, [f'{prefix}{m}{suffix}' for prefix, suffix in (('%p', '_lith'), ('p', '_lith'), ('p', ''))
+                       for m in metals], [f'p{m}_T' for m in metals] * 3, 'pAl')
+
+    # Units of lithogenic and total pTM columns follow pTM
+    if units is not None:
+        for metal in metals:
+            if f'p{metal}' in units:
+                units[f'p{metal}_T'] = units[f'p{metal}_lith'] = units[f'p{metal}']
+            units[f'%p{metal}_lith'] = '%'
+
+    return df
+
+
+def _sheet_scale(metals, units):
+    # Factors from table units to the xlsx units used by WC17_01 (e.g. pMn pmol -> nmol)
+    scale = np.ones(len(metals))
+    for i, metal in enumerate(metals):
+        col = f'p{metal}_T'
+        if units and col in units and col in DEFAULT_UNITS and units[col] != DEFAULT_UNITS[col]:
+            scale[i], _ = conversion_factor(units[col], DEFAULT_UNITS[col])
+    return scale
+
+
+def sensitivity_table(df, ratio_sets=None, id_columns=('Station',), units=None):
+    """
+    Lithogenic correction of a processed table for several crustal reference sets at once.
+
+    Parameters:
+    - df (DataFrame): Table from `WC17_01` with pAl and total pTM (`pTM_T`) columns.
+    - ratio_sets (DataFrame): Crustal TM:Al ratios, one row per reference set and one column per metal.
+      Defaults to `RATIO_SETS`.
+    - id_columns (list): Columns repeated for each reference set. Defaults to ('Station',).
+    - units (dict): Column -> unit registry of `df`. Total pTM converted at ingest (e.g. pMn to pmol)
+      is scaled back to the xlsx units the ratios apply to, and results are returned in the table units.
+
+    Returns:
+    - DataFrame: One block of rows per reference set with 'Ratio set', `id_columns`,
+      `%pTM_lith`, `pTM_lith` and excess `pTM` columns.
+    """
+    if ratio_sets is None:
+        ratio_sets = RATIO_SETS
+    metals = list(ratio_sets.columns)
+
+    scale = _sheet_scale(metals, units)
+    pTM = df[[f'p{m}_T' for m in metals]].to_numpy(dtype=float) * scale
+    percent, lith, excess = lithogenic_sweep(df['pAl'].to_numpy(dtype=float), pTM, ratio_sets.to_numpy())
+
+    n_sets, n_samples = len(ratio_sets), len(df)
+    out = pd.DataFrame({'Ratio set': np.repeat(ratio_sets.index.to_numpy(), n_samples)})
+    for col in id_columns:
+        out[col] = np.tile(df[col].to_numpy(), n_sets)
+    out[[f'%p{m}_lith' for m in metals]] = percent.reshape(-1, len(metals))
+    out[[f'p{m}_lith' for m in metals]] = lith.reshape(-1, len(metals)) / scale
+    out[[f'p{m}' for m in metals]] = excess.reshape(-1, len(metals)) / scale
+    return out
+
+
+def _mc_batch(pAl, pTM, ratio_draws, rel_sd, q, seed):
+    # Percentiles over N realizations for one batch of samples: (3 x len(q) x samples x metals)
+    rng = np.random.default_rng(seed)
+    n = len(ratio_draws)
+    pAl_draw = pAl * (1 + rel_sd['pAl'] * rng.standard_normal((n, len(pAl))))
+    pTM_draw = pTM * (1 + rel_sd['pTM'] * rng.standard_normal((n,) + pTM.shape))
+    results = _capped_lithogenic(np.clip(pAl_draw, 0, None)[:, :, None], np.clip(pTM_draw, 0, None),
+                                 ratio_draws[:, None, :])
+    with warnings.catch_warnings():
+        # Samples without pAl or pTM give all-NaN slices
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.stack([np.nanpercentile(x, q, axis=0) for x in results])
+
+
+def lithogenic_uncertainty(df, n=1000, rel_sd=None, band=(2.5, 97.5), id_columns=('Station',),
+                           units=None, seed=0, workers=None, max_elements=MC_MAX_ELEMENTS):
+    """
+    Monte-Carlo uncertainty of the lithogenic correction.
+
+    pAl, total pTM and the crustal ratios are perturbed with normal relative errors (negative
+    draws set to zero) and the capped correction is applied to all N realizations at once.
+    Samples are split into batches so that each holds at most `max_elements` values per array;
+    batches run in worker processes when there is more than one (only from a script with a
+    `__main__` guard; cell-based scripts pass `workers=1`). Ratio realizations are shared by all
+    samples and results do not depend on the number of workers.
+
+    Parameters:
+    - df (DataFrame): Table from `WC17_01` with pAl and total pTM (`pTM_T`) columns.
+    - n (int): Number of realizations. Defaults to 1000.
+    - rel_sd (dict): Relative 1 sigma uncertainty of 'pAl', 'pTM' and 'ratio'. Defaults to `MC_REL_SD`.
+    - band (tuple): Lower and upper percentiles. Defaults to (2.5, 97.5).
+    - id_columns (list): Columns copied to the result. Defaults to ('Station',).
+    - units (dict): Column -> unit registry of `df` (see `sensitivity_table`).
+    - seed (int): Random seed. Defaults to 0.
+    - workers (int): Worker processes. Defaults to the number of CPUs. Use 1 to stay in this process.
+    - max_elements (int): Batch size limit. Defaults to `MC_MAX_ELEMENTS`.
+
+    Returns:
+    - DataFrame: `id_columns` plus '<col>_median', '<col>_p<lower>' and '<col>_p<upper>' for each
+      `%pTM_lith`, `pTM_lith` and excess `pTM` column, with units in `df.attrs['units']`.
+
+    Raises:
+    - ValueError: If the realizations of a single sample (n x metals) exceed `max_elements`.
+    """
+    if rel_sd is None:
+        rel_sd = MC_REL_SD
+    metals = METALS
+    q = [50, *band]
+
+    # The percentiles need all realizations of a sample at once, so a batch holds at least one sample
+    if n * len(metals) > max_elements:
+        raise ValueError(f"{n} realizations of {len(metals)} metals exceed max_elements={max_elements} for one "
+                         f"sample. Use fewer realizations or raise max_elements.")
+
+    scale = _sheet_scale(metals, units)
+    pAl = df['pAl'].to_numpy(dtype=float)
+    pTM = df[[f'p{m}_T' for m in metals]].to_numpy(dtype=float) * scale
+
+    seeds = np.random.SeedSequence(seed)
+    ratio_seed, batch_seed = seeds.spawn(2)
+    ratios = np.array([CRUSTAL_RATIOS[m] for m in metals])
+    ratio_draws = ratios * (1 + rel_sd['ratio'] * np.random.default_rng(ratio_seed).standard_normal((n, len(metals))))
+    ratio_draws = np.clip(ratio_draws, 0, None)
+
+    batch = max_elements // (n * len(metals))
+    blocks = [slice(i, i + batch) for i in range(0, len(df), batch)]
+    args = ([pAl[b] for b in blocks], [pTM[b] for b in blocks], [ratio_draws] * len(blocks),
+            [rel_sd] * len(blocks), [q] * len(blocks), batch_seed.spawn(len(blocks)))
+    if workers == 1 or len(blocks) == 1:
+        results = list(map(_mc_batch, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_mc_batch, *args))
+    stats = np.concatenate(results, axis=2)
+
+    out = df[list(id_columns)].reset_index(drop=True)
+    names = [[f'%p{m}_lith' for m in metals], [f'p{m}_lith' for m in metals], [f'p{m}' for m in metals]]
+    out_units = {}
+    for i, cols in enumerate(names):
+        # Lithogenic and excess pTM back to the table units
+        factor = 1 if i == 0 else scale
+        for j, stat in enumerate(['median'] + [f'p{p:g}' for p in band]):
+            out[[f'{col}_{stat}' for col in cols]] = stats[i, j] / factor
+            for col in cols:
+                unit = '%' if i == 0 else (units or {}).get(col)
+                if unit:
+                    out_units[f'{col}_{stat}'] = unit
+    out.attrs['units'] = out_units
+    return out
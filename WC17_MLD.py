@@ -0,0 +1,256 @@
+"""
+WC17: Mixed Layer Depth from Temperature and Salinity Profiles
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- `profile_arrays` arranges a long table (one row per station and depth) as station x depth arrays, padded with NaN below the deepest sample.
+- `mixed_layer_depth` finds the MLD of every station at once from potential density (`sigma_theta`), by a density threshold relative to a reference depth or by a density gradient criterion. An array of criterion values gives the MLD for each value in the same pass (threshold sweep).
+- `add_mld` adds the station MLD to every sample ('MLD') and derives the mixed layer flag ('ML' is "IN" above the MLD) where the sheet gives none. `WC17_01` calls it for both compiled datasets.
+- The MLD is linearly interpolated between samples, so it is only as good as the vertical resolution of the profile. It is infinite when the density never exceeds the criterion (mixed below the deepest sample).
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import numpy as np
+import pandas as pd
+
+#%%
+
+### SETTINGS ###
+
+# Density threshold (kg m-3) relative to the reference depth (m), de Boyer Montegut et al. (2004)
+THRESHOLD = 0.03
+REF_DEPTH = 10
+
+# Density gradient criterion (kg m-4)
+GRADIENT = 0.0005
+
+# Thresholds (kg m-3) compared by `mld_sweep`
+SWEEP_THRESHOLDS = [0.01, 0.03, 0.05, 0.125]
+
+#%%
+
+### DENSITY ###
+
+def sigma_theta(temp, sal):
+    """
+    Potential density anomaly (kg m-3) at the surface, UNESCO EOS-80 (Millero and Poisson, 1981).
+
+    In situ temperature is used as potential temperature, which is close enough in the upper few hundred metres.
+
+    Parameters:
+    - temp (array): Temperature (°C).
+    - sal (array): Practical salinity.
+
+    Returns:
+    - array: Density minus 1000 kg m-3.
+    """
+    t = np.asarray(temp, dtype=float)
+    s = np.asarray(sal, dtype=float)
+    rho_w = (999.842594 + 6.793952e-2 * t - 9.095290e-3 * t ** 2 + 1.001685e-4 * t ** 3
+             - 1.120083e-6 * t ** 4 + 6.536332e-9 * t ** 5)
+    a = 8.24493e-1 - 4.0899e-3 * t + 7.6438e-5 * t ** 2 - 8.2467e-7 * t ** 3 + 5.3875e-9 * t ** 4
+    b = -5.72466e-3 + 1.0227e-4 * t - 1.6546e-6 * t ** 2
+    with np.errstate(invalid='ignore'):
+        return rho_w + a * s + b * s ** 1.5 + 4.8314e-4 * s ** 2 - 1000
+
+#%%
+
+### PROFILE ARRAYS ###
+
+def profile_arrays(df, columns, station_col='Station', depth_col='Depth'):
+    """
+    Station x depth arrays of a long table.
+
+    Parameters:
+    - df (DataFrame): One row per sample with station, depth and value columns.
+    - columns (list): Value columns.
+    - station_col (str): Station column. Defaults to 'Station'.
+    - depth_col (str): Depth column. Defaults to 'Depth'.
+
+    Returns:
+    - tuple: (stations, depth, values). `stations` is an Index in sorted order, `depth` a
+      (station x depth) array sorted by depth within each station and `values` a
+      (station x depth x column) array, both padded with NaN.
+    """
+    data = df[[station_col, depth_col] + list(columns)].dropna(subset=[station_col, depth_col])
+    data = data.sort_values([station_col, depth_col], kind='stable')
+    codes, stations = pd.factorize(data[station_col], sort=True)
+    level = data.groupby(codes).cumcount().to_numpy()
+
+    n_depth = level.max() + 1 if len(level) else 0
+    depth = np.full((len(stations), n_depth), np.nan)
+    values = np.full((len(stations), n_depth, len(columns)), np.nan)
+    depth[codes, level] = data[depth_col].to_numpy(dtype=float)
+    values[codes, level] = data[list(columns)].to_numpy(dtype=float)
+    return pd.Index(stations, name=station_col), depth, values
+
+#%%
+
+### MIXED LAYER DEPTH ###
+
+def _interp_rows(x, y, x0):
+    # Linear interpolation of y at x0 within each row of sorted, NaN-padded x (clamped to the end points)
+    n = np.isfinite(x).sum(axis=-1)
+    i = np.clip((x <= x0[..., None]).sum(axis=-1), 1, np.maximum(n - 1, 1))
+    x1, x2 = np.take_along_axis(x, i[..., None] - 1, -1)[..., 0], np.take_along_axis(x, i[..., None], -1)[..., 0]
+    y1, y2 = np.take_along_axis(y, i[..., None] - 1, -1)[..., 0], np.take_along_axis(y, i[..., None], -1)[..., 0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        w = np.clip((x0 - x1) / (x2 - x1), 0, 1)
+    return np.where(n > 1, y1 + w * (y2 - y1), y1)
+
+
+def mixed_layer_depth(depth, sigma, criterion='threshold', value=None, ref_depth=REF_DEPTH):
+    """
+    Mixed layer depth of every profile in one pass.
+
+    Parameters:
+    - depth (array): Station x depth array sorted by depth, padded with NaN (see `profile_arrays`).
+    - sigma (array): Potential density anomaly (kg m-3), same shape as `depth`.
+    - criterion (str): 'threshold' (density exceeds the density at `ref_depth` by `value`)
+      or 'gradient' (density gradient below `ref_depth` exceeds `value`).
+    - value (float or array): Criterion value(s). Defaults to `THRESHOLD` or `GRADIENT`.
+    - ref_depth (float): Reference depth (m); the shallowest sample is used if it is deeper. Defaults to 10.
+
+    Returns:
+    - array: MLD (m) per station, or (value x station) for an array of values. Infinite when the
+      criterion is not met within the profile, NaN for stations without data.
+
+    Raises:
+    - ValueError: If the criterion is unknown.
+    """
+    if criterion not in ('threshold', 'gradient'):
+        raise ValueError("Invalid criterion. Choose 'threshold' or 'gradient'.")
+    if value is None:
+        value = THRESHOLD if criterion == 'threshold' else GRADIENT
+
+    # Samples without density are moved to the end of each profile
+    depth = np.where(np.isnan(sigma), np.nan, depth)
+    order = np.argsort(np.where(np.isnan(depth), np.inf, depth), axis=1)
+    depth = np.take_along_axis(depth, order, 1)
+    sigma = np.take_along_axis(sigma, order, 1)
+
+    values = np.asarray(value, dtype=float)
+    crit = values.reshape(-1, 1, 1)
+    ref = np.fmax(ref_depth, depth[:, 0])
+    below = depth >= ref[:, None]
+
+    with np.errstate(invalid='ignore'):
+        if criterion == 'threshold':
+            sigma_ref = _interp_rows(depth, sigma, ref)
+            level = sigma_ref[None, :, None] + crit
+            exceed = (sigma[None] > level) & below[None]
+        else:
+            grad = np.diff(sigma, axis=1) / np.diff(depth, axis=1)
+            exceed = (grad[None] > crit) & below[None, :, :-1]
+
+    # First sample (or interval) meeting the criterion
+    hit = exceed.any(axis=-1)
+    j = exceed.argmax(axis=-1)
+    if criterion == 'threshold':
+        k = np.maximum(j - 1, 0)
+        d1, d2 = np.take_along_axis(np.broadcast_to(depth, exceed.shape), np.stack([k, j], -1), -1).transpose(2, 0, 1)
+        s1, s2 = np.take_along_axis(np.broadcast_to(sigma, exceed.shape), np.stack([k, j], -1), -1).transpose(2, 0, 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            frac = np.where(s2 > s1, (level[..., 0] - s1) / (s2 - s1), 1)
+        mld = d1 + np.clip(frac, 0, 1) * (d2 - d1)
+    else:
+        mld = np.take_along_axis(np.broadcast_to(depth[:, :-1], exceed.shape), j[..., None], -1)[..., 0]
+
+    mld = np.where(hit, mld, np.inf)
+    mld = np.where(np.isfinite(depth).any(axis=1), mld, np.nan)
+    return mld if values.ndim else mld[0]
+
+
+def station_mld(df, criterion='threshold', value=None, ref_depth=REF_DEPTH, station_col='Station'):
+    """
+    Mixed layer depth per station of a table with Temp and Sal.
+
+    Parameters:
+    - df (DataFrame): One row per sample with station, 'Depth', 'Temp' and 'Sal' columns.
+    - criterion, value, ref_depth: See `mixed_layer_depth`.
+    - station_col (str): Station column. Defaults to 'Station'.
+
+    Returns:
+    - Series: MLD (m) indexed by station.
+    """
+    data = df.assign(sigma=sigma_theta(df['Temp'], df['Sal']))
+    stations, depth, values = profile_arrays(data, ['sigma'], station_col)
+    return pd.Series(mixed_layer_depth(depth, values[..., 0], criterion, value, ref_depth),
+                     index=stations, name='MLD')
+
+
+def mld_sweep(df, thresholds=None, gradients=(GRADIENT,), ref_depth=REF_DEPTH, station_col='Station'):
+    """
+    Station MLDs for several criteria, each criterion type in one pass.
+
+    Parameters:
+    - df (DataFrame): One row per sample with station, 'Depth', 'Temp' and 'Sal' columns.
+    - thresholds (list): Density thresholds (kg m-3). Defaults to `SWEEP_THRESHOLDS`.
+    - gradients (list): Density gradients (kg m-4). Defaults to (`GRADIENT`,).
+    - ref_depth (float): Reference depth (m). Defaults to 10.
+    - station_col (str): Station column. Defaults to 'Station'.
+
+    Returns:
+    - DataFrame: One row per station and criterion with 'Criterion', 'Value' and 'MLD' columns.
+    """
+    if thresholds is None:
+        thresholds = SWEEP_THRESHOLDS
+    data = df.assign(sigma=sigma_theta(df['Temp'], df['Sal']))
+    stations, depth, values = profile_arrays(data, ['sigma'], station_col)
+
+    parts = []
+    for criterion, crit_values in (('threshold', thresholds), ('gradient', gradients)):
+        if len(crit_values) == 0:
+            continue
+        mld = mixed_layer_depth(depth, values[..., 0], criterion, np.asarray(crit_values, dtype=float), ref_depth)
+        parts.append(pd.DataFrame({station_col: np.tile(stations, len(crit_values)),
+                                   'Criterion': criterion,
+                                   'Value': np.repeat(crit_values, len(stations)),
+                                   'MLD': mld.ravel()}))
+    return pd.concat(parts, ignore_index=True)
+
+
+def add_mld(df, criterion='threshold', value=None, ref_depth=REF_DEPTH, station_col='Station', replace=False):
+    """
+    Add the station MLD to every sample and derive the mixed layer flag.
+
+    Parameters:
+    - df (DataFrame): Compiled table with station, 'Depth', 'Temp' and 'Sal' columns.
+    - criterion, value, ref_depth: See `mixed_layer_depth`.
+    - station_col (str): Station column. Defaults to 'Station'.
+    - replace (bool): Replace the 'ML' column of the sheet. Defaults to False, which only fills
+      missing entries and reports samples where the sheet and the computed flag disagree.
+
+    Returns:
+    - DataFrame: Table with 'MLD' (m) and 'ML' ("IN" or "OUT") columns.
+    """
+    mld = station_mld(df, criterion, value, ref_depth, station_col)
+    df['MLD'] = df[station_col].map(mld).to_numpy(dtype=float)
+    computed = pd.Series(np.where(df['Depth'] <= df['MLD'], 'IN', 'OUT'), index=df.index)
+    computed[df['MLD'].isna() | df['Depth'].isna()] = None
+
+    if replace or 'ML' not in df.columns:
+        df['ML'] = computed
+    else:
+        given = df['ML'].astype(object)
+        disagree = given.notna() & computed.notna() & (given != computed)
+        if disagree.any():
+            print(f"ML flag of the sheet differs from the computed MLD for {disagree.sum()} samples")
+        df['ML'] = given.where(given.notna(), computed)
+    return df
+
+
+def mld_label(mld):
+    """Figure annotation of an MLD, e.g. '113m'."""
+    return f'{mld:.0f}m'
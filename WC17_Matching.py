@@ -0,0 +1,125 @@
+"""
+WC17: Depth Matching Between the Phytoplankton (150 m) and Trace Metal (250 m) Datasets
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- `match_depths` pairs every sample of one table with the nearest sample at the same station of another table, within a depth tolerance. All stations are matched in one `pd.merge_asof` over depth-sorted tables grouped by station (`by`), instead of by hand per station.
+- Each match reports the depth of the matched bottle ('Depth_TM') and the distance between the two depths ('Match_distance', m). Samples without a bottle within the tolerance are left unmatched.
+- `fill_matched` fills trace metal values missing from the phytoplankton sheet (e.g. new casts) from the matched TM bottles, with their below detection limit flags. `WC17_01` calls it on the raw sheets, so the lithogenic correction and quality flags of `WC17_DataComp_update` are derived from the filled values.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import numpy as np
+import pandas as pd
+
+from WC17_Censored import CENSOR_SUFFIX
+from WC17_Lithogenic import METALS
+
+#%%
+
+### SETTINGS ###
+
+# Largest depth difference (m) between matched samples
+MATCH_TOLERANCE = 10
+
+# Trace metal columns taken from the matched TM bottle
+MATCH_COLUMNS = [f'd{m}' for m in METALS] + [f'p{m}' for m in METALS] + ['pP', 'pAl']
+
+# Columns reporting each match
+MATCH_DEPTH = 'Depth_TM'
+MATCH_DISTANCE = 'Match_distance'
+
+#%%
+
+### MATCHING ###
+
+def match_depths(left, right, columns, tolerance=MATCH_TOLERANCE, station_col='Station', depth_col='Depth'):
+    """
+    Nearest sample of `right` at the same station for every sample of `left`, within a depth tolerance.
+
+    Parameters:
+    - left (DataFrame): Samples to match, e.g. the phytoplankton sheet.
+    - right (DataFrame): Samples matched to, e.g. the trace metal sheet.
+    - columns (list): Columns of `right` to return.
+    - tolerance (float): Largest depth difference (m). Defaults to `MATCH_TOLERANCE`.
+    - station_col (str): Station column of both tables. Defaults to 'Station'.
+    - depth_col (str): Depth column of both tables. Defaults to 'Depth'.
+
+    Returns:
+    - DataFrame: Aligned with `left`, with `MATCH_DEPTH`, `MATCH_DISTANCE` and `columns`;
+      all NaN for samples without a match.
+    """
+    columns = list(columns)
+    keys = pd.DataFrame({station_col: left[station_col].astype(object),
+                         depth_col: left[depth_col].astype(float)}, index=left.index)
+    keys = keys.dropna().sort_values(depth_col, kind='stable')
+
+    candidates = right[[station_col, depth_col] + columns].rename(columns={depth_col: MATCH_DEPTH})
+    candidates = candidates.astype({station_col: object, MATCH_DEPTH: float})
+    candidates = candidates.dropna(subset=[station_col, MATCH_DEPTH]).sort_values(MATCH_DEPTH, kind='stable')
+
+    matched = pd.merge_asof(keys.reset_index(), candidates, left_on=depth_col, right_on=MATCH_DEPTH,
+                            by=station_col, direction='nearest', tolerance=float(tolerance))
+    matched = matched.set_index(matched.columns[0]).reindex(left.index)
+    matched.insert(matched.columns.get_loc(MATCH_DEPTH) + 1, MATCH_DISTANCE,
+                   (matched[MATCH_DEPTH] - matched[depth_col]).abs())
+    return matched[[MATCH_DEPTH, MATCH_DISTANCE] + columns].rename_axis(left.index.name)
+
+
+def fill_matched(df, source, columns=None, tolerance=MATCH_TOLERANCE, station_col='Station', depth_col='Depth'):
+    """
+    Fill missing values from the nearest sample of another table at the same station.
+
+    Below detection limit flags ('<col>_cens') of the filled values are taken from `source`.
+    The depth of the matched sample and the match distance are added for every sample.
+
+    Parameters:
+    - df (DataFrame): Table to fill, e.g. the raw phytoplankton sheet.
+    - source (DataFrame): Table matched to, e.g. the raw trace metal sheet, with the same units.
+    - columns (list): Columns to fill. Defaults to the `MATCH_COLUMNS` in both tables.
+    - tolerance, station_col, depth_col: See `match_depths`.
+
+    Returns:
+    - DataFrame: Filled table with `MATCH_DEPTH` and `MATCH_DISTANCE` columns.
+
+    Raises:
+    - ValueError: If a filled column has different units in the two tables.
+    """
+    if columns is None:
+        columns = [col for col in MATCH_COLUMNS if col in df.columns and col in source.columns]
+    units, source_units = df.attrs.get('units', {}), source.attrs.get('units', {})
+    for col in columns:
+        if col in units and col in source_units and units[col] != source_units[col]:
+            raise ValueError(f"'{col}' is in {units[col]} but in {source_units[col]} in the matched table.")
+
+    censored = [f'{col}{CENSOR_SUFFIX}' for col in columns if f'{col}{CENSOR_SUFFIX}' in source.columns]
+    matched = match_depths(df, source, columns + censored, tolerance, station_col, depth_col)
+
+    values = df[columns].to_numpy(dtype=float, copy=True)
+    fill = np.isnan(values) & ~np.isnan(matched[columns].to_numpy(dtype=float))
+    values[fill] = matched[columns].to_numpy(dtype=float)[fill]
+    df[columns] = values
+    for j, col in enumerate(columns):
+        flag = f'{col}{CENSOR_SUFFIX}'
+        if flag in censored and fill[:, j].any():
+            given = df[flag].to_numpy(dtype=bool, copy=True) if flag in df.columns else np.zeros(len(df), dtype=bool)
+            given[fill[:, j]] = matched[flag].to_numpy()[fill[:, j]].astype(bool)
+            df[flag] = given
+
+    df[MATCH_DEPTH] = matched[MATCH_DEPTH].to_numpy()
+    df[MATCH_DISTANCE] = matched[MATCH_DISTANCE].to_numpy()
+    n_matched = matched[MATCH_DEPTH].notna().sum()
+    print(f"Matched {n_matched} of {len(df)} samples within {tolerance} m "
+          f"(largest distance {matched[MATCH_DISTANCE].max():.1f} m), {fill.sum()} values filled")
+    return df
@@ -0,0 +1,200 @@
+"""
+WC17: Trace Metal Star (TM*) from Nutrient Ratios
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- TM* is the dissolved metal in excess of (or short of) the phytoplankton requirement for the phosphate present, TM* = dTM - R x PO4, with R the cellular TM:P quota of a region or phytoplankton group.
+- `metal_star` evaluates all samples x quota sets x metals as one broadcasted array; `add_metal_star` stores the result as named columns '<metal>*-<quota set>' (e.g. 'Fe*-Diatoms'), scaled to the unit of each dTM column from the unit registry (metals whose units cannot be related to the nutrient are skipped with a warning).
+- TM* columns given in the sheet are kept and only filled where missing (converted with their dTM column, see `star_conversions`), so new cruises and alternative quota sets (`QUOTA_SETS`) can be added next to them.
+- `star_table` builds the Metal Star table (one row per station and quota set, one column per metal) from the column names, so it does not depend on the column order of the compiled sheet.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from WC17_Censored import CENSOR_SUFFIX
+from WC17_Flags import combine_flags, is_flag_column
+from WC17_Units import DEFAULT_UNITS, UNIT_CONVERSIONS, ratio_factor
+
+#%%
+
+### SETTINGS ###
+
+# Metals of the Metal Star table, in column order
+STAR_METALS = ['Fe', 'Mn', 'Co', 'Ni', 'Cu', 'Zn', 'Cd']
+
+# Nutrient the quotas refer to
+STAR_NUTRIENT = 'Phosphate'
+
+# Cellular TM:P quotas (mmol/mol), one row per quota set (region or phytoplankton group).
+# NaN quotas are skipped. Mean phytoplankton quotas of Ho et al. (2003), which report no Ni.
+QUOTA_UNIT = 'mmol/mol'
+QUOTA_SETS = pd.DataFrame.from_dict({
+    'Ho et al. 2003': {'Fe': 7.5, 'Mn': 3.8, 'Co': 0.19, 'Ni': np.nan, 'Cu': 0.38, 'Zn': 0.80, 'Cd': 0.21},
+}, orient='index')[STAR_METALS]
+
+# TM* column names, e.g. 'Fe*-Diatoms'
+STAR_PATTERN = re.compile(r'^([A-Z][a-z]?)\*-(.+)$')
+
+#%%
+
+### METAL STAR ###
+
+def star_column(metal, quota_set):
+    """Name of the TM* column of a metal and quota set, e.g. 'Fe*-Diatoms'."""
+    return f'{metal}*-{quota_set}'
+
+
+def metal_star(dtm, nutrient, quotas, factors=1.0):
+    """
+    TM* of all samples, quota sets and metals in one broadcasted operation.
+
+    Parameters:
+    - dtm (array): Sample x metal array of dissolved metals.
+    - nutrient (array): Nutrient concentration of each sample.
+    - quotas (array): Quota set x metal array of TM:nutrient quotas.
+    - factors (float or array): Per metal, dTM / nutrient x factor is in the quota unit (see `ratio_factor`).
+
+    Returns:
+    - array: Sample x quota set x metal array of dTM - quota x nutrient, in the dTM units.
+    """
+    dtm = np.asarray(dtm, dtype=float)
+    nutrient = np.asarray(nutrient, dtype=float)
+    quotas = np.asarray(quotas, dtype=float)
+    return dtm[:, None, :] - quotas[None] / np.asarray(factors, dtype=float) * nutrient[:, None, None]
+
+
+def add_metal_star(df, units, quotas=None, nutrient=STAR_NUTRIENT, overwrite=False):
+    """
+    Add the TM* columns of every metal and quota set.
+
+    Parameters:
+    - df (DataFrame): Table with 'd<metal>' columns and the nutrient column.
+    - units (dict): Column -> unit registry, used for the scaling and updated in place (TM* in the dTM unit).
+    - quotas (DataFrame): Quota sets x metals in `QUOTA_UNIT`. Defaults to `QUOTA_SETS`.
+    - nutrient (str): Nutrient column. Defaults to 'Phosphate'.
+    - overwrite (bool): Replace TM* values given in the sheet. Defaults to False, which only fills missing values.
+
+    Returns:
+    - DataFrame: Table with the TM* columns (new columns at the end) and their flags. Metals whose unit,
+      or the nutrient's, is missing or cannot be related to `QUOTA_UNIT` are skipped with a warning.
+    """
+    if quotas is None:
+        quotas = QUOTA_SETS
+    if nutrient not in df.columns:
+        return df
+    metals, factors = [], []
+    for metal in quotas.columns:
+        if f'd{metal}' not in df.columns:
+            continue
+        try:
+            factors.append(ratio_factor(units.get(f'd{metal}'), units.get(nutrient), QUOTA_UNIT))
+        except ValueError as error:
+            print(f"Warning: {metal}* not added. {error}")
+            continue
+        metals.append(metal)
+    if not metals:
+        return df
+    dtm_cols = [f'd{metal}' for metal in metals]
+
+    star = metal_star(df[dtm_cols].to_numpy(dtype=float), df[nutrient].to_numpy(dtype=float),
+                      quotas[metals].to_numpy(), factors)
+
+    # Named columns in metal-major order, pairs without a quota skipped
+    names, values, inputs = [], [], []
+    for j, metal in enumerate(metals):
+        for i, quota_set in enumerate(quotas.index):
+            if np.isnan(quotas[metal].iloc[i]):
+                continue
+            col = star_column(metal, quota_set)
+            given = df[col].to_numpy(dtype=float) if col in df.columns and not overwrite else None
+            names.append(col)
+            values.append(star[:, i, j] if given is None else np.where(np.isnan(given), star[:, i, j], given))
+            inputs.append(dtm_cols[j])
+            units[col] = units[dtm_cols[j]]
+    df[names] = np.column_stack(values)
+    combine_flags(df, names, inputs, nutrient)
+    return df
+
+
+def star_columns(df, metals=None):
+    """
+    TM* columns of a table, found by name (their quality and censor flag columns are left out).
+
+    Returns:
+    - list: (column, metal, quota set) for each TM* column, in table order.
+    """
+    metals = STAR_METALS if metals is None else metals
+    found = [(col, *STAR_PATTERN.match(str(col)).groups()) for col in df.columns
+             if STAR_PATTERN.match(str(col)) and not is_flag_column(col) and not str(col).endswith(CENSOR_SUFFIX)]
+    return [(col, metal, quota_set) for col, metal, quota_set in found if metal in metals]
+
+
+def star_conversions(df, units, conversions=None):
+    """
+    Unit conversions extended to the TM* columns of a sheet, which follow the conversion of their dTM column.
+
+    TM* columns of the sheet have no unit suffix; they are recorded in `units` with the unit of their
+    dTM column, so TM* values given in the sheet and computed by `add_metal_star` share one unit.
+
+    Parameters:
+    - df (DataFrame): Raw sheet with cleaned column names, before `convert_units`.
+    - units (dict): Column -> unit registry, updated in place with the TM* units.
+    - conversions (dict): Column -> target amount unit. Defaults to `UNIT_CONVERSIONS`.
+
+    Returns:
+    - dict: `conversions` plus the TM* columns of converted dTM columns.
+    """
+    conversions = dict(UNIT_CONVERSIONS if conversions is None else conversions)
+    for col, metal, _ in star_columns(df):
+        dtm = f'd{metal}'
+        dtm_unit = units.get(dtm, DEFAULT_UNITS.get(dtm))
+        if col not in units and dtm_unit is not None:
+            units[col] = dtm_unit
+        if dtm in conversions and col in units:
+            conversions[col] = conversions[dtm]
+    return conversions
+
+
+def star_table(df, station_col='Station', metals=None, exclude=()):
+    """
+    Metal Star table with one row per station and quota set and one '<metal>*' column per metal.
+
+    Parameters:
+    - df (DataFrame): Table (e.g. station summary) with a station column and TM* columns.
+    - station_col (str): Station column. Defaults to 'Station'.
+    - metals (list): Metals in column order. Defaults to `STAR_METALS`.
+    - exclude (list): Quota sets left out of the table.
+
+    Returns:
+    - DataFrame: Columns station, 'Region/Phyto' and '<metal>*', sorted by station and quota set.
+    """
+    metals = STAR_METALS if metals is None else metals
+    found = [(col, metal, quota_set) for col, metal, quota_set in star_columns(df, metals)
+             if quota_set not in exclude]
+    cols = [col for col, _, _ in found]
+    index = pd.MultiIndex.from_tuples([(quota_set, f'{metal}*') for _, metal, quota_set in found],
+                                      names=['Region/Phyto', None])
+
+    table = (df.set_index(station_col)[cols].set_axis(index, axis=1)
+             .stack(level='Region/Phyto', future_stack=True)
+             .reindex(columns=[f'{metal}*' for metal in metals])
+             .reset_index()
+             .sort_values([station_col, 'Region/Phyto'], kind='stable')
+             .reset_index(drop=True))
+    table.columns.name = None
+    return table
@@ -0,0 +1,137 @@
+"""
+WC17: Robust Outlier Screening with the Median Absolute Deviation
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- `mad_outliers` screens every numeric column of a table at once: the median and the MAD (scaled to the standard deviation of normal data, as `median_abs_deviation(scale='normal')`) are computed per group with whole-frame grouped transforms, and values more than `k` MADs from the group median are returned as a boolean matrix with the shape of the screened columns.
+- Groups are stations by default, or any combination of columns and arrays, e.g. the frontal zones of `latitude_zones` crossed with the depth bins of `depth_bins`, so vertical gradients of full profiles are not taken for outliers.
+- Groups with fewer than `MIN_N` values, and groups whose MAD is 0, flag nothing.
+- `WC17_01` writes the screening of both compiled tables ('WC17_TM_outliers', 'WC17_DataComp_outliers'); the quality flags are not changed. The profile and line plots mark the flagged points.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import numpy as np
+import pandas as pd
+
+from WC17_Flags import UNFLAGGED_COLUMNS, is_flag_column
+from WC17_QC import QC_COLUMN
+from WC17_Schema import degrees_north
+
+#%%
+
+### SETTINGS ###
+
+# Values further than MAD_K scaled MADs from their group median are outliers (Iglewicz and Hoaglin, 1993)
+MAD_K = 3.5
+
+# MAD of normal data -> standard deviation
+MAD_SCALE = 1.4826
+
+# Fewest values of a group that is screened (the MAD of fewer values is too unstable)
+MIN_N = 5
+
+# Station properties repeated with every sample, not screened
+SCREEN_EXCLUDE = ['MLD']
+
+# Latitudes (°S) of the fronts crossed by the transect, as drawn in the trace metal line plots
+FRONT_LATITUDES = [42.4, 46.2, 49.3, 56.5]
+
+# Depth bins (m) of a zone x depth screening
+DEPTH_BINS = [0, 50, 100, 150, 250, np.inf]
+
+#%%
+
+### GROUPS ###
+
+def latitude_zones(lat, fronts=FRONT_LATITUDES):
+    """
+    Zone between the fronts of each sample, e.g. 'N of 42.4°S', '42.4-46.2°S', 'S of 56.5°S'.
+
+    Parameters:
+    - lat (array): Latitude, in degrees north (negative) or °S (positive), see `degrees_north`.
+    - fronts (list): Front latitudes (°S). Defaults to `FRONT_LATITUDES`.
+
+    Returns:
+    - Categorical: Zone of each sample (missing where the latitude is NaN).
+    """
+    edges = [0] + list(fronts) + [90]
+    labels = ([f'N of {fronts[0]:g}°S'] + [f'{a:g}-{b:g}°S' for a, b in zip(fronts[:-1], fronts[1:])]
+              + [f'S of {fronts[-1]:g}°S'])
+    return pd.cut(-degrees_north(lat), edges, right=False, labels=labels)
+
+
+def depth_bins(depth, edges=DEPTH_BINS):
+    """
+    Depth bin of each sample, e.g. '0-50 m'.
+
+    Returns:
+    - Categorical: Bin of each depth (missing where the depth is NaN).
+    """
+    labels = [f'{a:g}-{b:g} m' for a, b in zip(edges[:-1], edges[1:])]
+    return pd.cut(np.asarray(depth, dtype=float), edges, right=False, labels=labels)
+
+#%%
+
+### SCREENING ###
+
+def screen_columns(df):
+    """Numeric value columns of a table (no flags, IDs, positions, depths or station properties)."""
+    skip = set(UNFLAGGED_COLUMNS) | set(SCREEN_EXCLUDE) | {QC_COLUMN}
+    return [col for col in df.select_dtypes(include='number').columns if col not in skip and not is_flag_column(col)]
+
+
+def mad_outliers(df, columns=None, by='Station', k=MAD_K, min_n=MIN_N):
+    """
+    Values further than `k` scaled MADs from the median of their group, for all columns at once.
+
+    Parameters:
+    - df (DataFrame): Table to screen.
+    - columns (list): Columns screened. Defaults to `screen_columns(df)`.
+    - by (str, array or list): Grouping: column names and/or arrays aligned with `df`
+      (e.g. `[latitude_zones(df['Latitude']), depth_bins(df['Depth'])]`). Defaults to 'Station'.
+    - k (float): Threshold in scaled MADs. Defaults to `MAD_K`.
+    - min_n (int): Fewest values of a group that is screened. Defaults to `MIN_N`.
+
+    Returns:
+    - DataFrame: Boolean matrix with the index of `df` and one column per screened column,
+      True for outliers. Missing values and samples without a group are never outliers.
+    """
+    columns = screen_columns(df) if columns is None else list(columns)
+    keys = [df[key] if isinstance(key, str) else key for key in (by if isinstance(by, list) else [by])]
+    values = df[columns].astype(float)
+
+    grouped = values.groupby(keys, observed=True, sort=False)
+    deviation = (values - grouped.transform('median')).abs()
+    mad = deviation.groupby(keys, observed=True, sort=False).transform('median') * MAD_SCALE
+    screened = (grouped.transform('count') >= min_n) & (mad > 0)
+    return (deviation > k * mad) & screened
+
+
+def outlier_summary(outliers, top=5):
+    """
+    One-line report of the outliers per column, largest counts first.
+
+    Parameters:
+    - outliers (DataFrame): Result of `mad_outliers`.
+    - top (int): Columns listed. Defaults to 5.
+
+    Returns:
+    - str: Report, e.g. "12 outliers in 4 of 60 columns (dFe 5, pMn 3, ...)".
+    """
+    counts = outliers.sum()
+    counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+    listed = ', '.join(f'{col} {n}' for col, n in counts.head(top).items())
+    more = ', ...' if len(counts) > top else ''
+    return (f"{counts.sum()} outliers in {len(counts)} of {outliers.shape[1]} columns"
+            + (f" ({listed}{more})" if len(counts) else ''))
@@ -0,0 +1,124 @@
+"""
+WC17: Phytoplankton Composition (Group Sums, % of Tchla and Pigment Ratios)
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- `add_composition` derives the composition columns once in `WC17_01`, so the summary tables, the Kendall analysis and the figures read the same stored values.
+- Group aggregates (`AGGREGATES`, e.g. Cyanobacteria = Synechococcus + Prochlorococcus) are placed after their last group, the % of Tchla of each group ('<group>_P') and the pigment ratios (`RATIOS`, e.g. Phaeo_Chla) are added at the end of the table.
+- The % and ratio columns are each one block divide over the group (or pigment) matrix. Values with a divisor of 0 or missing are NaN rather than inf, and every derived column takes the worst quality flag of its inputs (see `WC17_Flags`).
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import numpy as np
+
+from WC17_Chemtax import CHLA, GROUPS
+from WC17_Flags import combine_flags
+
+#%%
+
+### SETTINGS ###
+
+# Group aggregates: name -> summed group columns (missing when any part is missing)
+AGGREGATES = {'Cyanobacteria': ['Synechococcus', 'Prochlorococcus']}
+
+# Groups reported as % of Tchla, aggregated groups replaced by their aggregate
+PERCENT_GROUPS = [col for col in GROUPS if not any(col in parts for parts in AGGREGATES.values())] + list(AGGREGATES)
+
+# Suffix of the % of Tchla columns
+PERCENT_SUFFIX = '_P'
+
+# Pigment ratios: name -> (summed numerator columns, divisor column)
+RATIOS = {'Phaeo_Chla': (['Phorb_a', 'Phytin_a'], CHLA)}
+
+#%%
+
+### COMPOSITION ###
+
+def percent_column(col):
+    """Name of the % of Tchla column of a group."""
+    return f'{col}{PERCENT_SUFFIX}'
+
+
+def percent_columns(groups=None):
+    """% of Tchla columns of `groups`. Defaults to `PERCENT_GROUPS`."""
+    return [percent_column(col) for col in (PERCENT_GROUPS if groups is None else groups)]
+
+
+def safe_divide(num, den):
+    """
+    Element-wise num / den, NaN where the divisor is 0, negative or missing.
+
+    Parameters:
+    - num (array): Numerators, e.g. a sample x group matrix.
+    - den (array): Divisors, broadcastable to `num` (e.g. a sample x 1 column).
+
+    Returns:
+    - array: Quotients as float.
+    """
+    num, den = np.broadcast_arrays(np.asarray(num, dtype=float), np.asarray(den, dtype=float))
+    out = np.full(num.shape, np.nan)
+    with np.errstate(invalid='ignore'):
+        np.divide(num, den, out=out, where=den > 0)
+    return out
+
+
+def add_composition(df, units=None, chla_col=CHLA):
+    """
+    Add group aggregates, % of Tchla of each group and pigment ratios.
+
+    Existing composition columns are recomputed, so the function can be applied to a merged table.
+    Derivations whose inputs are not all in the table are skipped.
+
+    Parameters:
+    - df (DataFrame): Table with the group and pigment columns.
+    - units (dict): Column -> unit registry, updated in place (aggregates take the unit of their parts, % columns '%').
+    - chla_col (str): Divisor of the % columns. Defaults to 'Tchla'.
+
+    Returns:
+    - DataFrame: Table with the composition columns and their flags.
+    """
+    # Group aggregates, after their last part
+    for name, parts in AGGREGATES.items():
+        if not set(parts) <= set(df.columns):
+            continue
+        values = df[parts].to_numpy(dtype=float).sum(axis=1)
+        if name in df.columns:
+            df[name] = values
+        else:
+            df.insert(df.columns.get_loc(parts[-1]) + 1, name, values)
+        combine_flags(df, name, *parts)
+        if units is not None and parts[0] in units:
+            units[name] = units[parts[0]]
+
+    if chla_col not in df.columns:
+        return df
+    chla = df[[chla_col]].to_numpy(dtype=float)
+
+    # % of Tchla of all groups in one block divide
+    groups = [col for col in PERCENT_GROUPS if col in df.columns]
+    if groups:
+        df[percent_columns(groups)] = safe_divide(df[groups].to_numpy(dtype=float), chla) * 100
+        combine_flags(df, percent_columns(groups), groups, chla_col)
+        if units is not None:
+            units.update(dict.fromkeys(percent_columns(groups), '%'))
+
+    # Pigment ratios in one block divide (numerators summed over their parts)
+    ratios = {name: (parts, den) for name, (parts, den) in RATIOS.items() if set(parts + [den]) <= set(df.columns)}
+    if ratios:
+        num = np.column_stack([df[parts].to_numpy(dtype=float).sum(axis=1) for parts, _ in ratios.values()])
+        den = df[[den for _, den in ratios.values()]].to_numpy(dtype=float)
+        df[list(ratios)] = safe_divide(num, den)
+        for name, (parts, den) in ratios.items():
+            combine_flags(df, name, *parts, den)
+    return df
@@ -0,0 +1,186 @@
+"""
+WC17: Rules-Based Data Quality Checks
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- `run_qc` evaluates all range, consistency and duplicate checks in `QC_RULES` as boolean masks over the whole table in one pass.
+- The result is packed into one integer per row ('QC_flags'): bit i is set when rule i fails. `WC17_01` stores it with the compiled datasets.
+- Downstream scripts filter on the stored flags (`Dataset(...).qc()` or `qc_pass`) without evaluating the rules again.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import numpy as np
+import pandas as pd
+
+from WC17_Lithogenic import METALS
+
+#%%
+
+### SETTINGS ###
+
+# Column holding the packed QC flags
+QC_COLUMN = 'QC_flags'
+
+# Valid ranges of hydrography and position columns
+QC_RANGES = {
+    'Temp': (-2.5, 40),
+    'Sal': (0, 42),
+    'Depth': (0, 11000),
+    'Latitude': (-90, 90),
+    'Longitude': (-180, 360),
+}
+
+# Measured concentration columns that cannot be negative
+NON_NEGATIVE = (['Tchla', 'Fl_Chla', 'POC', 'Nitrate', 'Phosphate', 'Silica', 'Silicate', 'pAl', 'pP']
+                + [f'd{m}' for m in METALS] + [f'p{m}_T' for m in METALS])
+
+# Valid ranges of the raw sheet columns, used to flag single values as bad (see WC17_Flags)
+FLAG_RANGES = dict(QC_RANGES)
+
+# Ranges of the raw concentration columns (pTM before the lithogenic correction) outside which single values are
+# flagged questionable: small negative values of blank-corrected samples near the detection limit are kept in the
+# summaries, and can be left out with `mask_flagged(df, exclude=QUESTIONABLE)` or the 'negative_measured' QC rule
+QUESTIONABLE_RANGES = {col: (0, np.inf) for col in NON_NEGATIVE + [f'p{m}' for m in METALS]}
+
+
+def _out_of_range(df):
+    cols = [col for col in QC_RANGES if col in df.columns]
+    if not cols:
+        return None
+    values = df[cols].to_numpy(dtype=float)
+    low, high = np.array([QC_RANGES[col] for col in cols]).T
+    return ((values < low) | (values > high)).any(axis=1)
+
+
+def _negative(cols):
+    def rule(df):
+        present = [col for col in cols if col in df.columns]
+        if not present:
+            return None
+        return (df[present].to_numpy(dtype=float) < 0).any(axis=1)
+    return rule
+
+
+def _tchla_zero(df):
+    if 'Tchla' not in df.columns:
+        return None
+    return (df['Tchla'] == 0).to_numpy()
+
+
+def _duplicate_depth(df):
+    if not {'Station', 'Depth'} <= set(df.columns):
+        return None
+    return df.duplicated(['Station', 'Depth'], keep=False).to_numpy()
+
+
+def _missing_pAl(df):
+    cols = [f'p{m}_T' for m in METALS if f'p{m}_T' in df.columns]
+    if 'pAl' not in df.columns or not cols:
+        return None
+    return df['pAl'].isna().to_numpy() & df[cols].notna().any(axis=1).to_numpy()
+
+
+# Rules in bit order: name -> (check, description). Checks return None when their columns are absent.
+QC_RULES = {
+    'range': (_out_of_range, 'Temp, Sal, Depth or position outside the valid range'),
+    'negative_measured': (_negative(NON_NEGATIVE), 'Negative measured concentration'),
+    'negative_excess': (_negative([f'p{m}' for m in METALS]), 'Negative excess pTM after lithogenic subtraction'),
+    'missing_pAl': (_missing_pAl, 'pTM without pAl, so no lithogenic correction'),
+    'tchla_zero': (_tchla_zero, 'Tchla of 0, used as divisor of Phaeo_Chla and phytoplankton %'),
+    'duplicate_depth': (_duplicate_depth, 'Duplicated (Station, Depth) sample'),
+}
+
+#%%
+
+### QC FUNCTIONS ###
+
+def rule_bits(rules=None):
+    """
+    Bit mask of QC rules.
+
+    Parameters:
+    - rules (list): Rule names in `QC_RULES`. Defaults to all rules.
+
+    Returns:
+    - int: Mask with the bits of `rules` set.
+
+    Raises:
+    - ValueError: If a rule name is unknown.
+    """
+    names = list(QC_RULES)
+    if rules is None:
+        rules = names
+    unknown = [rule for rule in rules if rule not in QC_RULES]
+    if unknown:
+        raise ValueError(f"Invalid QC rule. Choose from: {', '.join(names)}")
+    return int(sum(1 << names.index(rule) for rule in rules))
+
+
+def run_qc(df, column=QC_COLUMN, report=True):
+    """
+    Evaluate all QC rules and store the packed flags.
+
+    Parameters:
+    - df (DataFrame): Compiled table after the lithogenic correction.
+    - column (str): Name of the flag column. Defaults to 'QC_flags'.
+    - report (bool): Print the number of rows failing each rule. Defaults to True.
+
+    Returns:
+    - DataFrame: Table with the flag column (uint32; 0 means all checks passed).
+    """
+    masks = np.zeros((len(df), len(QC_RULES)), dtype=bool)
+    for i, (check, _) in enumerate(QC_RULES.values()):
+        mask = check(df)
+        if mask is not None:
+            masks[:, i] = mask
+
+    # One integer per row, bit i for rule i
+    df[column] = masks.astype(np.uint32) @ (np.uint32(1) << np.arange(len(QC_RULES), dtype=np.uint32))
+
+    if report:
+        print(qc_summary(df[column]).to_string())
+    return df
+
+
+def qc_summary(flags):
+    """
+    Number of rows failing each rule.
+
+    Returns:
+    - DataFrame: One row per rule with its description and the count of flagged rows.
+    """
+    flags = np.asarray(flags, dtype=np.uint32)
+    counts = [int(((flags >> i) & 1).sum()) for i in range(len(QC_RULES))]
+    return pd.DataFrame({'Description': [desc for _, desc in QC_RULES.values()], 'Rows flagged': counts},
+                        index=pd.Index(list(QC_RULES), name='QC rule'))
+
+
+def qc_pass(df, rules=None, column=QC_COLUMN):
+    """
+    Boolean mask of rows passing the given rules, from the stored flags.
+
+    Parameters:
+    - df (DataFrame): Table with the flag column.
+    - rules (list): Rule names. Defaults to all rules.
+    - column (str): Flag column. Defaults to 'QC_flags'.
+
+    Returns:
+    - Series: True where none of the rule bits is set.
+    """
+    return (df[column].astype('uint32') & rule_bits(rules)) == 0
+
+
+def describe_flags(value):
+    """Names of the rules set in one packed flag value."""
+    return [name for i, name in enumerate(QC_RULES) if int(value) >> i & 1]
@@ -0,0 +1,174 @@
+"""
+WC17: Declared Schema for the Compiled Datasets
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- Declares the dtypes of the compiled trace metal (250m) and data compilation (150m) tables.
+- Label columns are stored as categoricals, sampling dates as datetimes and `Station_ID` as a nullable integer.
+- The sampling date and time strings are combined into one UTC datetime column ('Sampling_datetime_UTC'), used for the local solar time in `WC17_Diel`.
+- `degrees_north` gives signed latitudes whether a sheet stores negative degrees north or positive °S (`LATITUDE_HEMISPHERE`), for the solar position in `WC17_Diel` and the frontal zones in `WC17_Outliers`.
+- Concentration columns can optionally be held as float32 to halve their memory use.
+- `memory_report` prints the per-column memory use of a table.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import numpy as np
+import pandas as pd
+
+#%%
+
+### SCHEMA ###
+
+# Label columns stored as categoricals
+LABEL_COLUMNS = ['Cruise', 'Station', 'Station Label', 'ML']
+
+# Columns parsed as datetimes
+DATETIME_COLUMNS = ['Sampling_date_UTC']
+
+# Sampling date and time columns combined into one UTC datetime column
+SAMPLING_DATE = 'Sampling_date_UTC'
+SAMPLING_TIME = 'Sampling_time_UTC'
+SAMPLING_DATETIME = 'Sampling_datetime_UTC'
+
+# Columns stored as nullable integers
+INTEGER_COLUMNS = ['Station_ID']
+
+# Float columns that are not concentrations and always stay float64
+COORDINATE_COLUMNS = ['Latitude', 'Longitude', 'Depth', 'Temp', 'Sal']
+
+# Hemisphere of the sampled latitudes: the WC17 transect lies south of 40°S, so latitudes given
+# as positive °S (e.g. 41.0 in the station labels and line plots) are read as south
+LATITUDE_HEMISPHERE = 'S'
+
+#%%
+
+### SCHEMA FUNCTIONS ###
+
+def concentration_columns(df):
+    """
+    Return the float columns of `df` treated as concentrations (all float columns
+    except the coordinate and hydrography columns).
+    """
+    return [col for col in df.select_dtypes(include='floating').columns
+            if col not in COORDINATE_COLUMNS]
+
+
+def degrees_north(lat, hemisphere=LATITUDE_HEMISPHERE):
+    """
+    Signed latitude in degrees north, whether the sheet gives negative degrees north or positive °S.
+
+    Parameters:
+    - lat (array): Latitude.
+    - hemisphere (str): 'S' or 'N', the hemisphere all samples lie in. Defaults to `LATITUDE_HEMISPHERE`.
+
+    Returns:
+    - array: Latitude in degrees north (negative south of the equator), NaN where missing.
+
+    Raises:
+    - ValueError: If `hemisphere` is not 'S' or 'N'.
+    """
+    if hemisphere not in ('S', 'N'):
+        raise ValueError(f"Hemisphere must be 'S' or 'N', not '{hemisphere}'.")
+    lat = np.abs(np.asarray(lat, dtype=float))
+    return -lat if hemisphere == 'S' else lat
+
+
+def combine_datetime(df, date_col=SAMPLING_DATE, time_col=SAMPLING_TIME, out_col=SAMPLING_DATETIME):
+    """
+    Combine the sampling date and time columns into one datetime column in a single vectorized pass.
+
+    Times may be 'HH:MM', 'HH:MM:SS', time objects or fractions of a day (Excel); unparsable
+    entries give NaT. The column is placed after the time column.
+
+    Parameters:
+    - df (DataFrame): Table with the date and time columns.
+    - date_col, time_col (str): Date and time columns. Default to 'Sampling_date_UTC' and 'Sampling_time_UTC'.
+    - out_col (str): Combined column. Defaults to 'Sampling_datetime_UTC'.
+
+    Returns:
+    - DataFrame: Table with the combined column (unchanged if either input column is missing).
+    """
+    if date_col not in df.columns or time_col not in df.columns:
+        return df
+    date = pd.to_datetime(df[date_col], errors='coerce').dt.normalize()
+    time = df[time_col]
+    if pd.api.types.is_numeric_dtype(time):
+        offset = pd.to_timedelta(time, unit='D', errors='coerce')
+    else:
+        text = time.astype('string').str.strip().str.replace(r'^(\d{1,2}:\d{2})$', r'\1:00', regex=True)
+        offset = pd.to_timedelta(text, errors='coerce')
+    combined = (date + offset).to_numpy()
+    if out_col in df.columns:
+        df[out_col] = combined
+    else:
+        df.insert(df.columns.get_loc(time_col) + 1, out_col, combined)
+    return df
+
+
+def apply_schema(df, float32=False, labels=True):
+    """
+    Apply the declared schema to a compiled dataset.
+
+    Parameters:
+    - df (DataFrame): Compiled trace metal or data compilation table.
+    - float32 (bool): Store concentration columns as float32. Defaults to False.
+    - labels (bool): Convert label columns to categoricals. Defaults to True.
+
+    Returns:
+    - DataFrame: Table with categorical labels, parsed dates, the combined sampling datetime and nullable integer IDs.
+    """
+    if labels:
+        for col in LABEL_COLUMNS:
+            if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+
+    for col in DATETIME_COLUMNS:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    df = combine_datetime(df)
+
+    for col in INTEGER_COLUMNS:
+        if col in df.columns and df[col].dtype != 'Int64':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+
+    if float32:
+        conc_cols = concentration_columns(df)
+        df[conc_cols] = df[conc_cols].astype(np.float32)
+
+    return df
+
+
+def memory_report(df, show=True):
+    """
+    Report the memory use of each column of a table.
+
+    Parameters:
+    - df (DataFrame): Table to report on.
+    - show (bool): Print the report. Defaults to True.
+
+    Returns:
+    - DataFrame: One row per column with its dtype and memory use (kB), plus a 'Total' row.
+    """
+    usage = df.memory_usage(index=True, deep=True)
+    report = pd.DataFrame({
+        'dtype': [str(df[col].dtype) if col in df.columns else '' for col in usage.index],
+        'Memory (kB)': usage.to_numpy() / 1024,
+    }, index=usage.index)
+    report.loc['Total'] = ['', report['Memory (kB)'].sum()]
+
+    if show:
+        print("Memory use per column:")
+        print(report.round(1).to_string())
+
+    return report
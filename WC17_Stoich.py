@@ -0,0 +1,102 @@
+"""
+WC17: Trace Metal Stoichiometry (TM:P and TM:Nutrient Ratios)
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- `add_stoichiometry` adds the metal:denominator ratios of `STOICH_RATIOS` (e.g. pFe:pP, dFe:NO3, dZn:Si) for every sample as one block divide over the gathered numerator and denominator columns.
+- The scaling of each ratio is derived from the units of its columns in the unit registry (e.g. pCo in pmol/kg over pP in nmol/kg is already mmol/mol; per-litre or µM nutrients are related to per-kg metals by the seawater density), replacing the fixed x1000 factors of the earlier pTM/P block in `WC17_01`.
+- Ratios are named '<numerator>_<label>' (e.g. 'pFe_P', 'dFe_NO3'), take the worst quality flag of their inputs and are NaN where the denominator is 0 or missing. Ratios whose units are missing or incompatible are skipped with a warning. `WC17_01` stores them with the trace metal table and `WC17_TraceMetal_ML_SummaryStats` reports the station medians.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+from WC17_Flags import combine_flags
+from WC17_Lithogenic import METALS
+from WC17_Phyto import safe_divide
+from WC17_Units import ratio_factor
+
+#%%
+
+### SETTINGS ###
+
+# Ratios: denominator column -> (label in the ratio name, numerator columns, ratio unit)
+STOICH_RATIOS = {
+    'pP': ('P', [f'p{m}' for m in METALS], 'mmol/mol'),
+    'Phosphate': ('PO4', [f'd{m}' for m in METALS], 'µmol/mol'),
+    'Nitrate': ('NO3', [f'd{m}' for m in METALS], 'µmol/mol'),
+    'Silicate': ('Si', ['dZn'], 'µmol/mol'),
+}
+
+#%%
+
+### STOICHIOMETRY ###
+
+def ratio_column(num, label):
+    """Name of the ratio column, e.g. 'pFe_P'."""
+    return f'{num}_{label}'
+
+
+def stoich_columns(df=None, spec=None):
+    """
+    Ratio columns of a spec, in output order.
+
+    Parameters:
+    - df (DataFrame): Only ratio columns present in this table. Defaults to all ratios.
+    - spec (dict): Ratio spec like `STOICH_RATIOS`. Defaults to `STOICH_RATIOS`.
+
+    Returns:
+    - list: Ratio column names.
+    """
+    spec = STOICH_RATIOS if spec is None else spec
+    columns = [ratio_column(num, label) for label, nums, _ in spec.values() for num in nums]
+    return columns if df is None else [col for col in columns if col in df.columns]
+
+
+def add_stoichiometry(df, units, spec=None):
+    """
+    Add the metal:denominator ratios of every sample in one block divide.
+
+    Ratios whose numerator or denominator is not in the table are skipped.
+
+    Parameters:
+    - df (DataFrame): Table with the metal and denominator columns.
+    - units (dict): Column -> unit registry, used for the scaling and updated in place with the ratio units.
+    - spec (dict): Denominator -> (label, numerators, ratio unit). Defaults to `STOICH_RATIOS`.
+
+    Returns:
+    - DataFrame: Table with the ratio columns (added at the end) and their flags. Ratios whose units are
+      missing or cannot be converted to the ratio unit are skipped with a warning.
+    """
+    spec = STOICH_RATIOS if spec is None else spec
+    nums, dens, factors, out_units = [], [], [], {}
+    for den, (label, numerators, unit) in spec.items():
+        for num in numerators:
+            if num not in df.columns or den not in df.columns:
+                continue
+            try:
+                factor = ratio_factor(units.get(num), units.get(den), unit)
+            except ValueError as error:
+                print(f"Warning: {ratio_column(num, label)} not added. {error}")
+                continue
+            nums.append(num)
+            dens.append(den)
+            factors.append(factor)
+            out_units[ratio_column(num, label)] = unit
+    if not nums:
+        return df
+
+    outputs = list(out_units)
+    df[outputs] = safe_divide(df[nums].to_numpy(dtype=float), df[dens].to_numpy(dtype=float)) * factors
+    combine_flags(df, outputs, nums, dens)
+    units.update(out_units)
+    return df
@@ -6,43 +6,50 @@ For more details, refer to the project ReadMe: https://github.com/jjviljoen/Wint
 
 ### Description
 - This script generates tables with Medians and Median Absolute deviation (MAD) based on processed data.
-- Before running this script, execute `WC17_01` to process the original data files which creates "WC17_TM_Comp_update.csv" used here.
+- Values with a bad quality flag are left out of all tables; 'WC17_TM_station_flags' gives the worst flag of the values used per station.
+- Before running this script, execute `WC17_01` to process the original data files which creates "WC17_TM_Comp_update.parquet" used here.
 - Required data: Two XLSX files available from Zenodo: https://doi.org/10.5281/zenodo.6615070.
 
 ### Author
 Johan Viljoen - j.j.viljoen@exeter.ac.uk
 
 ### Last Updated
-17 July 2025
+19 October 2026
 """
 
 # %%
 
 ### IMPORT PACKAGES ###
 
-import pandas as pd
 from scipy.stats import describe, median_abs_deviation
 
-# %%
-
-# File name
-file = "WC17_TM_Comp_update.csv"
-# Read CSV
-tbl = pd.read_csv(file)
-tbl.info()
+from WC17_Censored import ros_fill
+from WC17_Dataset import Dataset
+from WC17_Flags import BAD, mask_flagged, station_flags
+from WC17_Incremental import update_station_table
+from WC17_IO import write_table
+from WC17_Lithogenic import lithogenic_uncertainty, sensitivity_table
+from WC17_MetalStar import star_table
+from WC17_Schema import memory_report
+from WC17_Stoich import stoich_columns
 
 # %%
 
-# Filter rows where ML is "IN"
-tbl_ml = tbl[tbl['ML'] == 'IN']
-
-# Remove Depth and ML columns
-tbl_ml = tbl_ml.drop(columns=['ML'])
-
-tbl_ml.info()
-
-tbl_tm = tbl_ml.drop(
-    columns=['Temp', 'Sal', 'Nitrate', 'Phosphate', 'Silicate'])
+# File name
+file = "WC17_TM_Comp_update"
+
+# Lazy view of the compiled dataset
+tm = Dataset(file)
+
+# Mixed layer rows (ML is "IN") with only the trace metal columns, loaded once
+tbl_tm = (tm.ml()
+          .drop('Temp', 'Sal', 'Nitrate', 'Phosphate', 'Silicate',
+                'Depth', 'Latitude', 'Longitude', 'Cruise', 'Station Label',
+                'Station_ID', 'Sampling_date_UTC', 'Sampling_time_UTC', 'Sampling_datetime_UTC',
+                'QC_flags', 'MLD')
+          .to_frame())
+memory_report(tbl_tm)
+tbl_tm.info()
 
 # %%
 
@@ -106,65 +113,56 @@ def median_tbl_n(data, d):
     return val
 
 
-def av_table(df, summary_type='mean', d=2):
+def av_table(df, summary_type='mean', d=2, by='Station'):
     # Read CSV file
     data = df
+    # Grouped by `by`: 'Station', or time bins such as 'Diel' or 'Solar_bin' (see WC17_Diel), alone or next to 'Station'
     # Calculate mean and standard deviation per column
     # d = 6  # Number of decimal places
 
     if summary_type == 'mean':
-        data_av = data.groupby('Station').agg(lambda x: mean_only(x, d))
+        data_av = data.groupby(by, observed=True).agg(lambda x: mean_only(x, d))
     elif summary_type == 'mean_sd':
-        data_av = data.groupby('Station').agg(lambda x: mean_sd(x, d))
+        data_av = data.groupby(by, observed=True).agg(lambda x: mean_sd(x, d))
     elif summary_type == 'median':
-        data_av = data.groupby('Station').agg(lambda x: median_tbl(x, d))
+        data_av = data.groupby(by, observed=True).agg(lambda x: median_tbl(x, d))
     elif summary_type == 'median_n':
-        data_av = data.groupby('Station').agg(lambda x: median_tbl_n(x, d))
+        data_av = data.groupby(by, observed=True).agg(lambda x: median_tbl_n(x, d))
     else:
         raise ValueError("Invalid summary_type. Choose 'mean' or 'median'.")
     # Reverse the order of rows based on the 'Station' column
     data_av = data_av.sort_values(
-        by='Station', ascending=True).reset_index(drop=False)
+        by=by, ascending=True).reset_index(drop=False)
 
     return data_av
 
 # %%
 
 
-# Convert all columns (except 'Station') to float
-for col in tbl_tm.columns:
-    if col != 'Station':
-        tbl_tm[col] = pd.to_numeric(tbl_tm[col], errors='coerce')
-
-tbl_tm.info()
+# dCd (nmol) and pMn (pmol) units are already converted by `WC17_01`
+units = tm.units
 
-# Convert dCd from pmol to nmol
-tbl_tm['dCd'] = tbl_tm['dCd']/1000
+# Replace station codes with labels
+station_mapping = {'IO08': 'St. 41.0°S', 'IO07': 'St. 43.0°S', 'IO06': 'St. 45.5°S',
+                   'IO05': 'St. 48.0°S', 'IO04': 'St. 50.6°S', 'IO03': 'St. 53.5°S',
+                   'IO02': 'St. 56.0°S', 'IO01': 'St. 58.5°S'}
+tbl_tm['Station'] = tbl_tm['Station'].astype(object).replace(station_mapping)
 
-# Convert pMn from nmol to pmol
-tbl_tm['pMn'] = tbl_tm['pMn']*1000
+# Worst quality flag of the values used for each station and column (see WC17_Flags)
+output_filename = 'WC17_TM_station_flags'
+tbl_flags = update_station_table(tbl_tm, station_flags, output_filename, file, mapping=station_mapping)
 
-pTM_df = tbl_tm.copy()
+# Values flagged bad are excluded from all tables below; the flag columns are removed
+tbl_tm = mask_flagged(tbl_tm, exclude=BAD)
 
-# Reset index if needed
-pTM_df = pTM_df.reset_index(drop=True)
+# Below detection limit values (flagged by WC17_01) are imputed per station by regression on
+# order statistics instead of being dropped; the flag columns are removed
+tbl_tm = ros_fill(tbl_tm)
 
-# Remove Depth columns
-tbl_tm = tbl_tm.drop(columns=['Depth', 'Latitude','Longitude','Cruise', 'Station Label',
-                     'Station_ID', 'Sampling_date_UTC', 'Sampling_time_UTC'])
-pTM_df = pTM_df.drop(columns=['Depth', 'Latitude','Longitude', 'Cruise', 'Station Label',
-                     'Station_ID', 'Sampling_date_UTC', 'Sampling_time_UTC'])
+tbl_tm.info()
 
-# Replace station codes with labels
-tbl_tm['Station_lbl'] = tbl_tm['Station']
-pTM_df['Station_lbl'] = pTM_df['Station']
-station_mapping = {'IO08': 'St. 41.0°S', 'IO07': 'St. 43.0°S', 'IO06': 'St. 45.5°S',
-                   'IO05': 'St. 48.0°S', 'IO04': 'St. 50.6°S', 'IO03': 'St. 53.5°S',
-                   'IO02': 'St. 56.0°S', 'IO01': 'St. 58.5°S'}
-tbl_tm['Station'] = tbl_tm['Station_lbl'].replace(station_mapping)
-tbl_tm.drop(columns=['Station_lbl'], inplace=True)
-pTM_df['Station'] = pTM_df['Station_lbl'].replace(station_mapping)
-pTM_df.drop(columns=['Station_lbl'], inplace=True)
+# Shares memory with tbl_tm under copy-on-write (no full copy)
+pTM_df = tbl_tm.reset_index(drop=True)
 
 
 tbl_summary_median = av_table(tbl_tm, summary_type='median')
@@ -175,105 +173,82 @@ tbl_summary_mean = av_table(tbl_tm, summary_type='mean')
 # pTM Summary Table
 list_ratios = ['Station', 'pFe', 'pMn', 'pCo', 'pNi', 'pCu', 'pZn', 'pCd', 'pP']
 
-tbl_pTm = av_table(pTM_df[list_ratios], summary_type='median_n')
-
-# Save df
-output_filename = 'WC17_TM_pTM_median.xlsx'
-tbl_pTm.to_excel(output_filename, index=False)
+# Save df (only stations changed since the last run are recomputed)
+output_filename = 'WC17_TM_pTM_median'
+tbl_pTm = update_station_table(pTM_df[list_ratios], lambda df: av_table(df, summary_type='median_n'),
+                               output_filename, file, mapping=station_mapping, units=units)
 
 # dTM Summary Table
 list_ratios = ['Station', 'dFe', 'dMn', 'dCo', 'dNi', 'dCu', 'dZn', 'dCd']
 
-tbl_dTm = av_table(pTM_df[list_ratios], summary_type='median_n')
 # Save df
-output_filename = 'WC17_TM_dTM_median.xlsx'
-tbl_dTm.to_excel(output_filename, index=False)
+output_filename = 'WC17_TM_dTM_median'
+tbl_dTm = update_station_table(pTM_df[list_ratios], lambda df: av_table(df, summary_type='median_n'),
+                               output_filename, file, mapping=station_mapping, units=units)
 
 # Select %pTM Lith
 list_ratios = ['Station', '%pFe_lith', '%pMn_lith', '%pCo_lith',
                '%pNi_lith', '%pCu_lith', '%pZn_lith', '%pCd_lith']
-tbl_pTm_lith = av_table(pTM_df[list_ratios], summary_type='median', d=0)
+# Save df
+output_filename = 'WC17_TM_pTM_Lith%_median'
+tbl_pTm_lith = update_station_table(pTM_df[list_ratios], lambda df: av_table(df, summary_type='median', d=0),
+                                    output_filename, file, mapping=station_mapping)
 tbl_pTm_lith.info()
 
+# pTM:pP and dTM:nutrient ratios stored by WC17_01 (see WC17_Stoich)
+list_ratios = ['Station'] + stoich_columns(pTM_df)
 # Save df
-output_filename = 'WC17_TM_pTM_Lith%_median.xlsx'
-tbl_pTm_lith.to_excel(output_filename, index=False)
+output_filename = 'WC17_TM_Stoich_median'
+tbl_stoich = update_station_table(pTM_df[list_ratios], lambda df: av_table(df, summary_type='median_n'),
+                                  output_filename, file, mapping=station_mapping, units=units)
 
 # %%
 
-### METAL STAR TABLE ###
-
-pTM_df.info()
-
-tbl_summary_median = av_table(pTM_df, summary_type='median', d=2)
+### CRUSTAL RATIO SENSITIVITY ###
 
-tbl_summary_median.info()
+# %pTM_lith, lithogenic and excess pTM for each crustal reference set in WC17_Lithogenic.RATIO_SETS
+# (e.g. Mn:Al of Rudnick & Gao vs Taylor & McLennan), calculated for all sets at once from total pTM
+tbl_sens = sensitivity_table(pTM_df, units=units)
 
+# Station medians of every reference set in one grouping
+tbl_sens_median = tbl_sens.groupby(['Ratio set', 'Station'], sort=True).median().reset_index()
+print(tbl_sens_median[['Ratio set', 'Station', '%pMn_lith', 'pMn']])
 
-tbl_star = tbl_summary_median[['Station']].join(tbl_summary_median.iloc[:, 17:43])
-
+# Save df
+output_filename = 'WC17_TM_Lith_sensitivity_median'
+write_table(tbl_sens_median, output_filename, units=units)
 
-## Create Metal Star Table for Paper
-# stack results into one column
-star_tbl_stack = pd.melt(tbl_star, id_vars=['Station'], var_name='Region/Phyto', value_name='TM*')
+# %%
 
-star_tbl_stack = star_tbl_stack.sort_values(
-    ['Station', 'Region/Phyto'], ascending=[False, True])
+### LITHOGENIC UNCERTAINTY ###
 
-# Unstack columns based on Metal
-metal_list = ['Fe', 'Mn', 'Co', 'Ni', 'Cu', 'Zn', 'Cd']
+# Monte-Carlo propagation of pAl, pTM and crustal ratio uncertainties (WC17_Lithogenic.MC_REL_SD):
+# median and 2.5-97.5 percentile band of %pTM_lith, lithogenic and excess pTM for each sample
+# Run in this process: worker processes need a `__main__` guard, which this cell-based script does not have
+tbl_mc = lithogenic_uncertainty(pTM_df, n=1000, units=units, workers=1)
 
-# Create an empty dictionary to store the results for each metal
-metal_results = {}
+# Save df
+output_filename = 'WC17_TM_Lith_uncertainty'
+write_table(tbl_mc, output_filename, units=tbl_mc.attrs['units'])
 
-# Loop through each metal in metal_list
-for metal in metal_list:
-    # Filter columns for the current metal
-    tbl_star_metal = tbl_star[['Station']].join(tbl_star.filter(like=metal))
+# %%
 
-    # Stack the data
-    metal_stack = pd.melt(tbl_star_metal, id_vars=[
-                          'Station'], var_name='Region/Phyto', value_name=f'{metal}*')
+### METAL STAR TABLE ###
 
-    # Sort the data
-    metal_stack = metal_stack.sort_values(['Station'], ascending=[False])
+pTM_df.info()
 
-    # Remove the metal prefix from column names
-    metal_stack['Region/Phyto'] = metal_stack['Region/Phyto'].str.replace(
-        f"{metal}*-", "")
+tbl_summary_median = av_table(pTM_df, summary_type='median', d=2)
 
-    # Store the results in the dictionary
-    metal_results[metal] = metal_stack
+tbl_summary_median.info()
 
-# Access the results for each metal using metal_results dictionary
-# For example, metal_results['Fe'] will give the results for iron
-# Access and create each metal DataFrame
-star_Fe_stack = metal_results['Fe']
-star_Mn_stack = metal_results['Mn']
-star_Co_stack = metal_results['Co']
-star_Ni_stack = metal_results['Ni']
-star_Cu_stack = metal_results['Cu']
-star_Zn_stack = metal_results['Zn']
-star_Cd_stack = metal_results['Cd']
 
-# Perform an outer join on 'Station' and 'Region/Phyto' columns
-result_df = metal_results[metal_list[0]]
-for metal in metal_list[1:]:
-    result_df = result_df.merge(metal_results[metal], on=[
-                                'Station', 'Region/Phyto'], how='outer')
+# Metal Star columns found by name ('<metal>*-<quota set>', see WC17_MetalStar), one row per station and
+# region/phytoplankton quota set and one column per metal; the NA Bulk Flagellates quotas are left out
+result_df = star_table(tbl_summary_median, exclude=['NA Bulk Flagellates'])
 
 # Print the resulting DataFrame
 print(result_df.head(10))
 
-# Drop rows where 'Region/Phyto' is "NA Bulk Flagellates"
-result_df = result_df[result_df['Region/Phyto'] != "NA Bulk Flagellates"]
-
-result_df = result_df.sort_values(
-    ['Station', 'Region/Phyto'], ascending=[True, True])
-
-# Reset the index
-result_df = result_df.reset_index(drop=True)
-
 # Save Metal Star Table to Excel
-output_filename = 'WC17_TM_MetalStar_Table.xlsx'
-result_df.to_excel(output_filename, index=False)
+output_filename = 'WC17_TM_MetalStar_Table'
+write_table(result_df, output_filename)
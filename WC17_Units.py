@@ -0,0 +1,244 @@
+"""
+WC17: Column Unit Registry and Unit Conversions
+
+This module is related to the manuscript by Viljoen et al.
+For more details, refer to the project ReadMe: https://github.com/jjviljoen/Winter2017_PhytoNutrients_Python.
+
+### Description
+- Parses the `(unit)` suffixes of the Zenodo xlsx headers into a column -> unit registry while cleaning the column names.
+- Applies all requested unit conversions (e.g. dCd pmol -> nmol, pMn nmol -> pmol) once at ingest, as one scaling of the converted column block.
+- The registry is stored with each Parquet table (see `WC17_IO`) and used for axis labels and published table headers.
+
+### Author
+Johan Viljoen - j.j.viljoen@exeter.ac.uk
+
+### Last Updated
+19 October 2026
+"""
+
+#%%
+
+### IMPORT PACKAGES ###
+
+import re
+
+import numpy as np
+
+#%%
+
+### SETTINGS ###
+
+# Header unit suffix, e.g. 'dFe (nmol/kg)'
+UNIT_PATTERN = r'\s*\(([^)]*)\)\s*'
+
+# Amount unit, e.g. 'pmol' in 'pmol/kg': SI prefix, base unit and the rest
+AMOUNT_PATTERN = re.compile(r'^\s*(p|n|µ|μ|u|m)?(mol|g|M)(?![a-zA-Z])(.*)$')
+
+# SI prefix exponents
+PREFIXES = {'p': -12, 'n': -9, 'µ': -6, 'μ': -6, 'u': -6, 'm': -3, '': 0}
+
+# Units of the Zenodo compilations, used when a header has no (unit) suffix
+DEFAULT_UNITS = {
+    'dCd': 'pmol/kg',
+    'pMn': 'nmol/kg',
+    'pMn_T': 'nmol/kg',
+    'pMn_lith': 'nmol/kg',
+}
+
+# Seawater density (kg m-3) used to integrate per-kg concentrations over depth
+RHO_SEAWATER = 1025
+
+# Conversions applied at ingest: column -> target amount unit
+UNIT_CONVERSIONS = {
+    'dCd': 'nmol',      # pmol to nmol
+    'pMn': 'pmol',      # nmol to pmol
+    'pMn_T': 'pmol',
+    'pMn_lith': 'pmol',
+}
+
+#%%
+
+### UNIT FUNCTIONS ###
+
+def parse_units(columns):
+    """
+    Strip the `(unit)` suffixes from column names and record the units.
+
+    Parameters:
+    - columns (list): Raw xlsx column headers.
+
+    Returns:
+    - list: Cleaned column names.
+    - dict: Column -> unit for the columns that had a unit suffix.
+    """
+    clean_columns = []
+    units = {}
+    for col in columns:
+        col = str(col)
+        name = re.sub(UNIT_PATTERN, '', col).strip()
+        match = re.search(r'\(([^)]*)\)', col)
+        if match and match.group(1).strip():
+            units[name] = match.group(1).strip()
+        clean_columns.append(name)
+    return clean_columns, units
+
+
+def conversion_factor(from_unit, to_amount):
+    """
+    Factor to convert `from_unit` (e.g. 'pmol/kg') to the amount unit `to_amount` (e.g. 'nmol').
+
+    Returns:
+    - float: Multiplication factor.
+    - str: Converted unit (e.g. 'nmol/kg').
+
+    Raises:
+    - ValueError: If the units are not prefixed mol/g/M amounts of the same base unit.
+    """
+    source = AMOUNT_PATTERN.match(from_unit)
+    target = AMOUNT_PATTERN.match(to_amount)
+    if source is None or target is None or source.group(2) != target.group(2):
+        raise ValueError(f"Cannot convert '{from_unit}' to '{to_amount}'.")
+
+    exponent = PREFIXES[source.group(1) or ''] - PREFIXES[target.group(1) or '']
+    new_unit = f'{target.group(1) or ""}{target.group(2)}{source.group(3)}'
+    return 10.0 ** exponent, new_unit
+
+
+def convert_units(df, units, conversions=None):
+    """
+    Apply unit conversions to a table in a single scaling of the converted column block.
+
+    Parameters:
+    - df (DataFrame): Table with cleaned column names.
+    - units (dict): Column -> unit registry, updated in place with the converted units.
+    - conversions (dict): Column -> target amount unit. Defaults to `UNIT_CONVERSIONS`.
+
+    Returns:
+    - DataFrame: Table with converted columns.
+    """
+    if conversions is None:
+        conversions = UNIT_CONVERSIONS
+
+    cols, factors = [], []
+    for col, to_amount in conversions.items():
+        if col not in df.columns:
+            continue
+        from_unit = units.get(col, DEFAULT_UNITS.get(col))
+        if from_unit is None:
+            raise ValueError(f"No unit recorded for '{col}'.")
+        factor, new_unit = conversion_factor(from_unit, to_amount)
+        cols.append(col)
+        factors.append(factor)
+        units[col] = new_unit
+
+    if cols:
+        df[cols] = df[cols].to_numpy(dtype=float) * np.array(factors)
+    return df
+
+
+def _amount_per(match):
+    """Base unit and 'per' part of an AMOUNT_PATTERN match; molar units ('µM') are mol per L."""
+    if match.group(2) == 'M':
+        return 'mol', 'L'
+    rest = match.group(3).strip()
+    volume = re.match(r'^(?:/\s*(L|kg)|(L|kg)-1)$', rest)
+    return match.group(2), (volume.group(1) or volume.group(2)) if volume else rest
+
+
+def ratio_factor(num_unit, den_unit, to_unit):
+    """
+    Factor to express num / den in the ratio unit `to_unit`, e.g. 'pmol/kg' / 'nmol/kg' -> 'mmol/mol' is 1.
+
+    Per-kg and per-litre (or molar) units are related by `RHO_SEAWATER`, e.g. 'nmol/kg' / 'µM' -> 'mmol/mol' is 1.025.
+
+    Parameters:
+    - num_unit (str): Unit of the numerator, e.g. 'nmol/kg'.
+    - den_unit (str): Unit of the denominator, e.g. 'µmol/kg'.
+    - to_unit (str): Ratio unit, a prefixed amount per amount of the same base, e.g. 'mmol/mol'.
+
+    Returns:
+    - float: Multiplication factor.
+
+    Raises:
+    - ValueError: If the units are missing or not prefixed amounts of the same base unit per the same quantity.
+    """
+    num = AMOUNT_PATTERN.match(num_unit or '')
+    den = AMOUNT_PATTERN.match(den_unit or '')
+    target_num, _, target_den = (to_unit or '').partition('/')
+    target_num, target_den = AMOUNT_PATTERN.match(target_num), AMOUNT_PATTERN.match(target_den)
+    if num is None or den is None or target_num is None or target_den is None:
+        raise ValueError(f"Cannot express '{num_unit}' per '{den_unit}' as '{to_unit}'.")
+
+    (num_base, num_per), (den_base, den_per) = _amount_per(num), _amount_per(den)
+    # Numerator per kg over denominator per litre (1 L of seawater is RHO_SEAWATER / 1000 kg), and the reverse
+    density = {('kg', 'L'): RHO_SEAWATER / 1000, ('L', 'kg'): 1000 / RHO_SEAWATER}
+    if (num_base != den_base or target_num.group(2) != num_base or target_den.group(2) != num_base
+            or (num_per != den_per and (num_per, den_per) not in density)):
+        raise ValueError(f"Cannot express '{num_unit}' per '{den_unit}' as '{to_unit}'.")
+
+    exponent = (PREFIXES[num.group(1) or ''] - PREFIXES[den.group(1) or '']
+                - PREFIXES[target_num.group(1) or ''] + PREFIXES[target_den.group(1) or ''])
+    return 10.0 ** exponent * density.get((num_per, den_per), 1.0)
+
+
+def integrated_unit(unit):
+    """
+    Unit of a concentration integrated over depth in metres, e.g. 'µg/L' -> 'mg/m2', 'nmol/kg' -> 'µmol/m2'.
+
+    Per-litre units are scaled by 1000 L m-3 and per-kg units by `RHO_SEAWATER`; the amount prefix goes up one step.
+
+    Returns:
+    - float: Factor from (concentration x m) to the integrated unit.
+    - str: Integrated unit.
+
+    Raises:
+    - ValueError: If the unit is not a prefixed amount per L or per kg.
+    """
+    match = re.match(r'^\s*(p|n|µ|μ|u|m)?(mol|g)\s*(?:/\s*(L|kg)|\s+(L|kg)-1)\s*$', unit or '')
+    if match is None:
+        raise ValueError(f"Cannot integrate '{unit}' over depth.")
+    prefix = match.group(1) or ''
+    volume = match.group(3) or match.group(4)
+    steps = {'p': 'n', 'n': 'µ', 'µ': 'm', 'μ': 'm', 'u': 'm', 'm': '', '': 'k'}
+    factor = (1000 if volume == 'L' else RHO_SEAWATER) / 1000
+    return factor, f'{steps[prefix]}{match.group(2)}/m2'
+
+
+def unit_label(unit):
+    """
+    Format a unit as matplotlib mathtext, e.g. 'nmol/kg' or 'nmol kg-1' -> '$nmol$ $kg^{-1}$'.
+    """
+    if '/' in unit:
+        num, den = unit.split('/', 1)
+        parts = num.split() + [f'{part}-1' for part in den.split()]
+    else:
+        parts = unit.split()
+
+    tokens = []
+    for part in parts:
+        match = re.match(r'^(.*?)(-?\d+)$', part)
+        if not re.match(r'^[A-Za-zµμ]', part):
+            tokens.append(part)
+        elif match and match.group(1):
+            tokens.append(f'${match.group(1)}^{{{match.group(2)}}}$')
+        else:
+            tokens.append(f'${part}$')
+    return ' '.join(tokens)
+
+
+def axis_label(col, units, name=None):
+    """
+    Axis label for a column with its unit, e.g. 'dFe ($nmol$ $kg^{-1}$)'.
+    """
+    name = col if name is None else name
+    unit = units.get(col)
+    if not unit:
+        return name
+    return f'{name} ({unit_label(unit)})'
+
+
+def with_units(columns, units):
+    """
+    Column headers with units appended, e.g. 'dFe' -> 'dFe (nmol/kg)'.
+    """
+    return [f'{col} ({units[col]})' if units.get(col) else col for col in columns]
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from WC17_Censored import CENSOR_SUFFIX, ros_fill
+
+
+def test_ros_fill_caps_at_detection_limit():
+    df = pd.DataFrame({'Station': ['A'] * 5 + ['B'] * 2,
+                       'dFe': [0.5, 1.0, 2.0, 4.0, 8.0, 0.4, 3.0],
+                       f'dFe{CENSOR_SUFFIX}': [True, False, False, False, False, True, False]})
+    out = ros_fill(df.copy())
+
+    assert f'dFe{CENSOR_SUFFIX}' not in out.columns
+    # Detected values are unchanged
+    pd.testing.assert_series_equal(out.loc[[1, 2, 3, 4, 6], 'dFe'], df.loc[[1, 2, 3, 4, 6], 'dFe'])
+    # Censored value from the fit of station A, below its detection limit
+    assert 0 < out.loc[0, 'dFe'] <= 0.5
+    # Station B has a single detected value: half the detection limit
+    assert out.loc[5, 'dFe'] == 0.2
+
+
+def test_ros_fill_keeps_flags_and_missing_values():
+    df = pd.DataFrame({'Station': ['A'] * 4,
+                       'dZn': [0.1, np.nan, 2.0, 3.0],
+                       f'dZn{CENSOR_SUFFIX}': [True, False, False, False]})
+    out = ros_fill(df.copy(), drop_flags=False)
+
+    assert out[f'dZn{CENSOR_SUFFIX}'].tolist() == [True, False, False, False]
+    assert np.isnan(out.loc[1, 'dZn'])
+    assert out.loc[0, 'dZn'] <= 0.1
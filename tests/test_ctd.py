@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from WC17_CTD import bin_cast, bin_scans
+
+
+def test_bin_scans_sums_and_counts():
+    depth = [0.2, 0.9, 1.5, 3.1, -0.5, np.nan, 12.0]
+    values = [[1.0], [3.0], [np.nan], [4.0], [9.0], [9.0], [9.0]]
+    bins, sums, counts = bin_scans(depth, values, n_bins=10)
+
+    assert bins.tolist() == [0, 1, 3]
+    assert sums[:, 0].tolist() == [4.0, 0.0, 4.0]
+    assert counts[:, 0].tolist() == [2, 0, 1]
+
+
+def test_bin_cast_downcast_across_chunks(tmp_path):
+    # Downcast to 3.5 m with a pause at 1.2 m, a shallower scan at 1.0 m and the upcast back to the surface
+    path = tmp_path / 'WC17_CTD_01.csv'
+    pd.DataFrame({'Depth': [0.5, 1.2, 1.2, 1.0, 2.4, 3.5, 2.6, 1.4, 0.3],
+                  'Temp': [10.0, 9.0, 50.0, 90.0, 8.0, 7.0, 90.0, 90.0, 90.0]}).to_csv(path, index=False)
+
+    names, sums, counts = bin_cast(str(path), max_depth=5, chunk_scans=2)
+    assert names == ['Temp']
+    # Scans at the deepest depth so far are kept, shallower ones are dropped
+    assert counts[:, 0].tolist() == [1, 2, 1, 1, 0]
+    assert sums[:, 0].tolist() == [10.0, 59.0, 8.0, 7.0, 0.0]
+
+    # Without the downcast filter every scan is binned
+    _, sums, counts = bin_cast(str(path), max_depth=5, chunk_scans=2, downcast=False)
+    assert counts[:, 0].sum() == 9
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from WC17_Incremental import detect_changes, merge_changes, write_changes
+
+NAME = 'WC17_Test_update'
+
+
+def _process(rows):
+    # Stand-in for the pipeline: derived column from the raw value
+    return rows.assign(double=rows['value'] * 2)
+
+
+def _run(sheet):
+    changes = detect_changes(sheet, NAME, rebuild=False)
+    merged = merge_changes(_process(sheet[changes['changed']]), NAME, changes)
+    write_changes(merged, NAME, changes)
+    return changes, merged
+
+
+@pytest.fixture
+def sheet(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('WC17_PUBLISH', '0')
+    sheet = pd.DataFrame({'Cruise': 'WC17', 'Station': [1, 1, 2, 3],
+                          'Depth': [5.0, 20.0, 5.0, 5.0], 'value': [1.0, 2.0, 3.0, 4.0]})
+    changes, _ = _run(sheet)
+    assert changes['rebuild']
+    return sheet
+
+
+def test_unchanged_sheet(sheet):
+    changes, merged = _run(sheet)
+    assert not changes['changed'].any() and len(changes['removed']) == 0
+    pd.testing.assert_frame_equal(merged, _process(sheet), check_dtype=False)
+
+
+def test_changed_and_removed_rows(sheet):
+    edited = sheet.drop(index=2).reset_index(drop=True)
+    edited.loc[0, 'value'] = 10.0
+    changes, merged = _run(edited)
+
+    assert changes['changed'].tolist() == [True, False, False]
+    assert changes['removed'][['Station', 'Depth']].values.tolist() == [[2, 5.0]]
+    pd.testing.assert_frame_equal(merged, _process(edited), check_dtype=False)
+
+
+def test_duplicate_keys(sheet):
+    # Replicate bottle at an existing key, then an edit of the second replicate only
+    replicate = pd.concat([sheet, sheet.iloc[[3]].assign(value=5.0)], ignore_index=True)
+    changes, merged = _run(replicate)
+    assert changes['changed'].tolist() == [False, False, False, False, True]
+    pd.testing.assert_frame_equal(merged, _process(replicate), check_dtype=False)
+
+    replicate.loc[4, 'value'] = 6.0
+    changes, merged = _run(replicate)
+    assert changes['changed'].tolist() == [False, False, False, False, True]
+    assert merged['double'].tolist() == [2.0, 4.0, 6.0, 8.0, 12.0]
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+from WC17_Lithogenic import CRUSTAL_RATIOS, add_lithogenic, calc_pTM_lith
+
+
+def test_add_lithogenic_matches_crustal_ratio():
+    df = pd.DataFrame({'pAl': [10.0, 0.5, np.nan], 'pFe': [20.0, 40.0, 5.0], 'pMn': [0.01, 0.2, 0.1]})
+    units = {'pFe': 'nM', 'pMn': 'nM'}
+    out = add_lithogenic(df.copy(), metals=['Fe', 'Mn'], units=units)
+
+    for metal in ['Fe', 'Mn']:
+        total = df[f'p{metal}'].to_numpy()
+        lith = np.minimum(df['pAl'].to_numpy() * CRUSTAL_RATIOS[metal], total)
+        np.testing.assert_allclose(out[f'p{metal}_lith'], lith)
+        np.testing.assert_allclose(out[f'%p{metal}_lith'], np.minimum(lith / total * 100, 100))
+        np.testing.assert_allclose(out[f'p{metal}_T'], total)
+        np.testing.assert_allclose(out[f'p{metal}'], total - lith)
+        # Same result as the single-metal formula
+        np.testing.assert_allclose(out[f'p{metal}_lith'], calc_pTM_lith(df['pAl'], metal, total, 'lith'))
+        assert units[f'p{metal}_lith'] == units[f'p{metal}_T'] == 'nM'
+        assert units[f'%p{metal}_lith'] == '%'